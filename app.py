@@ -1,23 +1,57 @@
+import argparse
 import os
+import threading
+from datetime import datetime
 import config
 import modules.db as db
+import modules.csv_writer as csv_writer
+from modules.ringbuffer import RING
 import routes
+import sockets
 import utils.scheduler_jobs as scheduler_jobs
+import utils.stations as stations
 
-def main():
-    # 確保 DB schema 存在
+def rebuild_csv(days):
+    """修復指令：依資料庫內容整檔重寫指定日期（YYYY-MM-DD）的 CSV。"""
     db.db_init()
+    for day in days:
+        out = csv_writer.write_csv_for_day(datetime.strptime(day, "%Y-%m-%d").date())
+        print(f"rebuilt {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CWA 測站排行榜")
+    parser.add_argument("--rebuild-csv", nargs="+", metavar="YYYY-MM-DD",
+                        help="依資料庫整檔重寫指定日期的 CSV 後結束")
+    parser.add_argument("--port", type=int, default=5000, help="監聽埠（預設 5000）")
+    args = parser.parse_args()
+    if args.rebuild_csv:
+        rebuild_csv(args.rebuild_csv)
+        return
+
+    # 測站名單載入、第一次抓取（排程啟動即執行，只需網路）與資料庫初始化同時進行；
+    # 背景寫庫（modules/persist）前會等 db.DB_READY
+    threading.Thread(target=stations.get_registry, name="load-stations", daemon=True).start()
 
     # 啟動排程：只在真正的 run process 啟動一次，避免重複
     is_reloader_child = (os.environ.get("WERKZEUG_RUN_MAIN") == "true")
     if not config.app.debug or is_reloader_child:
         scheduler_jobs.start_scheduler()
 
+    # 確保 DB schema 存在
+    db.db_init()
+
+    # 開始接受連線前先以資料庫中的最新快照填入後端快取（warm start）
+    scheduler_jobs.warm_start()
+
+    # 由 SQLite 回填近 48 小時的環狀緩衝（1h/24h/today 排名用）；回填完成前這些時間段改走 SQL
+    threading.Thread(target=RING.load_from_db, name="ring-backfill", daemon=True).start()
+
     # 啟動 SocketIO/Flask
     config.socketio.run(
         config.app,
         host="127.0.0.1",
-        port=5000,
+        port=args.port,
         debug=True,
         use_reloader=False
     )
@@ -0,0 +1,137 @@
+"""
+寫入進行中時 /api/data 讀取延遲的量測。
+
+在暫存目錄建立 record.db、灌入「測站數 x 過去 24 小時每 10 分鐘」的觀測，
+背景執行緒持續以長交易寫入（模擬每分鐘的 UPSERT），同時以多個讀取執行緒
+反覆呼叫 query_rows_for_window('24h', 'avg-wind')，比較：
+  - wal    ：modules.db 的連線管理（WAL + 專用寫入連線 + 讀取池）
+  - legacy ：每次呼叫新開連線、預設 rollback journal（舊行為）
+
+用法（於專案根目錄）：
+    python -m benchmarks.bench_db_readers --stations 1000 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import config
+import modules.db as db
+from utils.observation import Observation
+
+
+def make_rows(n_stations: int, obs_time: datetime, rnd: random.Random) -> list:
+    t = obs_time.strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        Observation(f"C{i:05d}", "zone", "name", t,
+                    round(rnd.uniform(0, 20), 1), 90.0, round(rnd.uniform(0, 30), 1), 90.0, t,
+                    0.0, 25.0, 80.0, 1010.0, 30.0, t, 20.0, t)
+        for i in range(n_stations)
+    ]
+
+
+def seed(n_stations: int, rnd: random.Random) -> None:
+    now = datetime.now(config.TPE).replace(tzinfo=None, second=0, microsecond=0)
+    for k in range(24 * 6):
+        db.save_observations(make_rows(n_stations, now - timedelta(minutes=10 * k), rnd))
+
+
+@contextmanager
+def _legacy_conn():
+    # 舊行為：每次新開連線、rollback journal、預設 pragma
+    conn = sqlite3.connect(db.get_db_path(), timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(mode: str, n_stations: int, seconds: float, readers: int, hold: float) -> dict:
+    rnd = random.Random(0)
+    if mode == "legacy":
+        db.db_close()
+        db.read_conn = db.write_conn = _legacy_conn
+        with _legacy_conn() as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+    stop = threading.Event()
+    latencies: list = []
+    lat_lock = threading.Lock()
+    writes = [0]
+
+    def writer():
+        now = datetime.now(config.TPE).replace(tzinfo=None, second=0, microsecond=0)
+        while not stop.is_set():
+            rows = make_rows(n_stations, now, rnd)
+            table = db.partition_name(db.partition_day(rows[0].time))
+            with db.write_conn() as conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                    [r.as_tuple() for r in rows])
+                time.sleep(hold)   # 模擬較慢的磁碟，讓交易停留一段時間
+            writes[0] += 1
+
+    def reader():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db.query_rows_for_window("24h", "avg-wind")
+            dt = time.perf_counter() - t0
+            with lat_lock:
+                latencies.append(dt)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "mode": mode,
+        "queries": len(latencies),
+        "writes": writes[0],
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": pct(1.0),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=("wal", "legacy"), default="wal")
+    ap.add_argument("--stations", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--hold", type=float, default=0.2, help="每次寫入交易額外停留秒數")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)   # record.db 位於目前工作目錄
+        db.db_init()
+        seed(args.stations, random.Random(1))
+        res = run(args.mode, args.stations, args.seconds, args.readers, args.hold)
+        db.db_close()
+        os.chdir(os.path.dirname(tmp))
+
+    print(f"mode={res['mode']} stations={args.stations} readers={args.readers} "
+          f"queries={res['queries']} writes={res['writes']}")
+    print(f"read latency ms: p50={res['p50_ms']:.1f} p95={res['p95_ms']:.1f} "
+          f"p99={res['p99_ms']:.1f} max={res['max_ms']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
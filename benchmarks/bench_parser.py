@@ -0,0 +1,88 @@
+"""
+parse_record（逐筆）與 parse_records（批次）的微型效能比較。
+
+用法（於專案根目錄）：
+    python -m benchmarks.bench_parser --stations 5000 --repeat 5
+"""
+import argparse
+import random
+import timeit
+
+import utils.parser as parser
+
+
+def make_record(i: int, rnd: random.Random) -> dict:
+    """產生一筆 O-A0003-001 形狀的合成 record。"""
+    obs = "2025-10-27T12:30:00+08:00"
+    return {
+        "StationName": f"測站{i}",
+        "StationId": f"C{i:05d}",
+        "ObsTime": {"DateTime": obs},
+        "WeatherElement": {
+            "Weather": "陰",
+            "Now": {"Precipitation": round(rnd.uniform(0, 30), 1)},
+            "WindDirection": rnd.choice([0, 45, 90, 180, 270, -99]),
+            "WindSpeed": round(rnd.uniform(0, 20), 1),
+            "AirTemperature": round(rnd.uniform(10, 35), 1),
+            "RelativeHumidity": rnd.randint(30, 100),
+            "AirPressure": round(rnd.uniform(990, 1020), 1),
+            "GustInfo": {
+                "PeakGustSpeed": round(rnd.uniform(0, 30), 1),
+                "Occurred_at": {
+                    "WindDirection": rnd.choice([45, 90, 270]),
+                    "DateTime": f"2025-10-27T12:{rnd.choice(['10', '20', '30'])}:00+08:00",
+                },
+            },
+            "DailyExtreme": {
+                "DailyHigh": {"TemperatureInfo": {
+                    "AirTemperature": 30.1,
+                    "Occurred_at": {"DateTime": "2025-10-27T11:40:00+08:00"},
+                }},
+                "DailyLow": {"TemperatureInfo": {
+                    "AirTemperature": 21.4,
+                    "Occurred_at": {"DateTime": "2025-10-27T05:50:00+08:00"},
+                }},
+            },
+        },
+    }
+
+
+def make_payload(n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [make_record(i, rnd) for i in range(n)]
+
+
+def run_legacy(records: list) -> dict:
+    out = {}
+    for rec in records:
+        sid, data = parser.parse_record(rec)
+        if sid:
+            out[sid] = data
+    return out
+
+
+def run_batch(records: list) -> dict:
+    ids, cols = parser.parse_records(records)
+    fields = parser.PARSED_FIELDS
+    return {sid: dict(zip(fields, values))
+            for sid, *values in zip(ids, *(cols[k] for k in fields)) if sid}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stations", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    records = make_payload(args.stations)
+    assert run_legacy(records) == run_batch(records), "批次解析結果與 parse_record 不一致"
+
+    legacy = min(timeit.repeat(lambda: run_legacy(records), number=1, repeat=args.repeat))
+    batch = min(timeit.repeat(lambda: run_batch(records), number=1, repeat=args.repeat))
+    print(f"stations={args.stations}")
+    print(f"parse_record  : {legacy * 1000:8.2f} ms")
+    print(f"parse_records : {batch * 1000:8.2f} ms  ({legacy / batch:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+抓取 → 解析 → 清洗 → 變更比對 → 記憶體 / 推播 → 寫庫 → CSV 的端到端量測（離線，以 fake_cwa 代替 CWA）。
+
+在暫存目錄建立 record.db、換上 --stations 站的合成測站名單，另起一個 `benchmarks.fake_cwa` 行程
+（--cadence 1：每秒換一批觀測，每輪都是全數變更），把 CWA_API_BASE 指向它後：
+  1) 逐段執行 refresh_cache 的各步驟 --cycles 輪，記錄各段耗時：
+       fetch（含網路等待）、其中的 parse（parser.parse_records）與 clean（cleaners）、
+       filter（db.filter_changed）、memory（環狀緩衝 + 每站最新一筆）、
+       publish（清回應快取 + 對 --rooms 個訂閱 room 推播 delta）、db（save_observations）、csv（append_observations）
+  2) 再以 tracemalloc 跑一輪，記錄各段的記憶體峰值
+  3) 以實際的 scheduler_jobs.refresh_cache 跑 --cycles 輪：refresh（呼叫到返回，即推播延遲）與 persist（背景寫完）
+
+結果可存成基準（--save，存在 --baseline JSON 中，以情境參數為鍵）；之後同情境執行時與基準比較，
+任一段的最佳值（各輪最小，受排程 / GC 干擾最少）比基準慢超過 --threshold（且多於 5 ms）即列為退步，結束代碼為 1。
+基準與機器有關，換機器後請重新 --save。
+
+用法（於專案根目錄）：
+    python -m benchmarks.bench_pipeline --stations 2000 --cycles 5
+    python -m benchmarks.bench_pipeline --stations 20000 --cycles 3 --missing 0.05 --camel 0.2 --latency 50 --save
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import config
+import modules.board as board
+import modules.csv_writer as csv_writer
+import modules.db as db
+import modules.persist as persist
+import modules.push as push
+import utils.cleaners as cleaners
+import utils.fetcher as fetcher
+import utils.parser as parser
+import utils.scheduler_jobs as scheduler_jobs
+import utils.stations as stations
+from benchmarks.fake_cwa import synthetic_ids
+from modules.latest import LATEST
+from modules.ringbuffer import RING
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "pipeline.json"
+STAGES = ("fetch", "parse", "clean", "filter", "memory", "publish", "db", "csv")
+NOISE_MS = 5.0
+
+
+class Timer:
+    """累計被包裝函式的耗時（fetcher 內呼叫 parser.parse_records / cleaners 時經過這裡）。"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - t
+        return timed
+
+
+def install_registry(n: int) -> list:
+    """換上 n 站的合成測站名單（單一群組），回傳站號。"""
+    ids = synthetic_ids(n)
+    compiled = {
+        "format": stations.REGISTRY_FORMAT,
+        "source": {"mtime_ns": 0, "size": 0, "hash": ""},
+        "group_names": ["合成"],
+        "stations": [[sid, f"zone{i % 50}", f"name{i}"] for i, sid in enumerate(ids)],
+        "members": [list(range(n))],
+    }
+    stations._swap(stations.StationRegistry(compiled))
+    return ids
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def fake_server(args):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.fake_cwa", "--port", str(port), "--stations", str(args.stations),
+           "--cadence", "1", "--missing", str(args.missing), "--camel", str(args.camel),
+           "--latency", str(args.latency), "--latency-jitter", str(args.latency / 4)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("fake_cwa did not start")
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}/api/v1/rest/datastore"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _next_second() -> None:
+    """等到下一秒開頭：fake_cwa 每秒換一批觀測，確保每輪都是新資料。"""
+    time.sleep(1.02 - time.time() % 1)
+
+
+def run_stages(mem: bool = False) -> dict:
+    """逐段跑一輪；mem=True 時回傳各段 tracemalloc 峰值（KiB），否則回傳耗時（ms）。"""
+    parse_t, clean_t = Timer(), Timer()
+    orig_parse, orig_clean = parser.parse_records, cleaners.correct_occured_time
+    parser.parse_records = parse_t.wrap(orig_parse)
+    cleaners.correct_occured_time = clean_t.wrap(orig_clean)
+    out = {}
+
+    @contextmanager
+    def stage(name):
+        if mem:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t = time.perf_counter()
+        yield
+        if mem:
+            out[name] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+        else:
+            out[name] = (time.perf_counter() - t) * 1000
+
+    try:
+        _next_second()
+        with stage("fetch"):
+            rows = fetcher.fetch_data()
+    finally:
+        parser.parse_records, cleaners.correct_occured_time = orig_parse, orig_clean
+    if not mem:
+        out["parse"], out["clean"] = parse_t.total * 1000, clean_t.total * 1000
+    with stage("filter"):
+        changed = db.filter_changed(rows)
+    with stage("memory"):
+        RING.append(changed)
+        LATEST.update(changed)
+    with stage("publish"):
+        with config.DATA_LOCK:
+            config.DATA_CACHE["rows"] = rows
+            config.DATA_CACHE["updated_at"] = datetime.now(config.TPE)
+        board.invalidate()
+        push.push_updates()
+    with stage("db"):
+        db.save_observations(changed)
+    with stage("csv"):
+        csv_writer.append_observations(changed)
+    out["changed"] = len(changed)
+    return out
+
+
+def run_refresh(cycles: int) -> dict:
+    """實際的 refresh_cache：回傳 refresh（到返回，推播已完成）與 persist（背景寫庫 + CSV 完成）的耗時（ms）。"""
+    persist.start()
+    refresh, total = [], []
+    for _ in range(cycles):
+        _next_second()
+        t = time.perf_counter()
+        scheduler_jobs.refresh_cache()
+        refresh.append((time.perf_counter() - t) * 1000)
+        persist.drain(60)
+        total.append((time.perf_counter() - t) * 1000)
+    return {"refresh": refresh, "persist": total}
+
+
+def scenario_key(args) -> str:
+    return f"stations={args.stations},missing={args.missing:g},camel={args.camel:g},latency={args.latency:g}"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    print(f"\ncompared with baseline saved {baseline.get('saved_at', '?')} on {baseline.get('machine', '?')}:")
+    for name, ms in results["min_ms"].items():
+        old = baseline["min_ms"].get(name)
+        if old is None:
+            continue
+        ratio = ms / old if old else float("inf")
+        flag = ""
+        if ratio > 1 + threshold and ms - old > NOISE_MS:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<8} best {old:9.1f} -> {ms:9.1f} ms  ({(ratio - 1) * 100:+6.1f}%){flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stations", type=int, default=2000, help="測站數（100 ~ 20000）")
+    ap.add_argument("--cycles", type=int, default=5)
+    ap.add_argument("--missing", type=float, default=0.03, help="O-A0003-001 缺站 / 缺風速的比例")
+    ap.add_argument("--camel", type=float, default=0.0, help="小寫開頭鍵名的回應比例")
+    ap.add_argument("--latency", type=float, default=0.0, help="fake_cwa 每個請求的延遲（毫秒）")
+    ap.add_argument("--rooms", type=int, default=6, help="訂閱中的 room 數（now/1h/24h x avg-wind/gust/air-temp，最多 9）")
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    ap.add_argument("--save", action="store_true", help="把這次結果存成此情境的基準")
+    ap.add_argument("--threshold", type=float, default=0.25, help="比基準慢多少比例算退步")
+    args = ap.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(tmp.name)   # record.db、csv/ 位於目前工作目錄
+    try:
+        db.db_init()
+        install_registry(args.stations)
+        RING.load_from_db()
+        LATEST.load([])
+        rooms = [(w, t, "全部", "rows") for w in ("now", "1h", "24h") for t in ("avg-wind", "gust", "air-temp")]
+        for key in rooms[:args.rooms]:
+            push.subscribe(key)
+
+        with fake_server(args) as base:
+            config.API1, config.API2 = f"{base}/O-A0003-001", f"{base}/O-A0001-001"
+            config.CWA_TOKEN = config.CWA_TOKEN or "bench"
+
+            run_stages()   # 暖身：建立連線、分區表
+            timings = [run_stages() for _ in range(args.cycles)]
+            tracemalloc.start()
+            memory = run_stages(mem=True)
+            tracemalloc.stop()
+            e2e = run_refresh(args.cycles)
+    finally:
+        db.db_close()
+        os.chdir(cwd)
+        tmp.cleanup()
+
+    samples = {name: [t[name] for t in timings] for name in STAGES}
+    samples.update(e2e)
+    median = {name: statistics.median(v) for name, v in samples.items()}
+    print(f"{scenario_key(args)}, rooms={args.rooms}, cycles={args.cycles}, "
+          f"changed/cycle={timings[-1]['changed']}")
+    print(f"{'stage':<8}{'median ms':>11}{'min':>9}{'max':>9}{'peak KiB':>11}")
+    for name, v in samples.items():
+        peak = f"{memory[name]:11.0f}" if name in memory and name not in ("parse", "clean") else f"{'':>11}"
+        print(f"{name:<8}{median[name]:11.1f}{min(v):9.1f}{max(v):9.1f}{peak}")
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+    results = {
+        "saved_at": datetime.now(config.TPE).strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": f"{platform.machine()} {os.cpu_count()} cpu, python {platform.python_version()}",
+        "cycles": args.cycles,
+        "rooms": args.rooms,
+        "min_ms": {k: round(min(v), 2) for k, v in samples.items()},
+        "median_ms": {k: round(v, 2) for k, v in median.items()},
+        "peak_kib": {k: round(v) for k, v in memory.items() if k in STAGES and k not in ("parse", "clean")},
+    }
+    baselines = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    key = scenario_key(args)
+    if args.save:
+        baselines[key] = results
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"saved baseline {key} -> {args.baseline}")
+    elif key in baselines:
+        if compare(results, baselines[key], args.threshold):
+            sys.exit(1)
+    else:
+        print(f"no baseline for {key} in {args.baseline} (run with --save to create one)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+固定間隔全量抓取 vs ADAPTIVE_POLLING（utils/poll_planner）的模擬比較，不連外、以虛擬時鐘執行。
+
+模擬 N 站：多數每 10 分鐘一筆、觀測後約 --lag 秒才發布（CWA 整批更新：每個時槽共用 ± --jitter 秒的偏移，
+各站再差 ± --station-jitter 秒），少數每 60 分鐘一筆，
+--offline 比例的站不回報。兩種策略各跑 --hours 小時，比較：
+  - polls    ：實際發出抓取的輪數
+  - requests ：HTTP 請求數（每輪依 URL 長度切段，約 --per-request 站一段）
+  - stations ：請求中的測站總數（流量 / 解析量的近似）
+  - fresh    ：新觀測從發布到被抓到的秒數（平均 / p95 / 最大）
+
+用法（於專案根目錄）：
+    python -m benchmarks.bench_polling --stations 1000 --hours 6
+"""
+import argparse
+import math
+import random
+import statistics
+from datetime import datetime
+
+import config
+from utils.observation import Observation
+from utils.poll_planner import PollPlanner
+
+
+class Sim:
+    def __init__(self, n: int, lag: float, jitter: float, station_jitter: float, offline: float,
+                 rnd: random.Random):
+        self.ids = [f"S{i:05d}" for i in range(n)]
+        self.cadence = {sid: (3600 if rnd.random() < 0.05 else 600) for sid in self.ids}
+        self.offline = {sid for sid in self.ids if rnd.random() < offline}
+        self.lag, self.jitter, self.station_jitter, self.rnd = lag, jitter, station_jitter, rnd
+        self._slot = {}  # 觀測時間 -> 該批的發布延遲
+        self._pub = {}   # (sid, 觀測時間) -> 發布時間
+
+    def publish_time(self, sid: str, t: int) -> float:
+        key = (sid, t)
+        if key not in self._pub:
+            if t not in self._slot:
+                self._slot[t] = self.rnd.gauss(self.lag, self.jitter)
+            self._pub[key] = t + max(30.0, self._slot[t] + self.rnd.gauss(0, self.station_jitter))
+        return self._pub[key]
+
+    def latest(self, sid: str, now: float) -> int | None:
+        """now 時 API 上該站最新的觀測時間（epoch 秒）。"""
+        if sid in self.offline:
+            return None
+        c = self.cadence[sid]
+        t = int(now // c) * c
+        while self.publish_time(sid, t) > now:
+            t -= c
+        return t
+
+
+def _ts(t: int) -> str:
+    return datetime.fromtimestamp(t, config.TPE).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def run(sim: Sim, start: float, hours: float, adaptive: bool, args) -> dict:
+    planner = PollPlanner(args.fast, args.max_backoff)
+    seen = {}
+    polls = requests = stations = 0
+    fresh = []
+    step = args.tick if adaptive else args.interval
+    now = start
+    while now < start + hours * 3600:
+        ids = planner.due(sim.ids, now) if adaptive else sim.ids
+        if ids:
+            polls += 1
+            requests += math.ceil(len(ids) / args.per_request)
+            stations += len(ids)
+            rows = []
+            for sid in ids:
+                t = sim.latest(sid, now)
+                if t is None:
+                    continue
+                rows.append(Observation(sid, time=_ts(t)))
+                if sid in seen and t > seen[sid]:
+                    fresh.append(now - sim.publish_time(sid, t))
+                seen[sid] = t
+            if adaptive:
+                planner.observe(ids, rows, now)
+        now += step
+    fresh.sort()
+    return {
+        "polls": polls, "requests": requests, "stations": stations,
+        "fresh_mean": statistics.fmean(fresh) if fresh else float("nan"),
+        "fresh_p95": fresh[int(len(fresh) * 0.95)] if fresh else float("nan"),
+        "fresh_max": fresh[-1] if fresh else float("nan"),
+        "updates": len(fresh),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stations", type=int, default=1000)
+    ap.add_argument("--hours", type=float, default=6)
+    ap.add_argument("--lag", type=float, default=240, help="觀測時間到發布的平均延遲（秒）")
+    ap.add_argument("--jitter", type=float, default=20, help="每批發布延遲的標準差（秒）")
+    ap.add_argument("--station-jitter", type=float, default=5, help="同一批內各站發布時間的標準差（秒）")
+    ap.add_argument("--offline", type=float, default=0.02, help="不回報的站比例")
+    ap.add_argument("--interval", type=float, default=60, help="固定抓取間隔（秒，FETCH_INTERVAL_MIN）")
+    ap.add_argument("--tick", type=float, default=config.ADAPTIVE_TICK_SEC)
+    ap.add_argument("--fast", type=float, default=config.ADAPTIVE_FAST_SEC)
+    ap.add_argument("--max-backoff", type=float, default=config.ADAPTIVE_MAX_BACKOFF_SEC)
+    ap.add_argument("--per-request", type=int, default=200, help="每個請求約含幾站（依 URL 長度切段）")
+    args = ap.parse_args()
+
+    start = 1_700_000_000.0
+    results = {}
+    for name, adaptive in (("fixed", False), ("adaptive", True)):
+        # 兩種策略看到同一組發布時間
+        sim = Sim(args.stations, args.lag, args.jitter, args.station_jitter, args.offline, random.Random(0))
+        results[name] = run(sim, start, args.hours, adaptive, args)
+
+    print(f"{args.stations} stations, {args.hours:g}h, lag {args.lag:g}±{args.jitter:g}s")
+    print(f"{'':<9}{'polls':>7}{'requests':>10}{'stations':>10}{'fresh mean':>12}{'p95':>8}{'max':>8}")
+    for name, r in results.items():
+        print(f"{name:<9}{r['polls']:>7}{r['requests']:>10}{r['stations']:>10}"
+              f"{r['fresh_mean']:>11.1f}s{r['fresh_p95']:>7.0f}s{r['fresh_max']:>7.0f}s")
+    f, a = results["fixed"], results["adaptive"]
+    print(f"requests x{f['requests'] / max(1, a['requests']):.1f} fewer, "
+          f"stations fetched x{f['stations'] / max(1, a['stations']):.1f} fewer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+啟動時間量測：從啟動 app.py 行程到 /api/data 第一次回傳非空資料。
+
+在暫存目錄建立 record.db，灌入「名單上所有測站 x 過去 N 小時每 10 分鐘」的觀測與上次更新時間，
+再以該目錄為工作目錄啟動 `python app.py --port <空閒埠>`（CWA_TOKEN 設為空字串，不連外），
+每 10 ms 輪詢一次，記錄：
+  - listen   ：第一次收到 HTTP 回應
+  - nonempty ：/api/data（未指定 window，即後端快取）第一次有 rows 且 updated_at 非空
+  - ranked   ：/api/data?window=24h&tab=gust 第一次有 rows
+
+用法（於專案根目錄）：
+    python -m benchmarks.bench_startup --hours 48 --runs 3
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import config
+import modules.db as db
+from utils.observation import Observation
+from utils.stations import get_all_station_ids
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def seed(hours: int, rnd: random.Random) -> int:
+    ids = get_all_station_ids()
+    now = datetime.now(config.TPE).replace(tzinfo=None, second=0, microsecond=0)
+    now -= timedelta(minutes=now.minute % 10)
+    for k in range(hours * 6):
+        t = (now - timedelta(minutes=10 * k)).strftime("%Y-%m-%d %H:%M:%S")
+        db.save_observations([
+            Observation(sid, "zone", "name", t,
+                        round(rnd.uniform(0, 20), 1), 90.0, round(rnd.uniform(0, 30), 1), 90.0, t,
+                        0.0, 25.0, 80.0, 1010.0, 30.0, t, 20.0, t)
+            for sid in ids
+        ])
+    db.set_state("updated_at", datetime.now(config.TPE).isoformat())
+    return len(ids)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as resp:
+            return json.loads(resp.read())
+    except Exception:
+        return None
+
+
+def measure(workdir: str, timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "CWA_TOKEN": ""}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(ROOT / "app.py"), "--port", str(port)],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    marks = {}
+    try:
+        while len(marks) < 3 and time.perf_counter() - t0 < timeout:
+            data = _get(f"{base}/api/data")
+            now = time.perf_counter() - t0
+            if data is not None:
+                marks.setdefault("listen", now)
+                if data.get("rows") and data.get("updated_at"):
+                    marks.setdefault("nonempty", now)
+                ranked = _get(f"{base}/api/data?window=24h&tab=gust")
+                if ranked and ranked.get("rows"):
+                    marks.setdefault("ranked", time.perf_counter() - t0)
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return marks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hours", type=int, default=48, help="預先灌入的歷史長度（小時）")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)   # record.db 位於目前工作目錄
+        try:
+            db.db_init()
+            n = seed(args.hours, random.Random(0))
+        finally:
+            db.db_close()
+            os.chdir(cwd)
+        print(f"seeded {n} stations x {args.hours}h")
+
+        results = [measure(tmp, args.timeout) for _ in range(args.runs)]
+
+    for key in ("listen", "nonempty", "ranked"):
+        values = [r[key] for r in results if key in r]
+        if len(values) < len(results):
+            print(f"{key:<9} not reached in {len(results) - len(values)} of {len(results)} runs")
+        if values:
+            print(f"{key:<9} median {statistics.median(values) * 1000:8.0f} ms  "
+                  f"(min {min(values) * 1000:.0f}, max {max(values) * 1000:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+檢查各 window/tab 組合的時間窗查詢是否走預期的分區索引、長範圍排名是否讀日彙總、
+CSV 匯出是否依主鍵順序掃描單一分區
+（EXPLAIN QUERY PLAN），任何一項不符即以非零狀態結束。
+
+本專案沒有自動測試與 CI，這個檢查需手動執行：改動 modules/db.py 的查詢、索引或分區 / 彙總結構後請跑一次
+（要放進 CI 時直接當成一個步驟執行，依結束代碼判斷）。
+
+用法（於專案根目錄）：
+    python -m benchmarks.check_query_plans
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import config
+import modules.db as db
+
+
+def check() -> list:
+    failures = []
+    for window in db.WINDOWS:
+        for tab in db.TABS:
+            plan = db.explain_window_query(window, tab)
+            expected = db.expected_window_index(window, tab)
+            # 不可整表掃描任何觀測分區
+            ok = (any(expected in step for step in plan)
+                  and not any(step.startswith("SCAN observations") for step in plan))
+            print(f"{'OK  ' if ok else 'FAIL'} window={window:<5} tab={tab:<12} expect={expected}")
+            if not ok:
+                failures.append((window, tab, plan))
+
+    # 自訂範圍：30 天排名應讀日彙總（bucket_end 索引），且不整表掃描任何彙總表或分區
+    now = datetime.now(config.TPE)
+    start = (now - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    end = now.strftime("%Y-%m-%d %H:%M:%S")
+    for tab in db.TABS:
+        plan = db.explain_range_query(start, end, tab)
+        ok = (any(step.startswith("SEARCH rollup_1d USING INDEX") for step in plan)
+              and not any(step.startswith(("SCAN rollup_", "SCAN observations")) for step in plan))
+        print(f"{'OK  ' if ok else 'FAIL'} range=30d   tab={tab:<12} expect=idx_rollup_1d_time")
+        if not ok:
+            failures.append(("range", tab, plan))
+
+    # CSV：整個分區依主鍵順序讀出，不需要暫存排序
+    today = now.date()
+    sql = f"SELECT * FROM {db.partition_name(today)} ORDER BY station_id, obs_time"
+    with db.read_conn() as conn:
+        plan = [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    ok = not any("TEMP B-TREE" in step for step in plan)
+    print(f"{'OK  ' if ok else 'FAIL'} {'csv':<30} expect=primary key order")
+    if not ok:
+        failures.append(("csv", None, plan))
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)   # record.db 位於目前工作目錄
+        try:
+            db.db_init()
+            # 24h 會跨昨天、今天兩個分區
+            today = datetime.now(config.TPE).date()
+            db.ensure_partitions([today - timedelta(days=1), today])
+            failures = check()
+        finally:
+            db.db_close()
+            os.chdir(cwd)
+
+    for what, tab, plan in failures:
+        print(f"\n{what} {tab or ''}:\n  " + "\n  ".join(plan))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+CWA 開放資料 O-A0003-001 / O-A0001-001 的本機替身伺服器（只用標準函式庫），供離線量測與回歸測試。
+
+- 路徑：<任意前綴>/O-A0003-001、<任意前綴>/O-A0001-001；參數同正式 API（Authorization 不檢查，
+  StationId 為逗號分隔的站號，空字串表示全部），回應形狀為 {"success": "true", "records": {"Station": [...]}}
+- 測站：有帶 StationId 時任何站號都回應（所以 app.py 以 stations.xlsx 名單抓取也有資料）；
+  未帶時回傳 F00000 起的 --stations 站（100 ~ 20000）
+- 觀測時間：現在時間向下對齊到 --cadence 秒；同一時槽內同一站的內容固定（可測變更比對），換時槽才變
+- --missing：比例內的站在 O-A0003-001 缺席或風速為 -99，O-A0001-001 才有完整資料（測補值流程）
+- --camel：比例內的回應改用小寫開頭的鍵名（stationId、weatherElement、obsTime、records.location ...）
+- --latency / --latency-jitter：每個請求延遲的毫秒數（平均 / 標準差）
+- --replay DIR：改為回放錄下的 DIR/O-A0003-001.json、DIR/O-A0001-001.json（依 StationId 過濾）
+
+在另一個終端機啟動後，以 CWA_API_BASE 指向它即可讓 app.py 離線運作：
+    python -m benchmarks.fake_cwa --port 8765 --stations 2000 --missing 0.05 --latency 80
+    CWA_TOKEN=fake CWA_API_BASE=http://127.0.0.1:8765/api/v1/rest/datastore python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import config
+
+DATASETS = ("O-A0003-001", "O-A0001-001")
+PREFIX = "/api/v1/rest/datastore"
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+08:00")
+
+
+def make_record(sid: str, obs: datetime, rnd: random.Random, camel: bool, wind_missing: bool) -> dict:
+    """一筆 O-A0003-001 形狀的 record；camel 為小寫開頭的鍵名變體，wind_missing 時風速為 -99。"""
+    gust_at = obs - timedelta(minutes=rnd.choice((0, 10, 20)))
+    hi_at = obs.replace(hour=min(obs.hour, 13), minute=40, second=0)
+    lo_at = obs.replace(hour=min(obs.hour, 5), minute=50, second=0)
+    speed = -99 if wind_missing else round(rnd.uniform(0, 20), 1)
+    if not camel:
+        return {
+            "StationName": f"測站{sid}",
+            "StationId": sid,
+            "ObsTime": {"DateTime": _iso(obs)},
+            "WeatherElement": {
+                "Weather": "陰",
+                "Now": {"Precipitation": round(rnd.uniform(0, 30), 1)},
+                "WindDirection": rnd.choice((0, 45, 90, 180, 270, -99)),
+                "WindSpeed": speed,
+                "AirTemperature": round(rnd.uniform(10, 35), 1),
+                "RelativeHumidity": rnd.randint(30, 100),
+                "AirPressure": round(rnd.uniform(990, 1020), 1),
+                "GustInfo": {
+                    "PeakGustSpeed": round(rnd.uniform(0, 30), 1),
+                    "Occurred_at": {"WindDirection": rnd.choice((45, 90, 270)), "DateTime": _iso(gust_at)},
+                },
+                "DailyExtreme": {
+                    "DailyHigh": {"TemperatureInfo": {
+                        "AirTemperature": round(rnd.uniform(25, 35), 1),
+                        "Occurred_at": {"DateTime": _iso(hi_at)},
+                    }},
+                    "DailyLow": {"TemperatureInfo": {
+                        "AirTemperature": round(rnd.uniform(10, 20), 1),
+                        "Occurred_at": {"DateTime": _iso(lo_at)},
+                    }},
+                },
+            },
+        }
+    return {
+        "stationName": f"測站{sid}",
+        "stationId": sid,
+        "obsTime": {"DateTime": _iso(obs)},
+        "weatherElement": {
+            "now": {"precipitation": str(round(rnd.uniform(0, 30), 1))},
+            "WindDirection": str(rnd.choice((0, 45, 90, 180, 270))),
+            "WindSpeed": str(speed),
+            "airTemperature": str(round(rnd.uniform(10, 35), 1)),
+            "relativeHumidity": str(rnd.randint(30, 100)),
+            "airPressure": str(round(rnd.uniform(990, 1020), 1)),
+            "GustInfo": {
+                "peakGustSpeed": str(round(rnd.uniform(0, 30), 1)),
+                "occurred_at": {"windDirection": str(rnd.choice((45, 90, 270))), "dateTime": _iso(gust_at)},
+            },
+            "dailyExtreme": {
+                "dailyHigh": {"temperatureInfo": {
+                    "airTemperature": str(round(rnd.uniform(25, 35), 1)),
+                    "occurred_at": {"dateTime": _iso(hi_at)},
+                }},
+                "dailyLow": {"temperatureInfo": {
+                    "airTemperature": str(round(rnd.uniform(10, 20), 1)),
+                    "occurred_at": {"dateTime": _iso(lo_at)},
+                }},
+            },
+        },
+    }
+
+
+class FakeCWA:
+    """產生（或回放）回應內容；與 HTTP 無關，也可直接在程式中使用。"""
+
+    def __init__(self, station_ids: list, cadence: int = 600, missing: float = 0.0, camel: float = 0.0,
+                 seed: int = 0, replay: Path | None = None):
+        self.station_ids = station_ids
+        self.cadence = max(1, cadence)
+        self.missing = missing
+        self.camel = camel
+        self.seed = seed
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replay = {}
+        if replay is not None:
+            for ds in DATASETS:
+                data = json.loads((replay / f"{ds}.json").read_text(encoding="utf-8"))
+                recs = data.get("records", {})
+                recs = recs.get("Station") or recs.get("location") or []
+                self._replay[ds] = {str(r.get("StationId") or r.get("stationId")): r for r in recs}
+
+    def slot(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        return int(now // self.cadence) * self.cadence
+
+    def records(self, dataset: str, station_ids: list | None, camel: bool) -> list:
+        if self._replay:
+            table = self._replay[dataset]
+            ids = station_ids if station_ids else list(table)
+            return [table[sid] for sid in ids if sid in table]
+
+        slot = self.slot()
+        obs = datetime.fromtimestamp(slot, config.TPE).replace(tzinfo=None)
+        ids = station_ids if station_ids else self.station_ids
+        out = []
+        for sid in ids:
+            # 同一時槽、同一站的內容固定；缺值與否也固定，讓 API2 補值可預測
+            rnd = random.Random(f"{self.seed}:{sid}:{slot}")
+            lacking = rnd.random() < self.missing
+            if dataset == "O-A0003-001" and lacking and rnd.random() < 0.5:
+                continue   # 整站缺席
+            wind_missing = dataset == "O-A0003-001" and lacking
+            out.append(make_record(sid, obs, rnd, camel, wind_missing))
+        return out
+
+    def payload(self, dataset: str, station_ids: list | None) -> dict:
+        with self._lock:
+            camel = self._rnd.random() < self.camel
+        recs = self.records(dataset, station_ids, camel)
+        return {"success": "true", "records": {"location" if camel else "Station": recs}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive，與 requests.Session 行為一致
+    fake: FakeCWA = None
+    latency_ms = 0.0
+    latency_jitter_ms = 0.0
+    stats = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        dataset = url.path.rstrip("/").rsplit("/", 1)[-1]
+        if dataset not in DATASETS:
+            self.send_error(404)
+            return
+        qs = parse_qs(url.query, keep_blank_values=True)
+        ids = [s for s in (qs.get("StationId") or [""])[0].split(",") if s]
+        if self.latency_ms or self.latency_jitter_ms:
+            time.sleep(max(0.0, random.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000)
+        body = json.dumps(self.fake.payload(dataset, ids), ensure_ascii=False).encode("utf-8")
+        with self.stats["lock"]:
+            self.stats["requests"][dataset] = self.stats["requests"].get(dataset, 0) + 1
+            self.stats["bytes"] += len(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(fake: FakeCWA, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+          latency_jitter_ms: float = 0.0) -> tuple:
+    """在背景執行緒啟動伺服器，回傳 (server, CWA_API_BASE)；server.stats 為請求數 / 傳輸量統計。"""
+    stats = {"lock": threading.Lock(), "requests": {}, "bytes": 0}
+    handler = type("Handler", (_Handler,), {
+        "fake": fake, "latency_ms": latency_ms, "latency_jitter_ms": latency_jitter_ms, "stats": stats,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, name="fake-cwa", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{PREFIX}"
+
+
+def synthetic_ids(n: int) -> list:
+    return [f"F{i:05d}" for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CWA O-A0003-001 / O-A0001-001 本機替身")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--stations", type=int, default=1000, help="合成測站數（100 ~ 20000）")
+    ap.add_argument("--cadence", type=int, default=600, help="觀測間隔（秒）；每個時槽換一次內容")
+    ap.add_argument("--missing", type=float, default=0.03, help="O-A0003-001 缺站或缺風速的比例")
+    ap.add_argument("--camel", type=float, default=0.0, help="改用小寫開頭鍵名的回應比例")
+    ap.add_argument("--latency", type=float, default=0.0, help="每個請求的平均延遲（毫秒）")
+    ap.add_argument("--latency-jitter", type=float, default=0.0, help="延遲的標準差（毫秒）")
+    ap.add_argument("--replay", type=Path, help="回放此目錄下錄好的 O-A0003-001.json / O-A0001-001.json")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    ids = synthetic_ids(args.stations)
+    fake = FakeCWA(ids, args.cadence, args.missing, args.camel, args.seed, args.replay)
+    server, base = serve(fake, args.host, args.port, args.latency, args.latency_jitter)
+    print(f"fake CWA serving {len(ids)} stations at {base}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
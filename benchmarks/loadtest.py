@@ -0,0 +1,350 @@
+"""
+/api/data 與 SocketIO 推播的負載測試：模擬 N 個瀏覽器，量測延遲百分位、錯誤率與伺服器 CPU。
+
+每個模擬客戶端依 static/js/index.js 的流程：
+  1) GET /api/data?window&tab&group=全部&format=compact（首次載入）
+  2) 以 WebSocket 連上 /socket.io，送出 subscribe（同樣的 window/tab/group/format），收到 board_data
+  3) 之後每輪更新收 board_delta
+--legacy 模擬舊版前端：連線後不訂閱，收到廣播的 data_update 就重打一次 /api/data（每輪更新的請求湧入）。
+window/tab 在 now/1h/24h/today x avg-wind/gust 中隨機分配，客戶端在 --ramp 秒內陸續啟動。
+
+未指定 --url 時在本機另起伺服器行程（暫存目錄、假抓取器：每 --update-sec 秒以 --change 比例的站產生新觀測，
+直接呼叫 refresh_cache，不連 CWA），並由它回報每輪開始的時間，因此可量測：
+  - http      ：/api/data 回應時間（首次載入）
+  - subscribe ：送出 subscribe 到收到 board_data
+  - delta     ：伺服器開始該輪更新到客戶端收到 board_delta（推播扇出延遲）
+  - legacy    ：（--legacy）伺服器開始該輪更新到客戶端重打的 /api/data 回來
+  - 錯誤      ：連線失敗、HTTP 錯誤、非預期斷線、訂閱期間漏收的 delta
+  - 伺服器 CPU（psutil；平均 / 最大）與每輪 refresh_cache 耗時
+指定 --url 時對既有伺服器只量 http / subscribe 與錯誤（CPU 需另給 --server-pid）。
+負載產生器與伺服器在同一台機器上會互搶 CPU，量上限時請分開兩台執行。
+
+需要額外套件：pip install -r benchmarks/requirements.txt
+用法（於專案根目錄）：
+    python -m benchmarks.loadtest --clients 200 --duration 60
+    python -m benchmarks.loadtest --clients 500 --duration 60 --stations 2000 --legacy
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+WINDOWS = ("now", "1h", "24h", "today")
+TABS = ("avg-wind", "gust")
+GROUP = "全部"
+
+
+# ---------- 伺服器端（--serve，由負載測試自行啟動） ----------
+def serve(args) -> None:
+    import config
+    import modules.db as db
+    import modules.persist as persist
+    import modules.push as push
+    import routes   # noqa: F401  註冊 HTTP 路由
+    import sockets  # noqa: F401  註冊 SocketIO 事件
+    import utils.fetcher as fetcher
+    import utils.scheduler_jobs as scheduler_jobs
+    import utils.stations as stations
+    from modules.ringbuffer import RING
+    from utils.observation import Observation
+
+    os.chdir(tempfile.mkdtemp(prefix="loadtest-"))   # record.db、csv/ 寫在暫存目錄
+    if args.stations:
+        from benchmarks.bench_pipeline import install_registry
+        install_registry(args.stations)
+    ids = stations.get_all_station_ids()
+    rnd = random.Random(0)
+    last = {}
+
+    def fake_fetch(station_ids=None):
+        """假抓取器：--change 比例的站換成新觀測（現在時間、隨機數值），其餘沿用上一輪。"""
+        t = datetime.now(config.TPE).strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        for sid in station_ids or ids:
+            obs = last.get(sid)
+            if obs is None or rnd.random() < args.change:
+                meta = stations.get_station_meta(sid) or {}
+                obs = last[sid] = Observation(
+                    sid, meta.get("zone"), meta.get("name"), t,
+                    round(rnd.uniform(0, 20), 1), 90.0, round(rnd.uniform(0, 30), 1), 90.0, t,
+                    round(rnd.uniform(0, 50), 1), round(rnd.uniform(10, 35), 1), 80.0, 1010.0, 30.0, t, 20.0, t)
+            rows.append(obs)
+        return rows
+
+    fetcher.fetch_data = fake_fetch   # refresh_cache 以 fetcher.fetch_data 呼叫
+    config.CWA_TOKEN = config.CWA_TOKEN or "loadtest"
+    db.db_init()
+    scheduler_jobs.warm_start()
+    RING.load_from_db()
+    persist.start()
+    push.start()
+    scheduler_jobs.refresh_cache()
+
+    def updater():
+        while True:
+            time.sleep(args.update_sec)
+            t0 = time.time()
+            scheduler_jobs.refresh_cache()
+            with config.DATA_LOCK:
+                updated_at = config.DATA_CACHE["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
+            # 給負載測試端對應 board_delta 的 updated_at
+            print(f"UPDATE {t0:.6f} {updated_at.replace(' ', 'T')} {(time.time() - t0) * 1000:.1f}", flush=True)
+
+    threading.Thread(target=updater, name="loadtest-updater", daemon=True).start()
+    print(f"READY {len(ids)}", flush=True)
+    config.socketio.run(config.app, host="127.0.0.1", port=args.port, debug=False,
+                        use_reloader=False, log_output=False)
+
+
+# ---------- 負載產生端 ----------
+class Stats:
+    def __init__(self):
+        self.lat = {"http": [], "subscribe": [], "delta": [], "legacy": []}
+        self.errors = {"connect": 0, "http": 0, "disconnect": 0, "missed_delta": 0}
+        self.updates = {}        # updated_at -> 伺服器開始該輪的 epoch 秒
+        self.refresh_ms = []
+        self.cpu = []
+
+
+def pct(values: list, p: float) -> float:
+    if not values:
+        return float("nan")
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * p / 100))]
+
+
+async def client(i: int, args, stats: Stats, session, stop: asyncio.Event) -> None:
+    import aiohttp
+    import socketio
+
+    rnd = random.Random(i)
+    window, tab = rnd.choice(WINDOWS), rnd.choice(TABS)
+    query = urlencode({"window": window, "tab": tab, "group": GROUP, "format": "compact"})
+
+    async def get_data() -> bool:
+        t = time.perf_counter()
+        try:
+            async with session.get(f"{args.url}/api/data?{query}") as resp:
+                await resp.read()
+                ok = resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            stats.lat["http"].append((time.perf_counter() - t) * 1000)
+        else:
+            stats.errors["http"] += 1
+        return ok
+
+    await get_data()
+
+    sio = socketio.AsyncClient(reconnection=False)
+    subscribed = asyncio.Event()
+    received = set()
+    state = {"sent": 0.0, "since": None, "closing": False}
+
+    @sio.on("board_data")
+    async def on_board_data(data):
+        if not subscribed.is_set():
+            stats.lat["subscribe"].append((time.perf_counter() - state["sent"]) * 1000)
+            state["since"] = time.time()
+            subscribed.set()
+
+    @sio.on("board_delta")
+    async def on_board_delta(data):
+        now = time.time()
+        key = (data.get("updated_at") or "").replace(" ", "T")
+        received.add(key)
+        t0 = stats.updates.get(key)
+        if t0 is not None and not args.legacy:
+            stats.lat["delta"].append((now - t0) * 1000)
+
+    @sio.on("data_update")
+    async def on_data_update(data):
+        if not args.legacy:
+            return
+        key = (data.get("updated_at") or "").replace(" ", "T")
+        t0 = stats.updates.get(key)
+        if await get_data() and t0 is not None:
+            stats.lat["legacy"].append((time.time() - t0) * 1000)
+
+    @sio.on("disconnect")
+    async def on_disconnect(*_):
+        if not state["closing"]:
+            stats.errors["disconnect"] += 1
+
+    try:
+        await sio.connect(args.url, transports=["websocket"], socketio_path="socket.io", wait_timeout=10)
+        if not args.legacy:   # 舊版前端只連線、聽 data_update，不訂閱 room
+            state["sent"] = time.perf_counter()
+            await sio.emit("subscribe", {"window": window, "tab": tab, "group": GROUP, "format": "compact"})
+            await asyncio.wait_for(subscribed.wait(), timeout=10)
+    except Exception:
+        stats.errors["connect"] += 1
+        await sio.disconnect()
+        return
+
+    await stop.wait()
+    state["closing"] = True
+    if sio.connected:
+        await sio.disconnect()
+
+    if not args.legacy and state["since"] is not None:
+        # 訂閱之後、結束前一輪以前開始的更新都應該收到 delta（本機模式每輪都有站變更）
+        horizon = time.time() - args.update_sec
+        expected = {k for k, t0 in stats.updates.items() if state["since"] < t0 < horizon}
+        stats.errors["missed_delta"] += len(expected - received)
+
+
+async def read_server(proc, stats: Stats, ready: asyncio.Event) -> None:
+    while True:
+        line = await proc.stdout.readline()
+        if not line:
+            return
+        parts = line.decode().split()
+        if parts and parts[0] == "READY":
+            ready.set()
+        elif parts and parts[0] == "UPDATE":
+            stats.updates[parts[2]] = float(parts[1])
+            stats.refresh_ms.append(float(parts[3]))
+
+
+async def sample_cpu(pid: int, stats: Stats, stop: asyncio.Event) -> None:
+    import psutil
+    proc = psutil.Process(pid)
+    proc.cpu_percent(None)
+    while not stop.is_set():
+        await asyncio.sleep(0.5)
+        try:
+            stats.cpu.append(proc.cpu_percent(None))
+        except psutil.Error:
+            return
+
+
+async def wait_listening(url: str, timeout: float) -> None:
+    import aiohttp
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as s:
+        while True:
+            try:
+                async with s.get(f"{url}/api/status") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("server did not start")
+            await asyncio.sleep(0.1)
+
+
+async def run(args) -> Stats:
+    import aiohttp
+
+    stats = Stats()
+    proc = None
+    tasks = []
+    pid = args.server_pid
+    if args.url is None:
+        port = args.port or _free_port()
+        args.url = f"http://127.0.0.1:{port}"
+        cmd = [sys.executable, "-m", "benchmarks.loadtest", "--serve", "--port", str(port),
+               "--stations", str(args.stations), "--update-sec", str(args.update_sec), "--change", str(args.change)]
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.DEVNULL)
+        ready = asyncio.Event()
+        tasks.append(asyncio.create_task(read_server(proc, stats, ready)))
+        await asyncio.wait_for(ready.wait(), timeout=120)
+        await wait_listening(args.url, 60)
+        pid = proc.pid
+
+    stop = asyncio.Event()
+    if pid:
+        tasks.append(asyncio.create_task(sample_cpu(pid, stats, stop)))
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.http_timeout)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            clients = []
+            for i in range(args.clients):
+                clients.append(asyncio.create_task(client(i, args, stats, session, stop)))
+                await asyncio.sleep(args.ramp / max(1, args.clients))
+            await asyncio.sleep(max(0.0, args.duration - args.ramp))
+            stop.set()
+            await asyncio.gather(*clients, return_exceptions=True)
+    finally:
+        stop.set()
+        if proc is not None:
+            proc.terminate()
+            await proc.wait()
+        for t in tasks:
+            t.cancel()
+    return stats
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def report(args, stats: Stats) -> dict:
+    server = f" update every {args.update_sec:g}s change={args.change:g}" if stats.updates else f" {args.url}"
+    print(f"clients={args.clients} duration={args.duration:g}s{server} "
+          f"{'legacy (data_update -> /api/data)' if args.legacy else 'board_delta'}")
+    print(f"{'latency ms':<11}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    out = {"latency_ms": {}, "errors": dict(stats.errors)}
+    for name, v in stats.lat.items():
+        if not v:
+            continue
+        row = {"n": len(v), "p50": pct(v, 50), "p95": pct(v, 95), "p99": pct(v, 99), "max": max(v)}
+        out["latency_ms"][name] = row
+        print(f"{name:<11}{row['n']:>7}{row['p50']:9.1f}{row['p95']:9.1f}{row['p99']:9.1f}{row['max']:9.1f}")
+    requests = len(stats.lat["http"]) + stats.errors["http"]
+    print("errors     " + "  ".join(f"{k}={v}" for k, v in stats.errors.items())
+          + (f"  (http error rate {stats.errors['http'] / requests:.2%})" if requests else ""))
+    if stats.refresh_ms:
+        out["refresh_ms"] = {"n": len(stats.refresh_ms), "p50": pct(stats.refresh_ms, 50), "max": max(stats.refresh_ms)}
+        print(f"refresh_cache {len(stats.refresh_ms)} runs: p50 {out['refresh_ms']['p50']:.0f} ms, "
+              f"max {out['refresh_ms']['max']:.0f} ms")
+    if stats.cpu:
+        out["server_cpu_pct"] = {"mean": sum(stats.cpu) / len(stats.cpu), "max": max(stats.cpu)}
+        print(f"server CPU mean {out['server_cpu_pct']['mean']:.0f}%  max {out['server_cpu_pct']['max']:.0f}%")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--duration", type=float, default=60, help="總秒數（含 ramp）")
+    ap.add_argument("--ramp", type=float, default=10, help="在幾秒內陸續啟動所有客戶端")
+    ap.add_argument("--legacy", action="store_true", help="收到 data_update 就重打 /api/data（舊版前端）")
+    ap.add_argument("--url", help="對既有伺服器測試（例如 http://127.0.0.1:5000）；未指定時自行啟動本機伺服器")
+    ap.add_argument("--server-pid", type=int, help="--url 模式下要量 CPU 的伺服器行程")
+    ap.add_argument("--port", type=int, help="本機伺服器的埠（預設取空閒埠）")
+    ap.add_argument("--stations", type=int, default=0, help="本機伺服器改用 n 站的合成名單（0：stations.xlsx）")
+    ap.add_argument("--update-sec", type=float, default=5, help="本機伺服器每幾秒更新一輪")
+    ap.add_argument("--change", type=float, default=0.3, help="每輪有新觀測的站比例")
+    ap.add_argument("--http-timeout", type=float, default=30)
+    ap.add_argument("--json", help="另把結果寫成 JSON 檔")
+    ap.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    stats = asyncio.run(run(args))
+    out = report(args, stats)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "serve"}, **out}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -38,13 +38,29 @@ CWA_TOKEN = os.getenv("CWA_TOKEN", "").strip()
 
 
 # ---------- 常數 ----------
-API1 = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/O-A0003-001"
-API2 = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/O-A0001-001"
+# 資料集的根網址；可改指向本機的替身伺服器（benchmarks/fake_cwa.py）做離線量測
+CWA_API_BASE = os.getenv("CWA_API_BASE", "https://opendata.cwa.gov.tw/api/v1/rest/datastore").strip().rstrip("/")
+API1 = f"{CWA_API_BASE}/O-A0003-001"
+API2 = f"{CWA_API_BASE}/O-A0001-001"
 FIELDS = "Now,WindDirection,WindSpeed,AirTemperature,RelativeHumidity,AirPressure,GustInfo,DailyHigh,DailyLow"
 FETCH_TIMEOUT = int(os.getenv("FETCH_TIMEOUT", 15))
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 4))      # 同時抓取的分段請求數上限
+FETCH_MAX_URL_LEN = int(os.getenv("FETCH_MAX_URL_LEN", 2000))   # 單一請求 URL 長度上限（決定 StationId 分段大小）
 FETCH_INTERVAL_MIN = int(os.getenv("FETCH_INTERVAL_MIN", 1))
+ADAPTIVE_POLLING = bool(int(os.getenv("ADAPTIVE_POLLING", 0)))   # 1：依各站發布節奏只抓到期的站（取代固定間隔全量抓取）
+ADAPTIVE_TICK_SEC = int(os.getenv("ADAPTIVE_TICK_SEC", 10))            # 每幾秒檢查一次有沒有到期的站
+ADAPTIVE_FAST_SEC = int(os.getenv("ADAPTIVE_FAST_SEC", 30))            # 預估發布時間前後的重查間隔
+ADAPTIVE_MAX_BACKOFF_SEC = int(os.getenv("ADAPTIVE_MAX_BACKOFF_SEC", 600))   # 等不到新觀測時退避的上限
 CSV_DIR_NAME = os.getenv("CSV_DIR_NAME", "csv").strip()
+CSV_COMPACT_INTERVAL_MIN = int(os.getenv("CSV_COMPACT_INTERVAL_MIN", 10))   # 每幾分鐘整檔重寫有列被改過的 CSV
 STATION_LIST_FILENAME = os.getenv("STATION_LIST_FILENAME", "stations.xlsx").strip()
+STATIONS_RELOAD_INTERVAL_SEC = int(os.getenv("STATIONS_RELOAD_INTERVAL_SEC", 30))   # 每幾秒檢查測站名單檔是否變更（0 不檢查）
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", 4))      # SQLite 讀取連線池大小
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 16384))    # 每條連線的 page cache（KiB）
+DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", 256))        # 每條連線的 mmap 大小（MiB）
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 90))           # 觀測資料保留天數（超過的每日分區整表刪除）
+LATEST_MAX_AGE_HOURS = int(os.getenv("LATEST_MAX_AGE_HOURS", 48))  # window=now 只列最新一筆在幾小時內的站（停報的站每日清理時移除）
+PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", 30))   # 背景寫庫 / CSV 佇列最多積壓幾輪（滿了抓取會等待）
 
 
 # ---------- Flask / SocketIO ----------
@@ -62,7 +78,7 @@ socketio = SocketIO(
 DATA_LOCK = threading.Lock()
 DATA_CACHE = {
     "updated_at": None,  # datetime in TPE
-    "rows": []           # 最新一次抓到的 rows (list[dict])
+    "rows": []           # 最新一次抓到的 rows (list[Observation])
 }
 
 
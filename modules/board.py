@@ -0,0 +1,377 @@
+"""
+/api/data 回應的組裝與預先序列化快取。
+
+資料只在 refresh_cache 之後才會改變，因此同一 (window, tab, updated_at) 的排行只查詢一次，
+再依 group / sort / limit / offset 在伺服器端過濾、排序、分頁；
+每種參數組合的回應只序列化一次，存成 JSON bytes（gzip/deflate 版本在第一次被要求時壓縮後保存）；
+refresh_cache 更新快取後呼叫 invalidate() 清掉舊回應；由 SQL 組出的排行（自訂範圍、記憶體尚未載入時）
+在背景寫庫完成前看不到本輪資料，modules/persist 寫完後再清一次。
+"""
+import gzip
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import config
+import modules.db as db
+from modules.latest import LATEST
+from modules.ringbuffer import RING
+from utils.observation import Observation
+from utils.stations import (load_station_groups, get_station_meta, stations_in_group,
+                            load_station_table, load_station_positions)
+
+# 可排序的欄位（sort=欄位 或 -欄位；- 表示由大到小）
+SORTABLE = frozenset(Observation.JSON_FIELDS)
+# 單次最多回傳筆數；超過以此為準
+MAX_LIMIT = 1000
+# 每輪最多保存的序列化回應數（limit/offset 組合由使用者決定，需設上限；超過時丟掉最久未用的）
+MAX_CACHED_RESPONSES = 512
+# 每輪最多保存的完整排行數（超過時丟掉最久未用的）
+MAX_CACHED_PAYLOADS = 64
+# 精簡格式（format=compact）各分頁的風向欄位；其他分頁沒有風向欄
+_DIR_FIELDS = {"avg-wind": "dir", "gust": "gust_dir"}
+
+
+class CachedResponse:
+    """一份序列化好的回應：原始 bytes、ETag，以及按需產生的壓縮版本。"""
+    __slots__ = ("body", "etag", "updated_at", "_encoded")
+
+    def __init__(self, body: bytes, updated_at: datetime | None):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.updated_at = updated_at
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str | None) -> bytes:
+        """回傳指定編碼（'gzip' | 'deflate' | None）的內容；壓縮結果會保存下來重用。"""
+        if not encoding:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == "gzip":
+                data = gzip.compress(self.body, compresslevel=6, mtime=0)
+            else:
+                data = zlib.compress(self.body, 6)
+            self._encoded[encoding] = data
+        return data
+
+
+_CACHE: OrderedDict = OrderedDict()
+# (window, tab, updated_at) -> 完整排行 payload（各種 group/sort/分頁共用同一次查詢）；依使用順序排列
+_PAYLOADS: OrderedDict = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+# invalidate() 每次加一：組裝期間被清過（例如背景寫庫剛完成）的結果不存
+_GENERATION = 0
+_META_RESPONSE: CachedResponse | None = None
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def resolve_range(start: str | None, end: str | None) -> Tuple[str | None, str | None]:
+    """
+    檢查自訂時間範圍 (start, end]（皆為 %Y-%m-%d %H:%M:%S）；end 省略為現在。
+    沒有 start 時回傳 (None, None)，表示使用 window；範圍無效拋出 ValueError。
+    """
+    if start is None:
+        if end is not None:
+            raise ValueError("end requires start")
+        return None, None
+    if end is None:
+        end = datetime.now(config.TPE).strftime("%Y-%m-%d %H:%M:%S")
+    if start >= end:
+        raise ValueError("start must be earlier than end")
+    return start, end
+
+
+def _cacheable_range(start: str | None, end: str | None) -> bool:
+    """
+    自訂範圍 (start, end]（已經過 resolve_range）只有兩端都對齊 10 分鐘才快取：
+    任意到秒的範圍（含省略 end、以現在為終點）每次重查，不佔快取、也不會把「現在」固定在第一次查詢時。
+    """
+    return start is None or (start.endswith("0:00") and end.endswith("0:00"))
+
+
+def _attach_station_meta(rows: List[Dict[str, Any]]) -> None:
+    """補上 zone / groups。"""
+    for row in rows:
+        sid = row.get("station_id")
+        meta = get_station_meta(sid)
+        if not meta:
+            continue
+        row["zone"] = meta.get("zone")
+        row["groups"] = meta.get("groups", [])
+
+
+def build_payload(window: str | None, tab: str | None, start: str | None = None,
+                  end: str | None = None) -> Tuple[Dict[str, Any], datetime | None, bool]:
+    """
+    組出 /api/data 的內容。
+    指定 start/end（已經過 resolve_range）時改排任意時間範圍 (start, end]，忽略 window；
+    payload 另附 start、end 與 resolution（讀了哪些彙總表 / 原始片段）。
+    回傳 (payload, updated_at, 可否快取)；查詢失敗退回後端快取時不可快取。
+    """
+    with config.DATA_LOCK:
+        updated_at = config.DATA_CACHE["updated_at"]
+        cached_rows = config.DATA_CACHE["rows"]
+
+    updated_str = updated_at.strftime("%Y-%m-%d %H:%M:%S") if updated_at else None
+
+    all_groups, _, _ = load_station_groups()
+
+    if start is not None:
+        tab = tab if tab in db.TABS else "avg-wind"
+        # 自訂範圍沒有「最新一輪」可退回，查詢失敗直接拋出
+        rows = db.query_rows_for_range(start, end, tab)
+        _attach_station_meta(rows)
+        return {
+            "updated_at": updated_str,
+            "groups": all_groups,
+            "start": start,
+            "end": end,
+            "resolution": [
+                {"source": src, "start": lo, "end": hi} for src, lo, hi in db.range_sources(start, end)
+            ],
+            "rows": rows
+        }, updated_at, True
+
+    if window and tab:
+        try:
+            # now 取記憶體中的每站最新一筆（不必等背景寫庫）；1h/24h/today 由記憶體環狀緩衝計算；
+            # 尚未載入 / 緩衝仍冷才查 SQL
+            if window == "now" and LATEST.is_loaded():
+                rows = LATEST.query(tab)
+            else:
+                rows = RING.query_window(window, tab)
+            if rows is None:
+                rows = db.query_rows_for_window(window, tab)
+            _attach_station_meta(rows)
+            return {
+                "updated_at": updated_str,
+                "groups": all_groups,
+                "rows": rows
+            }, updated_at, True
+        except Exception as e:
+            config.app.logger.exception(f"/api/data query failed: {e}")
+            # 失敗退回快取
+            return {
+                "updated_at": updated_str,
+                "groups": all_groups,
+                "rows": [r.to_dict() for r in cached_rows]
+            }, updated_at, False
+
+    # 原行為：回傳快取（最新一輪）；快取內為 Observation，到這裡才轉成 dict
+    return {
+        "updated_at": updated_str,
+        "groups": all_groups,
+        "rows": [r.to_dict() for r in cached_rows]
+    }, updated_at, True
+
+
+def normalize_view(window: str | None, tab: str | None) -> Tuple[str | None, str | None]:
+    """
+    快取鍵用的 window / tab（同 sockets.on_subscribe）：不認得的 window 視為 now、tab 視為 avg-wind，
+    查詢結果與原本相同，但任意字串不會各自佔一份快取。未指定的維持 None。
+    """
+    if window:
+        window = window if window in db.WINDOWS else "now"
+    if tab:
+        tab = tab if tab in db.TABS else "avg-wind"
+    return window or None, tab or None
+
+
+def parse_sort(tab: str | None, sort: str | None) -> Tuple[str, bool]:
+    """
+    解析 sort 參數，回傳 (欄位, 是否由大到小)。
+    未指定或欄位不可排序時，以分頁的排名指標由大到小（與原本前端排序相同）。
+    """
+    if sort:
+        desc = sort.startswith("-")
+        field = sort.lstrip("-+ ")
+        if field in SORTABLE:
+            return field, desc
+    return db.tab_metric(tab or "avg-wind"), True
+
+
+def _sort_value(v):
+    # 數字（或可轉數字的字串）依數值、其餘依字串比較，避免混型別無法排序
+    try:
+        return (0, float(v), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(v))
+
+
+def rank_rows(rows: List[Dict[str, Any]], field: str, desc: bool) -> List[Dict[str, Any]]:
+    """依 field 排序，空值一律排最後；同值維持原順序。"""
+    present = [r for r in rows if r.get(field) is not None]
+    missing = [r for r in rows if r.get(field) is None]
+    present.sort(key=lambda r: _sort_value(r[field]), reverse=desc)
+    return present + missing
+
+
+def select_rows(rows: List[Dict[str, Any]], tab: str | None, group: str | None,
+                sort: str | None = None) -> Tuple[List[Dict[str, Any]], str, bool]:
+    """依群組過濾（預先建好的群組索引）並排名，回傳 (rows, 排序欄位, 是否由大到小)。"""
+    members = stations_in_group(group)
+    if members is not None:
+        rows = [r for r in rows if r.get("station_id") in members]
+    field, desc = parse_sort(tab, sort)
+    return rank_rows(rows, field, desc), field, desc
+
+
+def get_payload(window: str | None, tab: str | None, start: str | None = None,
+                end: str | None = None) -> Tuple[Dict[str, Any], datetime | None, bool]:
+    """
+    同 build_payload，但同一 (window, tab, start, end, updated_at) 的完整排行只查詢一次。
+    start/end 為使用者給的範圍（end 可省略，表示到現在）；範圍無效拋出 ValueError。
+    """
+    window, tab = normalize_view(window, tab)
+    start, end = resolve_range(start, end)
+    with config.DATA_LOCK:
+        updated_at = config.DATA_CACHE["updated_at"]
+    key = (window or "", tab or "", start or "", end or "", updated_at.isoformat() if updated_at else None)
+    with _CACHE_LOCK:
+        payload = _PAYLOADS.get(key)
+        if payload is not None:
+            _PAYLOADS.move_to_end(key)
+        generation = _GENERATION
+    if payload is not None:
+        return payload, updated_at, True
+
+    payload, built_at, cacheable = build_payload(window, tab, start, end)
+    if cacheable and built_at == updated_at and _cacheable_range(start, end):
+        with _CACHE_LOCK:
+            if generation == _GENERATION:
+                _PAYLOADS[key] = payload
+                while len(_PAYLOADS) > MAX_CACHED_PAYLOADS:
+                    _PAYLOADS.popitem(last=False)
+    return payload, built_at, cacheable
+
+
+def encode_compact(rows: List[Dict[str, Any]], tab: str | None) -> Dict[str, Any]:
+    """
+    把排行列轉成欄式精簡格式：
+    {"meta_version", "fields": {"value": 指標欄位, "dir": 風向欄位或 None},
+     "times": [去重後的時間字串], "cols": {"idx": [...], "value": [...], "dir": [...], "time": [...]}}
+    idx 為 /api/stations/meta 中的測站索引、time 為 times 的索引；zone/name/groups 由 meta 表還原。
+    不在 meta 表中的測站無法以索引表示，會被略過。
+    """
+    tab = tab or "avg-wind"
+    value_field = db.tab_metric(tab)
+    dir_field = _DIR_FIELDS.get(tab)
+    positions = load_station_positions()
+    times: List[str | None] = []
+    time_pos: Dict[str | None, int] = {}
+    idx, values, dirs, tcol = [], [], [], []
+    for r in rows:
+        pos = positions.get(r.get("station_id"))
+        if pos is None:
+            continue
+        t = r.get("time")
+        k = time_pos.get(t)
+        if k is None:
+            k = time_pos[t] = len(times)
+            times.append(t)
+        idx.append(pos)
+        values.append(r.get(value_field))
+        if dir_field:
+            dirs.append(r.get(dir_field))
+        tcol.append(k)
+    cols = {"idx": idx, "value": values, "time": tcol}
+    if dir_field:
+        cols["dir"] = dirs
+    return {
+        "meta_version": load_station_table()["version"],
+        "fields": {"value": value_field, "dir": dir_field},
+        "times": times,
+        "cols": cols,
+    }
+
+
+def get_meta_response() -> CachedResponse:
+    """/api/stations/meta 的序列化回應；ETag 即 meta 版本雜湊。"""
+    global _META_RESPONSE
+    table = load_station_table()
+    entry = _META_RESPONSE
+    if entry is None or entry.etag != table["version"]:
+        entry = CachedResponse(_dumps(table), None)
+        entry.etag = table["version"]
+        _META_RESPONSE = entry
+    return entry
+
+
+def get_response(window: str | None, tab: str | None, group: str | None = None,
+                 sort: str | None = None, limit: int | None = None,
+                 offset: int = 0, fmt: str | None = None, start: str | None = None,
+                 end: str | None = None) -> CachedResponse:
+    """
+    取得目前的序列化回應；命中時只是一次 dict 查找。
+    rows 依 group 過濾、依 sort 排名後取 [offset, offset+limit)，
+    另附 total（過濾後總筆數）、offset、limit 與 sort 供前端分頁與排名編號。
+    fmt="compact" 時 rows 改以 encode_compact 的欄式格式回傳。
+    start/end 為自訂時間範圍（省略 end 為現在），範圍無效拋出 ValueError。
+    """
+    fmt = "compact" if fmt == "compact" else "rows"
+    window, tab = normalize_view(window, tab)
+    start, end = resolve_range(start, end)
+    # 不存在的群組視為「全部」（同 sockets.on_subscribe），任意字串不會各自佔一份快取
+    group = group if group in load_station_groups()[0] else "全部"
+    field, desc = parse_sort(tab, sort)
+    sort = ("-" if desc else "") + field
+    offset = max(0, offset or 0)
+    limit = None if limit is None or limit <= 0 else min(limit, MAX_LIMIT)
+
+    with config.DATA_LOCK:
+        updated_at = config.DATA_CACHE["updated_at"]
+    key = (window or "", tab or "", updated_at.isoformat() if updated_at else None,
+           group, sort, limit, offset, fmt, start or "", end or "")
+
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None:
+            _CACHE.move_to_end(key)
+        generation = _GENERATION
+    if entry is not None:
+        return entry
+
+    payload, built_at, cacheable = get_payload(window, tab, start, end)
+    rows, field, desc = select_rows(payload["rows"], tab, group, sort)
+    page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+    body = {
+        "updated_at": payload["updated_at"],
+        "groups": payload["groups"],
+        "group": group,
+        "sort": ("-" if desc else "") + field,
+        "total": len(rows),
+        "offset": offset,
+        "limit": limit,
+    }
+    if "start" in payload:
+        body.update(start=payload["start"], end=payload["end"], resolution=payload["resolution"])
+    if fmt == "compact":
+        body["format"] = "compact"
+        body.update(encode_compact(page, tab))
+    else:
+        body["rows"] = page
+    entry = CachedResponse(_dumps(body), built_at)
+    # 組裝期間若剛好更新過資料或清過快取，key 已過期，不要存
+    if cacheable and built_at == updated_at and _cacheable_range(start, end):
+        with _CACHE_LOCK:
+            if generation == _GENERATION:
+                _CACHE[key] = entry
+                while len(_CACHE) > MAX_CACHED_RESPONSES:
+                    _CACHE.popitem(last=False)
+    return entry
+
+
+def invalidate() -> None:
+    """清除所有已序列化的回應（refresh_cache 更新資料後、背景寫庫完成後呼叫）。"""
+    global _GENERATION
+    with _CACHE_LOCK:
+        _GENERATION += 1
+        _CACHE.clear()
+        _PAYLOADS.clear()
@@ -0,0 +1,185 @@
+"""
+每日 CSV（YYYYMMDD.csv）輸出。
+
+每輪只把本輪寫入資料庫的觀測「附加」到對應日期的 CSV，I/O 與新資料量成正比：
+- 每個日期在本程序第一次輸出時先整檔重寫一次（資料庫為準），並記下已輸出的 (測站, 觀測時間)；
+- 之後新的 (測站, 觀測時間) 直接附加在檔尾；
+- 已輸出的列若被 upsert 改了內容，不重複附加，而是把該日標記為 dirty，
+  由排程定期（compact_dirty_days）整檔重寫；
+- 觀測時間恰為 00:00:00 的資料歸入前一天（csv_day）。
+附加的列依寫入順序排列；整檔重寫（含修復指令 python app.py --rebuild-csv YYYY-MM-DD）則依測站、時間排序。
+"""
+import csv
+import threading
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+import config
+import modules.db as db
+from utils.observation import Observation
+
+CSV_HEADER = [
+    "測站代碼", "鄉鎮市區", "測站名稱", "觀測時間",
+    "平均風風速(m/s)", "平均風風向(°)",
+    "最大陣風風速(m/s)", "最大陣風風向(°)", "最大陣風時間",
+    "日累積雨量(mm)", "溫度(℃)", "相對溼度(%)", "氣壓(hPa)",
+    "日最高溫(℃)", "日最高溫時間", "日最低溫(℃)", "日最低溫時間"
+]
+
+# 日期 -> {(station_id, obs_time): 已輸出 CSV 列的摘要}；只用來判斷內容是否改過，不保存整列
+_EXPORTED: Dict[date, Dict[Tuple[str, str], int]] = {}
+# 已輸出列被改過、等待整檔重寫的日期
+_DIRTY: Set[date] = set()
+_LOCK = threading.RLock()
+
+
+def d(x) -> str:
+    """數值欄位輸出為一位小數；空值或非數字輸出空字串。"""
+    try:
+        return "" if x is None else f"{float(x):.1f}"
+    except Exception:
+        return ""
+
+
+def _s(x) -> str:
+    return "" if x is None else str(x)
+
+
+def _digest(line: Tuple[str, ...]) -> int:
+    # 同一程序內穩定的 64 位元雜湊；碰撞機率可忽略
+    return hash(line)
+
+
+def csv_row(r: Sequence) -> Tuple[str, ...]:
+    """
+    一筆觀測 -> CSV 列。r 的欄位順序同 observations 資料表（即 Observation.FIELDS）：
+    station_id, zone, name, obs_time, speed, dir, gust_speed, gust_dir, gust_time,
+    precip, air_temp, rh, pres, tmax, tmax_time, tmin, tmin_time
+    """
+    return (
+        _s(r[0]),
+        _s(r[1]),
+        _s(r[2]),
+        _s(r[3]),
+        d(r[4]),
+        d(r[5]),
+        d(r[6]),
+        d(r[7]),
+        _s(r[8]),
+        d(r[9]),
+        d(r[10]),
+        d(r[11]),
+        d(r[12]),
+        d(r[13]),
+        _s(r[14]),
+        d(r[15]),
+        _s(r[16]),
+    )
+
+
+def csv_day(obs_time: str) -> date:
+    """觀測時間所屬的 CSV 日期：恰為 00:00:00 的資料歸入前一天（即資料庫的分區日）。"""
+    return db.partition_day(obs_time)
+
+
+def csv_path(base_day: date) -> Path:
+    return config.get_output_dir() / f"{base_day.strftime('%Y%m%d')}.csv"
+
+
+def write_csv_for_day(base_day: date) -> Path:
+    """
+    依資料庫內容整檔輸出「指定日期 day」的 CSV（UTF-8-SIG），並重設該日的已輸出紀錄。
+    時間範圍：(day 00:00, day+1 00:00] —— 起點排除、終點包含（符合你「過去10分鐘」的需求）。
+    檔名：YYYYMMDD.csv（以 day 命名）
+    """
+    start_dt = datetime.combine(base_day, time(0, 0, 0), tzinfo=config.TPE)
+    end_dt = start_dt + timedelta(days=1)
+
+    start = start_dt.strftime("%Y-%m-%d %H:%M:%S")
+    end = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    out_path = csv_path(base_day)
+    exported: Dict[Tuple[str, str], int] = {}
+
+    with _LOCK:
+        # 範圍恰為一個分區，依主鍵順序（station_id, obs_time）整表讀出
+        with out_path.open("w", encoding="utf-8-sig", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(CSV_HEADER)
+            for batch in db.iter_observations(start, end):
+                for r in batch:
+                    line = csv_row(r)
+                    w.writerow(line)
+                    exported[(r[0], r[3])] = _digest(line)
+
+        _EXPORTED[base_day] = exported
+        _DIRTY.discard(base_day)
+    return out_path
+
+
+def append_observations(rows: List[Observation]) -> List[Path]:
+    """
+    把本輪已寫入資料庫的觀測附加到各自日期的 CSV（save_observations 成功後呼叫）。
+    本程序尚未輸出過的日期（啟動後第一次、或跨日）改為整檔重寫。回傳有寫入的檔案。
+    """
+    by_day: Dict[date, List[Observation]] = {}
+    for r in rows:
+        if not (r.station_id or "").strip() or not r.time:
+            continue
+        by_day.setdefault(csv_day(r.time), []).append(r)
+
+    written: List[Path] = []
+    with _LOCK:
+        for base_day in sorted(by_day):
+            exported = _EXPORTED.get(base_day)
+            out_path = csv_path(base_day)
+            if exported is None or not out_path.exists():
+                written.append(write_csv_for_day(base_day))
+                continue
+
+            new_lines = []
+            for r in by_day[base_day]:
+                key = (r.station_id, r.time)
+                line = csv_row(r.as_tuple())
+                digest = _digest(line)
+                prev = exported.get(key)
+                if prev is None:
+                    new_lines.append(line)
+                    exported[key] = digest
+                elif prev != digest:
+                    # 已輸出的列內容變了：檔案內舊列留待整檔重寫
+                    exported[key] = digest
+                    _DIRTY.add(base_day)
+
+            if new_lines:
+                try:
+                    with out_path.open("a", encoding="utf-8", newline="") as f:
+                        csv.writer(f).writerows(new_lines)
+                except Exception:
+                    # 寫到一半失敗：下次改為整檔重寫
+                    _EXPORTED.pop(base_day, None)
+                    raise
+                written.append(out_path)
+
+        _forget_old_days()
+    return written
+
+
+def compact_dirty_days() -> List[Path]:
+    """整檔重寫有列被改過的日期（排程定期呼叫）。回傳重寫的檔案。"""
+    with _LOCK:
+        days = sorted(_DIRTY)
+        written = [write_csv_for_day(base_day) for base_day in days]
+    if written:
+        config.app.logger.info(f"[compact_dirty_days] rewrote {', '.join(p.name for p in written)}")
+    return written
+
+
+def _forget_old_days() -> None:
+    """只保留今天與昨天的已輸出紀錄；更早的日期之後若再出現就整檔重寫。"""
+    keep_from = datetime.now(config.TPE).date() - timedelta(days=1)
+    for base_day in [k for k in _EXPORTED if k < keep_from]:
+        _EXPORTED.pop(base_day, None)
+        if base_day in _DIRTY:
+            write_csv_for_day(base_day)
+            _EXPORTED.pop(base_day, None)
@@ -1,9 +1,13 @@
-import sqlite3, csv
+import sqlite3, threading
+from contextlib import contextmanager
+from operator import attrgetter
 from pathlib import Path
-from datetime import datetime, timedelta, time, date
-from typing import List, Dict
+from datetime import datetime, timedelta, date
+from typing import Iterator, List, Dict, Sequence, Tuple
 import config
+import modules.rollups as rollups
 from utils.parser import time_window_bounds
+from utils.observation import Observation
 
 
 # --- 連線與建表 ---
@@ -12,78 +16,646 @@ def get_db_path() -> Path:
     return base / "record.db"
 
 
-def db_connect():
+def db_connect(readonly: bool = False):
+    """開一條新連線並套用 pragma（WAL、synchronous=NORMAL、page cache、mmap）。"""
     conn = sqlite3.connect(get_db_path(), timeout=30, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    if not readonly:
+        # journal_mode 記在資料庫檔上，由寫入連線設定即可
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={config.DB_MMAP_SIZE_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
     return conn
 
 
+# --- 連線管理：一條專用寫入連線 + 小型讀取連線池 ---
+# 寫入只來自排程執行緒；讀取來自 eventlet 的請求 greenlet。
+# 讀取池只在取/還連線的瞬間持鎖、從不等待：池空時臨時開一條，用完即關，
+# 因此不會有 greenlet 卡在 OS 鎖上而阻塞整個 hub。
+_WRITER: sqlite3.Connection | None = None
+_WRITER_LOCK = threading.RLock()
+_READ_POOL: List[sqlite3.Connection] = []
+_READ_POOL_LOCK = threading.Lock()
+
+
+@contextmanager
+def write_conn():
+    """取得專用寫入連線（同時只有一個寫入者）；離開時 commit，出錯則 rollback。"""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = db_connect()
+        conn = _WRITER
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+@contextmanager
+def read_conn():
+    """從讀取池借一條唯讀連線；用完歸還（池滿則關閉）。"""
+    with _READ_POOL_LOCK:
+        conn = _READ_POOL.pop() if _READ_POOL else None
+    if conn is None:
+        conn = db_connect(readonly=True)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        with _READ_POOL_LOCK:
+            if len(_READ_POOL) < config.DB_READ_POOL_SIZE:
+                _READ_POOL.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def db_close() -> None:
+    """關閉寫入連線與讀取池（例如切換資料庫檔或程式結束時）。"""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is not None:
+            _WRITER.close()
+            _WRITER = None
+    with _READ_POOL_LOCK:
+        while _READ_POOL:
+            _READ_POOL.pop().close()
+
+
+# --- 分區：每日一張表 observations_YYYYMMDD ---
+# 分區日與每日 CSV 相同：(day 00:00, day+1 00:00]，觀測時間恰為 00:00:00 歸入前一天。
+# 一天的 CSV、today 只讀一張表，24h 最多兩張；清理舊資料改為 DROP TABLE。
+# observations 保留為所有分區 UNION ALL 的相容 view；SQLite 單一複合查詢上限 500 項，分區更多時分層組成。
+PARTITION_PREFIX = "observations_"
+UNION_VIEW_PREFIX = "observations_union_"
+MAX_COMPOUND_SELECT = 500   # SQLITE_MAX_COMPOUND_SELECT 預設值
+
+_OBS_COLUMNS_DDL = """
+    station_id   TEXT NOT NULL,  -- 測站代碼
+    zone         TEXT,           -- 縣市/鄉鎮市區
+    name         TEXT,           -- 測站名稱
+    obs_time     TEXT NOT NULL,  -- 觀測時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
+    speed        REAL,           -- 平均風風速
+    dir          REAL,           -- 平均風風向
+    gust_speed   REAL,           -- 最大陣風風速
+    gust_dir     REAL,           -- 最大陣風風向
+    gust_time    TEXT,           -- 最大陣風時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
+    precip       REAL,           -- 日累積雨量
+    air_temp     REAL,           -- 溫度
+    rh           REAL,           -- 相對溼度
+    pres         REAL,           -- 氣壓
+    tmax         REAL,           -- 日最高溫
+    tmax_time    TEXT,           -- 日最高溫時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
+    tmin         REAL,           -- 日最低溫
+    tmin_time    TEXT,           -- 日最低溫時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
+    PRIMARY KEY (station_id, obs_time)
+"""
+
+# 每個分區的覆蓋索引（時間窗排名）：索引名稱為 <前綴>_YYYYMMDD
+# 分區為 WITHOUT ROWID（依主鍵存放），CSV 依 (station_id, obs_time) 輸出不需額外索引
+_PARTITION_INDEXES = (
+    ("idx_obs_avg_wind", "obs_time, station_id, speed, dir"),
+    ("idx_obs_gust", "obs_time, station_id, gust_speed, gust_dir, gust_time"),
+    ("idx_obs_precip", "obs_time, station_id, precip"),
+    ("idx_obs_air_temp", "obs_time, station_id, air_temp"),
+    ("idx_obs_rh", "obs_time, station_id, rh"),
+)
+
+# 已存在的分區日（排序）；由寫入端在 commit 後更新
+_PARTITIONS: List[date] | None = None
+_PARTITIONS_LOCK = threading.Lock()
+
+
+def partition_day(obs_time: str) -> date:
+    """觀測時間所屬的分區日：恰為 00:00:00 的資料歸入前一天。"""
+    day = date.fromisoformat(obs_time[:10])
+    if obs_time[11:19] == "00:00:00":
+        day -= timedelta(days=1)
+    return day
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day.strftime('%Y%m%d')}"
+
+
+def partition_bounds(day: date) -> Tuple[str, str]:
+    """分區涵蓋的時間範圍 (start, end]。"""
+    return f"{day.isoformat()} 00:00:00", f"{(day + timedelta(days=1)).isoformat()} 00:00:00"
+
+
+def _create_partition(conn: sqlite3.Connection, day: date) -> None:
+    table = partition_name(day)
+    suffix = day.strftime("%Y%m%d")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({_OBS_COLUMNS_DDL}) WITHOUT ROWID")
+    for name, cols in _PARTITION_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_{suffix} ON {table}({cols})")
+
+
+def _scan_partitions(conn: sqlite3.Connection) -> List[date]:
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name GLOB ?",
+        (PARTITION_PREFIX + "[0-9]*",)
+    ).fetchall()
+    return sorted(datetime.strptime(r[0][len(PARTITION_PREFIX):], "%Y%m%d").date() for r in rows)
+
+
+def _union_all(tables: List[str]) -> str:
+    return " UNION ALL ".join(f"SELECT * FROM {t}" for t in tables)
+
+
+def _rebuild_view(conn: sqlite3.Connection) -> None:
+    """
+    重建相容 view observations = 所有分區 UNION ALL（給臨時查詢與舊工具用）。
+    超過 MAX_COMPOUND_SELECT 個分區時先每 MAX_COMPOUND_SELECT 個組成一個 observations_union_N，
+    observations 再 UNION ALL 這些 view（上限是每個 SELECT 各自計算）。
+    """
+    days = _scan_partitions(conn)
+    conn.execute("DROP VIEW IF EXISTS observations")
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='view' AND name GLOB ?", (UNION_VIEW_PREFIX + "*",)
+    ).fetchall():
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+    tables = [partition_name(d) for d in days]
+    if len(tables) > MAX_COMPOUND_SELECT:
+        chunks = [tables[i:i + MAX_COMPOUND_SELECT] for i in range(0, len(tables), MAX_COMPOUND_SELECT)]
+        tables = []
+        for i, chunk in enumerate(chunks):
+            name = f"{UNION_VIEW_PREFIX}{i}"
+            conn.execute(f"CREATE VIEW {name} AS {_union_all(chunk)}")
+            tables.append(name)
+    if tables:
+        body = _union_all(tables)
+    else:
+        body = "SELECT * FROM latest_observations WHERE 0"
+    conn.execute(f"CREATE VIEW observations AS {body}")
+
+
+def _split_into_partitions(conn: sqlite3.Connection) -> None:
+    """v3：把單一 observations 表依分區日搬到各分區表，原表改為相容 view。"""
+    is_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='observations'"
+    ).fetchone()
+    if is_table:
+        days = [r[0] for r in conn.execute("""
+            SELECT DISTINCT CASE WHEN substr(obs_time, 12, 8) = '00:00:00'
+                                 THEN date(obs_time, '-1 day')
+                                 ELSE substr(obs_time, 1, 10) END
+            FROM observations
+        """)]
+        for d in days:
+            day = date.fromisoformat(d)
+            _create_partition(conn, day)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {partition_name(day)} "
+                f"SELECT * FROM observations WHERE obs_time > ? AND obs_time <= ?",
+                partition_bounds(day)
+            )
+        conn.execute("DROP TABLE observations")
+    _rebuild_view(conn)
+
+
+def _reload_partitions() -> List[date]:
+    global _PARTITIONS
+    with read_conn() as conn:
+        days = _scan_partitions(conn)
+    with _PARTITIONS_LOCK:
+        _PARTITIONS = days
+    return days
+
+
+def list_partitions() -> List[date]:
+    """目前所有分區日（由舊到新）。"""
+    with _PARTITIONS_LOCK:
+        days = _PARTITIONS
+    return list(days) if days is not None else _reload_partitions()
+
+
+def ensure_partitions(days) -> None:
+    """建立尚不存在的分區（獨立交易，commit 後讀取端才看得到）。"""
+    missing = sorted(set(days) - set(list_partitions()))
+    if not missing:
+        return
+    with write_conn() as conn:
+        for day in missing:
+            _create_partition(conn, day)
+        _rebuild_view(conn)
+    _reload_partitions()
+
+
+def partitions_between(start: str | None, end: str | None) -> List[date]:
+    """時間範圍 (start, end] 會用到的既有分區；start/end 為 None 表示不設限。"""
+    lo = date.fromisoformat(start[:10]) if start else date.min
+    hi = partition_day(end) if end else date.max
+    return [d for d in list_partitions() if lo <= d <= hi]
+
+
+def _station_filter(station_ids: Sequence[str] | None) -> Tuple[str | None, list]:
+    """station_ids -> (條件, 參數)；None 表示不過濾。"""
+    if station_ids is None:
+        return None, []
+    ids = list(station_ids)
+    if len(ids) == 1:
+        return "station_id = ?", ids
+    return f"station_id IN ({','.join('?' * len(ids))})", ids
+
+
+def iter_observations(start: str | None, end: str | None, columns: str = "*",
+                      batch_size: int = 5000,
+                      station_ids: Sequence[str] | None = None) -> Iterator[list]:
+    """
+    逐批讀出時間範圍 (start, end] 內的觀測，只讀涵蓋範圍的分區；
+    分區依日期先後，分區內依 (station_id, obs_time) 排序。整個分區都在範圍內時不加條件（主鍵順序掃描）。
+    station_ids 指定時只讀這些測站（主鍵前綴搜尋）；記憶體用量只與 batch_size 有關。
+    """
+    station_cond, station_params = _station_filter(station_ids)
+    if station_ids is not None and not station_params:
+        return
+    with read_conn() as conn:
+        for day in partitions_between(start, end):
+            lo, hi = partition_bounds(day)
+            conds, params = [], []
+            if station_cond:
+                conds.append(station_cond)
+                params += station_params
+            if start is not None and start > lo:
+                conds.append("obs_time > ?")
+                params.append(start)
+            if end is not None and end < hi:
+                conds.append("obs_time <= ?")
+                params.append(end)
+            where = f" WHERE {' AND '.join(conds)}" if conds else ""
+            c = conn.execute(
+                f"SELECT {columns} FROM {partition_name(day)}{where} ORDER BY station_id, obs_time",
+                params
+            )
+            while True:
+                batch = c.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+
+
+# --- 多解析度彙總（rollup_10m / rollup_1h / rollup_1d；定義見 modules.rollups） ---
+def _upsert_rollups(conn: sqlite3.Connection, res: str, aggs: List[Dict]) -> None:
+    if not aggs:
+        return
+    cols = rollups.COLUMNS
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {rollups.table_name(res)} ({','.join(cols)}) "
+        f"VALUES ({','.join('?' * len(cols))})",
+        [rollups.as_row(a) for a in aggs]
+    )
+
+
+def _rebuild_rollups_for_day(conn: sqlite3.Connection, day: date) -> int:
+    """由某一分區整天重算三層彙總（遷移回填、修復用）。回傳 10 分鐘彙總筆數。"""
+    lo, hi = partition_bounds(day)
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    c = conn.execute(
+        f"SELECT {','.join(rollups.RAW_COLUMNS)} FROM {partition_name(day)} "
+        f"ORDER BY station_id, obs_time"
+    )
+    for r in c:
+        groups.setdefault((r[0], rollups.bucket_end(r[3], "10m")), []).append(rollups.from_raw(r))
+
+    count = len(groups)
+    for res in rollups.RESOLUTIONS:
+        aggs = []
+        for (sid, be), parts in groups.items():
+            agg = rollups.merge(parts)
+            agg["bucket_end"] = be
+            aggs.append(agg)
+        conn.execute(
+            f"DELETE FROM {rollups.table_name(res)} WHERE bucket_end > ? AND bucket_end <= ?", (lo, hi)
+        )
+        _upsert_rollups(conn, res, aggs)
+        # 往上一層：以本層的 bucket_end 分組
+        i = rollups.RESOLUTIONS.index(res)
+        if i + 1 < len(rollups.RESOLUTIONS):
+            parent = rollups.RESOLUTIONS[i + 1]
+            groups = {}
+            for a in aggs:
+                groups.setdefault((a["station_id"], rollups.bucket_end(a["bucket_end"], parent)), []).append(a)
+    return count
+
+
+def _create_rollups(conn: sqlite3.Connection) -> None:
+    """v4：建立三層彙總表，並由既有分區回填。"""
+    for res in rollups.RESOLUTIONS:
+        for sql in rollups.ddl(res):
+            conn.execute(sql)
+    for day in _scan_partitions(conn):
+        _rebuild_rollups_for_day(conn, day)
+
+
+def _rows_at_times(conn: sqlite3.Connection, day: date, times, columns: str) -> List[sqlite3.Row]:
+    """分區內觀測時間屬於 times 的所有列（obs_time IN (...)，走覆蓋索引）。"""
+    times = sorted(set(times))
+    out = []
+    for i in range(0, len(times), 500):
+        chunk = times[i:i + 500]
+        out += conn.execute(
+            f"SELECT {columns} FROM {partition_name(day)} WHERE obs_time IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+    return out
+
+
+def _append_rollups(conn: sqlite3.Connection, raws: List[Dict]) -> None:
+    """
+    新增的觀測（先前不存在的 (測站, 觀測時間)）直接併入三層既有彙總：
+    極值、總和、筆數、最新一筆都可單調合併，結果與重算相同，每層只需一次依 bucket_end 的查詢。
+    """
+    ends: Dict[Tuple[str, str], str] = {}
+    for res in rollups.RESOLUTIONS:
+        # bucket_end -> {station_id: [本輪新增的觀測]}
+        groups: Dict[str, Dict[str, List[Dict]]] = {}
+        for raw in raws:
+            k = (raw["last_time"], res)
+            be = ends.get(k)
+            if be is None:
+                be = ends[k] = rollups.bucket_end(raw["last_time"], res)
+            groups.setdefault(be, {}).setdefault(raw["station_id"], []).append(raw)
+
+        aggs = []
+        for be, by_sid in groups.items():
+            # 讀成 tuple 再只轉換用得到的列（sqlite3.Row 逐欄轉 dict 較慢）
+            cur = conn.cursor()
+            cur.row_factory = None
+            current = {r[0]: r for r in cur.execute(
+                f"SELECT {','.join(rollups.COLUMNS)} FROM {rollups.table_name(res)} WHERE bucket_end = ?", (be,)
+            ) if r[0] in by_sid}
+            for sid, parts in by_sid.items():
+                old = current.get(sid)
+                if old is not None:
+                    parts = parts + [dict(zip(rollups.COLUMNS, old))]
+                agg = rollups.merge(parts)
+                agg["bucket_end"] = be
+                aggs.append(agg)
+        _upsert_rollups(conn, res, aggs)
+
+
+def _recompute_rollups(conn: sqlite3.Connection, keys) -> None:
+    """
+    指定 (測站, 10 分鐘 bucket_end) 所在時段逐層重算：10 分鐘由原始分區、1 小時由 10 分鐘、1 天由 1 小時。
+    用於已存在的列被 upsert 改值（極值可能變小，無法單調合併）的情況。
+    """
+    child = None
+    for res in rollups.RESOLUTIONS:
+        aggs = []
+        for sid, be in sorted(keys):
+            lo = rollups.bucket_start(be, res)
+            if child is None:
+                rows = conn.execute(
+                    f"SELECT {','.join(rollups.RAW_COLUMNS)} FROM {partition_name(partition_day(be))} "
+                    f"WHERE station_id = ? AND obs_time > ? AND obs_time <= ?", (sid, lo, be)
+                ).fetchall()
+                parts = [rollups.from_raw(r) for r in rows]
+            else:
+                rows = conn.execute(
+                    f"SELECT * FROM {rollups.table_name(child)} "
+                    f"WHERE station_id = ? AND bucket_end > ? AND bucket_end <= ?", (sid, lo, be)
+                ).fetchall()
+                parts = [dict(r) for r in rows]
+            if not parts:
+                continue
+            agg = rollups.merge(parts)
+            agg["bucket_end"] = be
+            aggs.append(agg)
+        _upsert_rollups(conn, res, aggs)
+
+        i = rollups.RESOLUTIONS.index(res)
+        if i + 1 < len(rollups.RESOLUTIONS):
+            keys = {(sid, rollups.bucket_end(be, rollups.RESOLUTIONS[i + 1])) for sid, be in keys}
+        child = res
+
+
+def _refresh_rollups(conn: sqlite3.Connection, by_day: Dict[date, list], existed: set) -> None:
+    """
+    save_observations 寫入原始資料後，於同一交易內更新彙總；成本與本輪資料量成正比。
+    existed 為寫入前就已存在的 (測站, 觀測時間)：這些測站改走逐層重算，其餘直接合併。
+    """
+    updated = {sid for sid, _ in existed}
+    recompute = set()
+    raws = []
+    for day, part in by_day.items():
+        keys = {(t[0], t[3]) for t in part}
+        for r in _rows_at_times(conn, day, (t[3] for t in part), ",".join(rollups.RAW_COLUMNS)):
+            if (r[0], r[3]) not in keys:
+                continue
+            if r[0] in updated:
+                recompute.add((r[0], rollups.bucket_end(r[3], "10m")))
+            else:
+                raws.append(rollups.from_raw(r))
+    _append_rollups(conn, raws)
+    _recompute_rollups(conn, recompute)
+
+
+# --- Schema 版本遷移（以 PRAGMA user_version 記錄已套用到第幾版） ---
+_MIGRATIONS: List[list] = [
+    # v1: obs_time 時間序索引（CSV 匯出、清理舊資料的範圍掃描）與各分頁的覆蓋索引（時間窗排名）
+    [
+        "CREATE INDEX IF NOT EXISTS idx_obs_time ON observations(obs_time)",
+        "CREATE INDEX IF NOT EXISTS idx_obs_avg_wind ON observations(obs_time, station_id, speed, dir)",
+        "CREATE INDEX IF NOT EXISTS idx_obs_gust ON observations(obs_time, station_id, gust_speed, gust_dir, gust_time)",
+        "CREATE INDEX IF NOT EXISTS idx_obs_precip ON observations(obs_time, station_id, precip)",
+        "CREATE INDEX IF NOT EXISTS idx_obs_air_temp ON observations(obs_time, station_id, air_temp)",
+        "CREATE INDEX IF NOT EXISTS idx_obs_rh ON observations(obs_time, station_id, rh)",
+    ],
+    # v2: 每站最新一筆（window=now），由 save_observations 在同一交易內維護
+    [
+        """
+        CREATE TABLE IF NOT EXISTS latest_observations (
+            station_id   TEXT PRIMARY KEY,
+            zone         TEXT,
+            name         TEXT,
+            obs_time     TEXT NOT NULL,
+            speed        REAL,
+            dir          REAL,
+            gust_speed   REAL,
+            gust_dir     REAL,
+            gust_time    TEXT,
+            precip       REAL,
+            air_temp     REAL,
+            rh           REAL,
+            pres         REAL,
+            tmax         REAL,
+            tmax_time    TEXT,
+            tmin         REAL,
+            tmin_time    TEXT
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO latest_observations
+        SELECT o.*
+        FROM observations o
+        JOIN (
+          SELECT station_id, MAX(obs_time) AS t
+          FROM observations
+          GROUP BY station_id
+        ) l ON o.station_id = l.station_id AND o.obs_time = l.t
+        """,
+    ],
+    # v3: 改為每日分區表（見 _split_into_partitions）；_PARTITIONED_VERSION
+    [
+        _split_into_partitions,
+    ],
+    # v4: 10 分鐘 / 1 小時 / 1 天彙總表，並由既有分區回填
+    [
+        _create_rollups,
+    ],
+    # v5: 小型鍵值表，保存跨重啟的狀態（例如最後一次更新時間，給啟動時的 warm start）
+    [
+        """
+        CREATE TABLE IF NOT EXISTS app_state (
+            key    TEXT PRIMARY KEY,
+            value  TEXT
+        )
+        """,
+    ],
+]
+
+
+_PARTITIONED_VERSION = 3
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, statements in enumerate(_MIGRATIONS, start=1):
+        if version >= target:
+            continue
+        for sql in statements:
+            # 需要程式邏輯的步驟以函式表示
+            if callable(sql):
+                sql(conn)
+            else:
+                conn.execute(sql)
+        conn.execute(f"PRAGMA user_version={target}")
+        config.app.logger.info(f"[db_init] schema migrated to v{target}")
+
+
+# db_init 完成（schema 已遷移、分區已載入）後才 set；啟動時與第一次抓取並行，寫庫前先等它
+DB_READY = threading.Event()
+
+
 def db_init():
-    with db_connect() as conn:
+    with write_conn() as conn:
         c = conn.cursor()
-        # 每筆觀測（以 station_id + obs_time 唯一，避免重複）
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS observations (
-            station_id   TEXT NOT NULL,  -- 測站代碼
-            zone         TEXT,           -- 縣市/鄉鎮市區
-            name         TEXT,           -- 測站名稱
-            obs_time     TEXT NOT NULL,  -- 觀測時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
-            speed        REAL,           -- 平均風風速
-            dir          REAL,           -- 平均風風向
-            gust_speed   REAL,           -- 最大陣風風速
-            gust_dir     REAL,           -- 最大陣風風向
-            gust_time    TEXT,           -- 最大陣風時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
-            precip       REAL,           -- 日累積雨量
-            air_temp     REAL,           -- 溫度
-            rh           REAL,           -- 相對溼度
-            pres         REAL,           -- 氣壓
-            tmax         REAL,           -- 日最高溫
-            tmax_time    TEXT,           -- 日最高溫時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
-            tmin         REAL,           -- 日最低溫
-            tmin_time    TEXT,           -- 日最低溫時間 "%Y-%m-%d %H:%M:%S" (UTC+8)
-            PRIMARY KEY (station_id, obs_time)
-        );
-        """)
-        conn.commit()
+        if c.execute("PRAGMA user_version").fetchone()[0] < _PARTITIONED_VERSION:
+            # 舊版單一觀測表（v3 起依日分區，此表在遷移時搬到各分區後移除）
+            c.execute(f"""
+            CREATE TABLE IF NOT EXISTS observations (
+                {_OBS_COLUMNS_DDL}
+            );
+            """)
+        _migrate(conn)
+    with write_conn() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # 改為 incremental auto_vacuum（需重整一次檔案），刪除分區後才能歸還空間
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    _reload_partitions()
+    DB_READY.set()
+
+
+# --- 跨重啟的狀態（app_state 鍵值表） ---
+def get_state(key: str) -> str | None:
+    with read_conn() as conn:
+        row = conn.execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(key: str, value: str | None) -> None:
+    with write_conn() as conn:
+        conn.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def load_latest_snapshot() -> List[Observation]:
+    """每站最新一筆（latest_observations）轉成 Observation，啟動時先當作後端快取用。"""
+    with read_conn() as conn:
+        rows = conn.execute(
+            f"SELECT {','.join('obs_time' if k == 'time' else k for k in Observation.FIELDS)} "
+            f"FROM latest_observations ORDER BY station_id"
+        ).fetchall()
+    return [Observation(*r) for r in rows]
+
+
+# --- 變更偵測：每站最後一次送進寫入流程的觀測指紋 ---
+_FINGERPRINT_KEYS = (
+    "zone", "name", "speed", "dir", "gust_speed", "gust_dir", "gust_time",
+    "precip", "air_temp", "rh", "pres", "tmax", "tmax_time", "tmin", "tmin_time",
+)
+_FINGERPRINTS: Dict[str, Tuple[str, int]] = {}
+_FINGERPRINTS_LOCK = threading.Lock()
+_fingerprint_values = attrgetter(*_FINGERPRINT_KEYS)
+
+
+def _fingerprint(r: Observation) -> Tuple[str, int]:
+    """(obs_time, 其餘欄位值的 hash)"""
+    return r.time, hash(_fingerprint_values(r))
+
+
+def filter_changed(rows: List[Observation]) -> List[Observation]:
+    """
+    回傳與上次相比有變更的 rows（新的 obs_time，或同一 obs_time 但數值不同），
+    並立即記下其指紋；缺 station_id / time 的列略過。
+    寫入失敗時應呼叫 forget_fingerprints()，讓這些站下一輪重新寫入。
+    """
+    changed = []
+    with _FINGERPRINTS_LOCK:
+        for r in rows:
+            sid = (r.station_id or "").strip()
+            if not sid or not r.time:
+                continue
+            fp = _fingerprint(r)
+            if _FINGERPRINTS.get(sid) == fp:
+                continue
+            _FINGERPRINTS[sid] = fp
+            changed.append(r)
+    return changed
+
+
+def seed_fingerprints(rows: List[Observation]) -> None:
+    """
+    以資料庫中已有的觀測預先填入指紋（啟動時呼叫），第一次抓取時內容相同的站就不必重寫；
+    已有指紋的站不覆蓋。值經過資料庫轉換後若與抓到的不同，只是多寫一次。
+    """
+    with _FINGERPRINTS_LOCK:
+        for r in rows:
+            sid = (r.station_id or "").strip()
+            if sid and r.time and sid not in _FINGERPRINTS:
+                _FINGERPRINTS[sid] = _fingerprint(r)
+
+
+def forget_fingerprints(rows: List[Observation]) -> None:
+    """清掉這些站的指紋（寫入失敗時使用）。"""
+    with _FINGERPRINTS_LOCK:
+        for r in rows:
+            _FINGERPRINTS.pop((r.station_id or "").strip(), None)
 
 
 # --- 資料插入/更新 ---
-def save_observations(rows: List[Dict]):
+def save_observations(rows: List[Observation]) -> int:
     """
-    將每站一筆 rows 寫入 SQLite。
+    將每站一筆 rows 寫入 SQLite（依觀測時間寫入對應的每日分區）。
     以 (station_id, obs_time) 做 UPSERT，避免重複。
+    回傳實際寫入的筆數。
     """
-    # 準備好 16 個欄位的資料；缺主鍵就跳過
-    payload = []
-    for r in rows:
-        sid = (r.get("station_id") or "").strip()
-        obs_time = r.get("time")
-        if not sid or not obs_time:
-            continue
-        payload.append((
-            sid,
-            r.get("zone"),
-            r.get("name"),
-            obs_time,
-            r.get("speed"),
-            r.get("dir"),
-            r.get("gust_speed"),
-            r.get("gust_dir"),
-            r.get("gust_time"),
-            r.get("precip"),
-            r.get("air_temp"),
-            r.get("rh"),
-            r.get("pres"),
-            r.get("tmax"),
-            r.get("tmax_time"),
-            r.get("tmin"),
-            r.get("tmin_time"),
-        ))
+    # 依資料表欄位順序取 17 個值；缺主鍵就跳過
+    payload = [r.as_tuple() for r in rows if (r.station_id or "").strip() and r.time]
     if not payload:
-        return
+        return 0
 
     sql = """
-    INSERT INTO observations (
+    INSERT INTO {table} (
       station_id, zone, name, obs_time,
       speed, dir, gust_speed, gust_dir, gust_time,
       precip, air_temp, rh, pres,
@@ -106,143 +678,168 @@ def save_observations(rows: List[Dict]):
       tmin         = excluded.tmin,
       tmin_time    = excluded.tmin_time
     """
-    with db_connect() as conn:
-        conn.executemany(sql, payload)
-        conn.commit()
-
-
-# --- CSV 匯出 ---
-def write_csv_for_day(base_day: date):
-    """
-    依資料庫內容輸出「指定日期 day」的 CSV（UTF-8-SIG）。
-    時間範圍：(day 00:00, day+1 00:00] —— 起點排除、終點包含（符合你「過去10分鐘」的需求）。
-    檔名：YYYYMMDD.csv（以 day 命名）
+    # 每站最新一筆：只有不比現有更舊的觀測才覆蓋
+    latest_sql = """
+    INSERT INTO latest_observations (
+      station_id, zone, name, obs_time,
+      speed, dir, gust_speed, gust_dir, gust_time,
+      precip, air_temp, rh, pres,
+      tmax, tmax_time, tmin, tmin_time
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    ON CONFLICT(station_id) DO UPDATE SET
+      zone         = excluded.zone,
+      name         = excluded.name,
+      obs_time     = excluded.obs_time,
+      speed        = excluded.speed,
+      dir          = excluded.dir,
+      gust_speed   = excluded.gust_speed,
+      gust_dir     = excluded.gust_dir,
+      gust_time    = excluded.gust_time,
+      precip       = excluded.precip,
+      air_temp     = excluded.air_temp,
+      rh           = excluded.rh,
+      pres         = excluded.pres,
+      tmax         = excluded.tmax,
+      tmax_time    = excluded.tmax_time,
+      tmin         = excluded.tmin,
+      tmin_time    = excluded.tmin_time
+    WHERE excluded.obs_time >= latest_observations.obs_time
     """
-    start_dt = datetime.combine(base_day, time(0,0,0), tzinfo=config.TPE)
-    end_dt   = start_dt + timedelta(days=1)
+    # 依分區日分組，只寫入對應的分區表
+    by_day: Dict[date, list] = {}
+    for t in payload:
+        by_day.setdefault(partition_day(t[3]), []).append(t)
+    ensure_partitions(by_day)
 
-    start = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-    end   = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+    with write_conn() as conn:
+        # 寫入前已存在的 (測站, 觀測時間)：彙總需重算而非直接合併
+        existed = set()
+        for day, part in by_day.items():
+            keys = {(t[0], t[3]) for t in part}
+            existed.update(
+                (r[0], r[1]) for r in _rows_at_times(conn, day, (t[3] for t in part), "station_id, obs_time")
+                if (r[0], r[1]) in keys
+            )
+        for day, part in by_day.items():
+            conn.executemany(sql.format(table=partition_name(day)), part)
+        conn.executemany(latest_sql, payload)
+        # 同一交易內更新受影響時段的彙總
+        _refresh_rollups(conn, by_day, existed)
+    return len(payload)
 
-    with db_connect() as conn:
-        c = conn.cursor()
-        c.execute("""
-            SELECT *
-            FROM observations
-            WHERE obs_time > ? AND obs_time <= ?
-            ORDER BY station_id, obs_time
-        """, (start, end))
-        rows = c.fetchall()
 
-    out_path = config.get_output_dir() / f"{base_day.strftime('%Y%m%d')}.csv"
-
-    with out_path.open("w", encoding="utf-8-sig", newline="") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "測站代碼", "鄉鎮市區", "測站名稱", "觀測時間",
-            "平均風風速(m/s)", "平均風風向(°)",
-            "最大陣風風速(m/s)", "最大陣風風向(°)", "最大陣風時間",
-            "日累積雨量(mm)", "溫度(℃)", "相對溼度(%)", "氣壓(hPa)",
-            "日最高溫(℃)", "日最高溫時間", "日最低溫(℃)", "日最低溫時間"
-        ])
-        def d(x):
-            try:
-                return "" if x is None else f"{float(x):.1f}"
-            except Exception:
-                return ""
-        for r in rows:
-            w.writerow([
-                r["station_id"],
-                r["zone"],
-                r["name"],
-                r["obs_time"] or "",
-                d(r["speed"]),
-                d(r["dir"]),
-                d(r["gust_speed"]),
-                d(r["gust_dir"]),
-                r["gust_time"],
-                d(r["precip"]),
-                d(r["air_temp"]),
-                d(r["rh"]),
-                d(r["pres"]),
-                d(r["tmax"]),
-                r["tmax_time"] or "",
-                d(r["tmin"]),
-                r["tmin_time"] or "",
-            ])
-    return out_path
+# --- 查詢時間窗給 /api/data ---
+WINDOWS = ("now", "1h", "24h", "today")
+TABS = ("avg-wind", "gust", "daily-precip", "air-temp", "rh")
 
 
-# --- 查詢時間窗給 /api/data ---
-def query_rows_for_window(window: str, tab: str) -> list[dict]:
+def _tab_columns(tab: str) -> Tuple[str, List[str], List[str], str]:
     """
-    依時間段 window 與分頁 tab 取每站一筆代表資料：
-      window = 'now' | '1h' | '24h' | 'today'
-      tab    = 'avg-wind' | 'gust' | 'daily-precip' | 'air-temp' | 'rh'
-    回傳欄位會對齊前端既有鍵名。
+    回傳 (metric, 輸出欄位, 排名子查詢需要的欄位, 對應的覆蓋索引)。
+    排名子查詢只取覆蓋索引內的欄位；zone/name 等排名完再以主鍵回表取得。
     """
-    start, end = time_window_bounds(window)
-
     match tab:
         case "avg-wind":
-            metric = "speed"
-            columns = ["station_id", "zone", "name", "speed", "dir", "obs_time AS time"]
+            return ("speed",
+                    ["station_id", "zone", "name", "speed", "dir", "obs_time AS time"],
+                    ["station_id", "obs_time", "speed", "dir"],
+                    "idx_obs_avg_wind")
         case "gust":
-            metric = "gust_speed"
-            columns = ["station_id", "zone", "name", "gust_speed", "gust_dir", "gust_time AS time"]
+            return ("gust_speed",
+                    ["station_id", "zone", "name", "gust_speed", "gust_dir", "gust_time AS time"],
+                    ["station_id", "obs_time", "gust_speed", "gust_dir", "gust_time"],
+                    "idx_obs_gust")
         case "daily-precip":
-            metric = "precip"
-            columns = ["station_id", "zone", "name", "precip", "obs_time AS time"]
+            return ("precip",
+                    ["station_id", "zone", "name", "precip", "obs_time AS time"],
+                    ["station_id", "obs_time", "precip"],
+                    "idx_obs_precip")
         case "air-temp":
-            metric = "air_temp"
-            columns = ["station_id", "zone", "name", "air_temp", "obs_time AS time"]
+            return ("air_temp",
+                    ["station_id", "zone", "name", "air_temp", "obs_time AS time"],
+                    ["station_id", "obs_time", "air_temp"],
+                    "idx_obs_air_temp")
         case "rh":
-            metric = "rh"
-            columns = ["station_id", "zone", "name", "rh", "obs_time AS time"]
+            return ("rh",
+                    ["station_id", "zone", "name", "rh", "obs_time AS time"],
+                    ["station_id", "obs_time", "rh"],
+                    "idx_obs_rh")
         case _:
-            metric = "speed"
-            columns = ["station_id", "zone", "name", "speed", "dir", "obs_time AS time"]
+            return _tab_columns("avg-wind")
+
+
+def tab_metric(tab: str) -> str:
+    """分頁的排名指標欄位（avg-wind -> speed、gust -> gust_speed ...）。"""
+    return _tab_columns(tab)[0]
 
-    with db_connect() as conn:
+
+def tab_columns(tab: str) -> List[str]:
+    """分頁輸出欄位（SELECT 用，例如 'obs_time AS time'）。"""
+    return _tab_columns(tab)[1]
+
+
+def _window_sql(window: str, tab: str) -> Tuple[str, tuple]:
+    """組出 query_rows_for_window 使用的 SQL 與參數。"""
+    start, end = time_window_bounds(window)
+    metric, columns, inner, _ = _tab_columns(tab)
+
+    if start is None and end is None:
+        # 每站最新一筆：直接讀 latest_observations（每站一列，與歷史長度無關）
+        return f"SELECT {','.join(columns)} FROM latest_observations", ()
+
+    tables = [partition_name(d) for d in partitions_between(start, end)]
+    if not tables:
+        return f"SELECT {','.join(columns)} FROM latest_observations WHERE 0", ()
+
+    # 時間段內取 metric 最大；若同分數，取 obs_time 最新
+    # 用窗口函數排序取 rn=1（需要 SQLite 3.25+；一般 Win10 以上 OK）
+    # 只讀涵蓋時間段的分區；ranked 只讀各分區的覆蓋索引（obs_time 範圍搜尋），
+    # 取到每站一筆後再以主鍵回表補 zone/name（觀測只會落在其中一個分區）
+    inner_str = ",".join(inner)
+    src = " UNION ALL ".join(
+        f"SELECT {inner_str} FROM {t} WHERE obs_time > ? AND obs_time <= ?" for t in tables
+    )
+
+    def out_col(col):
+        if col in ("zone", "name"):
+            if len(tables) == 1:
+                return f"o0.{col}"
+            return f"COALESCE({', '.join(f'o{i}.{col}' for i in range(len(tables)))}) AS {col}"
+        return f"r.{col}"
+
+    joins = "\n".join(
+        f"LEFT JOIN {t} o{i} ON o{i}.station_id = r.station_id AND o{i}.obs_time = r.obs_time"
+        for i, t in enumerate(tables)
+    )
+    return f"""
+        WITH ranked AS (
+          SELECT {inner_str},
+                 ROW_NUMBER() OVER (
+                   PARTITION BY station_id
+                   ORDER BY ({metric} IS NULL),
+                            {metric} DESC,
+                            obs_time DESC
+                 ) AS rn
+          FROM ({src})
+        )
+        SELECT {",".join(out_col(col) for col in columns)}
+        FROM ranked r
+        {joins}
+        WHERE r.rn = 1
+    """, (start, end) * len(tables)
+
+
+def query_rows_for_window(window: str, tab: str) -> list[dict]:
+    """
+    依時間段 window 與分頁 tab 取每站一筆代表資料：
+      window = 'now' | '1h' | '24h' | 'today'
+      tab    = 'avg-wind' | 'gust' | 'daily-precip' | 'air-temp' | 'rh'
+    回傳欄位會對齊前端既有鍵名。
+    """
+    sql, params = _window_sql(window, tab)
+    with read_conn() as conn:
         c = conn.cursor()
-        if start is None and end is None:
-            # 每站最新一筆
-            columns_str = ",".join([f"o.{col}" for col in columns])
-            c.execute(f"""
-                WITH latest AS (
-                  SELECT station_id, MAX(obs_time) AS t
-                  FROM observations
-                  GROUP BY station_id
-                )
-                SELECT {columns_str}
-                FROM observations o
-                JOIN latest l
-                  ON o.station_id = l.station_id AND o.obs_time = l.t
-            """)
-        else:
-            # 時間段內取 metric 最大；若同分數，取 obs_time 最新
-            # 用窗口函數排序取 rn=1（需要 SQLite 3.25+；一般 Win10 以上 OK）
-            columns_str = ",".join(columns)
-            c.execute(f"""
-                WITH filt AS (
-                  SELECT *
-                  FROM observations
-                  WHERE obs_time > ? AND obs_time <= ?
-                ),
-                ranked AS (
-                  SELECT *,
-                         ROW_NUMBER() OVER (
-                           PARTITION BY station_id
-                           ORDER BY ({metric} IS NULL),
-                                    {metric} DESC,
-                                    obs_time DESC
-                         ) AS rn
-                  FROM filt
-                )
-                SELECT {columns_str}
-                FROM ranked
-                WHERE rn = 1
-            """, (start, end))
+        c.execute(sql, params)
         rows = c.fetchall()
 
     # 組成與現有 /api/data rows 相同的欄位
@@ -252,17 +849,154 @@ def query_rows_for_window(window: str, tab: str) -> list[dict]:
     return out
 
 
+def explain_window_query(window: str, tab: str) -> List[str]:
+    """回傳 query_rows_for_window 的 EXPLAIN QUERY PLAN 各步驟說明（給檢查腳本用）。"""
+    sql, params = _window_sql(window, tab)
+    with read_conn() as conn:
+        return [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def expected_window_index(window: str, tab: str) -> str:
+    """query_rows_for_window 在此 window/tab 組合應使用的索引名稱（分區索引為前綴）。"""
+    if window == "now":
+        return "latest_observations"
+    return _tab_columns(tab)[3] + "_"
+
+
+# --- 任意時間範圍 (start, end] 的排名：盡量使用彙總表 ---
+def range_sources(start: str, end: str) -> List[Tuple[str, str, str]]:
+    """(start, end] 拆成的片段 [(來源, lo, hi), ...]；來源為 '1d'/'1h'/'10m'（彙總表）或 'raw'。"""
+    fmt = "%Y-%m-%d %H:%M:%S"
+    pieces = rollups.split_range(datetime.strptime(start, fmt), datetime.strptime(end, fmt))
+    return [(src, lo.strftime(fmt), hi.strftime(fmt)) for src, lo, hi in pieces]
+
+
+def _range_sql(start: str, end: str, tab: str) -> Tuple[str, tuple]:
+    """
+    組出 query_rows_for_range 的 SQL：各片段轉成相同欄位的候選列
+    （v = 指標最大值、vt = 其時間、max_* = 最大值那一筆的風向等、lt / last_* = 最新一筆），
+    再與 query_rows_for_window 相同規則排名：每站取 v 最大，同分取 vt 最新；全為空值取最新一筆。
+    """
+    metric, columns, _, _ = _tab_columns(tab)
+    max_aux = rollups.MAX_AUX.get(metric, ())
+    last_cols = ", ".join(f"last_{a}" for a in rollups.LAST_AUX)
+
+    selects, params = [], []
+    for src, lo, hi in range_sources(start, end):
+        if src == "raw":
+            aux = "".join(f", CASE WHEN {metric} IS NULL THEN NULL ELSE {a} END AS max_{a}" for a in max_aux)
+            last = ", ".join(f"{a} AS last_{a}" for a in rollups.LAST_AUX)
+            for day in partitions_between(lo, hi):
+                selects.append(
+                    f"SELECT station_id, zone, name, {metric} AS v, "
+                    f"CASE WHEN {metric} IS NULL THEN NULL ELSE obs_time END AS vt{aux}, "
+                    f"obs_time AS lt, {last} "
+                    f"FROM {partition_name(day)} WHERE obs_time > ? AND obs_time <= ?"
+                )
+                params += [lo, hi]
+        else:
+            aux = "".join(f", {metric}_max_{a} AS max_{a}" for a in max_aux)
+            selects.append(
+                f"SELECT station_id, zone, name, {metric}_max AS v, {metric}_max_time AS vt{aux}, "
+                f"last_time AS lt, {last_cols} "
+                f"FROM {rollups.table_name(src)} WHERE bucket_end > ? AND bucket_end <= ?"
+            )
+            params += [lo, hi]
+    if not selects:
+        return f"SELECT {','.join(columns)} FROM latest_observations WHERE 0", ()
+
+    def out_col(col):
+        src, _, alias = col.partition(" AS ")
+        if src == metric:
+            return f"v AS {metric}"
+        if src == "obs_time":
+            return f"CASE WHEN v IS NULL THEN lt ELSE vt END AS {alias}"
+        if src in max_aux:
+            return f"CASE WHEN v IS NULL THEN last_{src} ELSE max_{src} END AS {alias or src}"
+        return col
+
+    return f"""
+        WITH ranked AS (
+          SELECT *,
+                 ROW_NUMBER() OVER (
+                   PARTITION BY station_id
+                   ORDER BY (v IS NULL), v DESC, vt DESC, lt DESC
+                 ) AS rn
+          FROM ({" UNION ALL ".join(selects)})
+        )
+        SELECT {",".join(out_col(col) for col in columns)}
+        FROM ranked
+        WHERE rn = 1
+    """, tuple(params)
+
+
+def query_rows_for_range(start: str, end: str, tab: str) -> list[dict]:
+    """
+    任意時間範圍 (start, end] 的每站代表資料，欄位與 query_rows_for_window 相同。
+    對齊整天/整點/10 分鐘的部分讀彙總表，只有不足 10 分鐘的頭尾讀原始分區；
+    例如 30 天最大陣風排名每站只讀約 30 列日彙總。zone/name 取各時段最新一筆。
+    """
+    sql, params = _range_sql(start, end, tab)
+    with read_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [{k: r[k] for k in r.keys()} for r in rows]
+
+
+def explain_range_query(start: str, end: str, tab: str) -> List[str]:
+    """回傳 query_rows_for_range 的 EXPLAIN QUERY PLAN 各步驟說明（給檢查腳本用）。"""
+    sql, params = _range_sql(start, end, tab)
+    with read_conn() as conn:
+        return [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def iter_rollups(res: str, start: str, end: str, columns: str,
+                 station_ids: Sequence[str] | None = None, batch_size: int = 5000) -> Iterator[list]:
+    """逐批讀出某一解析度彙總表 bucket_end 在 (start, end] 內的列，依 (station_id, bucket_end) 排序。"""
+    station_cond, station_params = _station_filter(station_ids)
+    if station_ids is not None and not station_params:
+        return
+    conds = ([station_cond] if station_cond else []) + ["bucket_end > ?", "bucket_end <= ?"]
+    with read_conn() as conn:
+        c = conn.execute(
+            f"SELECT {columns} FROM {rollups.table_name(res)} WHERE {' AND '.join(conds)} "
+            f"ORDER BY station_id, bucket_end",
+            station_params + [start, end]
+        )
+        while True:
+            batch = c.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+
+
 # --- 清理舊資料 ---
-def prune_old_observations(hours: int = 48) -> None:
+def prune_old_observations(days: int | None = None) -> str:
     """
-    刪除 obs_time <= (現在台北時間 - hours 小時) 的舊資料。
-    obs_time 為 '%Y-%m-%d %H:%M:%S' 字串，字典序比較可正確反映時間。
+    刪除早於 (今天 - days 天) 的分區（DROP TABLE，不逐列刪除），並歸還空間。
+    days 預設為 RETENTION_DAYS。latest_observations 另清掉最新一筆早於 LATEST_MAX_AGE_HOURS 小時的站
+    （停報的站不再出現在 window=now，與保留天數無關）。回傳 latest_observations 的分界時間。
     """
-    cutoff_dt = datetime.now(config.TPE) - timedelta(hours=hours)
-    cutoff = cutoff_dt.strftime("%Y-%m-%d %H:%M:%S")
-    with db_connect() as conn:
-        c = conn.cursor()
-        c.execute("DELETE FROM observations WHERE obs_time <= ?", (cutoff,))
-        deleted = c.rowcount
-        conn.commit()
-    config.app.logger.info(f"[prune_observations] cutoff={cutoff} deleted={deleted}")
+    days = config.RETENTION_DAYS if days is None else days
+    now = datetime.now(config.TPE)
+    cutoff_day = now.date() - timedelta(days=days)
+    cutoff = partition_bounds(cutoff_day)[0]
+    latest_cutoff = (now - timedelta(hours=config.LATEST_MAX_AGE_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+    old = [d for d in list_partitions() if d < cutoff_day]
+    with write_conn() as conn:
+        for d in old:
+            conn.execute(f"DROP TABLE IF EXISTS {partition_name(d)}")
+        if old:
+            _rebuild_view(conn)
+        conn.execute("DELETE FROM latest_observations WHERE obs_time <= ?", (latest_cutoff,))
+        # 10 分鐘彙總與原始資料同樣保留 days 天；1 小時 / 1 天彙總筆數少，長期保留
+        conn.execute(f"DELETE FROM {rollups.table_name('10m')} WHERE bucket_end <= ?", (cutoff,))
+    with write_conn() as conn:
+        # auto_vacuum=INCREMENTAL：把空出的頁面還給檔案系統
+        # （execute 每次只推進一步、只釋放一頁，executescript 才會執行到底）
+        conn.executescript("PRAGMA incremental_vacuum;")
+    _reload_partitions()
+    config.app.logger.info(
+        f"[prune_observations] cutoff={cutoff} latest_cutoff={latest_cutoff} "
+        f"dropped={','.join(partition_name(d) for d in old) or '-'}"
+    )
+    return latest_cutoff
@@ -0,0 +1,71 @@
+"""
+記憶體中的「每站最新一筆」（window=now），與 latest_observations 資料表同樣規則維護。
+
+refresh_cache 抓到資料後立即更新這份對照表並推播，不必等 SQLite 寫完；
+啟動時由 warm start 以資料庫內容填入。query 的輸出與 db.query_rows_for_window('now', tab) 相同。
+"""
+import threading
+from typing import Dict, List
+import modules.db as db
+from modules.ringbuffer import real_value
+from utils.observation import Observation
+
+# 資料表中為 REAL 的欄位：依 SQLite 欄位親和性轉換，讓輸出與從資料庫讀出的一致
+_REAL_FIELDS = frozenset(("speed", "dir", "gust_speed", "gust_dir", "precip",
+                          "air_temp", "rh", "pres", "tmax", "tmin"))
+
+
+def _columns(tab: str) -> List[tuple]:
+    """分頁輸出欄位 -> [(Observation 屬性, 輸出鍵名), ...]（對應 db.tab_columns 的 SELECT 欄位）。"""
+    out = []
+    for col in db.tab_columns(tab):
+        src, _, alias = col.partition(" AS ")
+        out.append(("time" if src == "obs_time" else src, alias or src))
+    return out
+
+
+class LatestObservations:
+    """每站只保留觀測時間最新的一筆；較舊的觀測不覆蓋（同 latest_observations 的 UPSERT 條件）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Observation] = {}
+        self._loaded = False
+
+    def update(self, rows: List[Observation]) -> None:
+        with self._lock:
+            for r in rows:
+                sid = (r.station_id or "").strip()
+                if not sid or not r.time:
+                    continue
+                cur = self._rows.get(sid)
+                if cur is None or r.time >= cur.time:
+                    self._rows[sid] = r
+
+    def load(self, rows: List[Observation]) -> None:
+        """以資料庫中的最新快照填入（啟動時）；已有較新資料的站不覆蓋。"""
+        self.update(rows)
+        with self._lock:
+            self._loaded = True
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def forget_before(self, cutoff: str) -> None:
+        """移除最新一筆早於等於 cutoff 的站（清理舊資料後呼叫）。"""
+        with self._lock:
+            for sid in [sid for sid, r in self._rows.items() if r.time <= cutoff]:
+                del self._rows[sid]
+
+    def query(self, tab: str) -> List[Dict]:
+        """同 db.query_rows_for_window('now', tab)。"""
+        cols = _columns(tab)
+        with self._lock:
+            rows = sorted(self._rows.values(), key=lambda r: r.station_id)
+        return [
+            {key: (real_value(getattr(r, attr)) if attr in _REAL_FIELDS else getattr(r, attr)) for attr, key in cols}
+            for r in rows
+        ]
+
+
+LATEST = LatestObservations()
@@ -0,0 +1,160 @@
+"""
+refresh_cache 的背景寫入：SQLite 與每日 CSV 各一條有界佇列與一個工作執行緒。
+
+refresh_cache 抓到資料後先更新記憶體快取並推播，再把本輪變更丟進 db 佇列即返回；
+db 工作執行緒寫庫（save_observations）並記下更新時間，成功後轉交 csv 佇列附加到每日 CSV
+（CSV 在寫庫之後，整檔重寫時才讀得到本輪資料）。推播延遲因此只與抓取有關，與磁碟快慢無關。
+
+佇列有上限（PERSIST_QUEUE_SIZE 輪）：寫入跟不上到佇列滿時 submit 會等待並記錄警告（背壓），
+不丟資料。各階段的積壓筆數、最近一次落後秒數等由 status() 回報（/api/status）。
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import config
+import modules.board as board
+import modules.csv_writer as csv_writer
+import modules.db as db
+import modules.push as push
+from modules.latest import LATEST
+from modules.ringbuffer import RING
+from utils.observation import Observation
+
+
+class _Stage:
+    """一條有界佇列 + 一個工作執行緒；工作項目為 (送入時間, 資料)，依序處理。"""
+
+    def __init__(self, name: str, handler: Callable[[Any, float], None], maxsize: int):
+        self.name = name
+        self._handler = handler
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._pending: deque = deque()   # 尚未完成項目的送入時間（monotonic），先進先出
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.processed = 0
+        self.failures = 0
+        self.last_lag: float | None = None   # 最近完成項目從送入到完成的秒數
+        self.max_lag = 0.0
+        self.last_done_at: datetime | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"persist-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any, since: float | None = None) -> None:
+        """送入一個項目；since 為端到端起算時間（預設現在）。佇列滿時等待（背壓）。"""
+        since = time.monotonic() if since is None else since
+        with self._lock:
+            self._pending.append(since)
+        try:
+            self._queue.put_nowait((since, item))
+        except queue.Full:
+            config.app.logger.warning(
+                f"[persist] {self.name} queue full ({self._queue.maxsize}), waiting for storage"
+            )
+            self._queue.put((since, item))
+
+    def _run(self) -> None:
+        while True:
+            since, item = self._queue.get()
+            try:
+                self._handler(item, since)
+            except Exception as e:
+                self.failures += 1
+                config.app.logger.exception(f"[persist] {self.name} failed: {e}")
+            finally:
+                lag = time.monotonic() - since
+                with self._lock:
+                    self._pending.popleft()
+                    self.processed += 1
+                    self.last_lag = lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self.last_done_at = datetime.now(config.TPE)
+                self._queue.task_done()
+
+    def join(self, timeout: float) -> bool:
+        """等佇列清空（最多 timeout 秒）；回傳是否已清空。"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            oldest = self._pending[0] if self._pending else None
+            return {
+                "pending": len(self._pending),
+                "oldest_pending_sec": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                "last_lag_sec": round(self.last_lag, 3) if self.last_lag is not None else None,
+                "max_lag_sec": round(self.max_lag, 3),
+                "processed": self.processed,
+                "failures": self.failures,
+                "last_done_at": self.last_done_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_done_at else None,
+            }
+
+
+def _write_db(item, since: float) -> None:
+    rows, updated_at = item
+    # 啟動時第一次抓取與資料庫初始化並行：寫庫前先等初始化完成
+    db.DB_READY.wait()
+    try:
+        db.save_observations(rows)
+    except Exception:
+        # 讓這些站下一輪重新被視為有變更、再寫一次
+        db.forget_fingerprints(rows)
+        raise
+    if rows:
+        # 回應快取與推播在寫庫前就換成本輪 updated_at；期間由 SQL 組出的排行（自訂範圍、
+        # 環狀緩衝回填完成前的 1h/24h/today、每站最新一筆載入前的 now）沒有本輪資料，寫完後作廢重組
+        board.invalidate()
+        if not (RING.is_warm() and LATEST.is_loaded()):
+            push.push_updates()
+    # 記下更新時間，重啟時 warm start 沿用
+    db.set_state(UPDATED_AT_KEY, updated_at.isoformat())
+    if rows:
+        _CSV.submit(rows, since)
+
+
+def _write_csv(rows: List[Observation], since: float) -> None:
+    out = csv_writer.append_observations(rows)
+    config.app.logger.info(
+        f"[persist] rows={len(rows)} csv={','.join(p.name for p in out) or '-'} "
+        f"lag={time.monotonic() - since:.2f}s"
+    )
+
+
+# app_state 中保存最後一次更新時間的鍵（warm start 用）
+UPDATED_AT_KEY = "updated_at"
+
+_DB = _Stage("db", _write_db, config.PERSIST_QUEUE_SIZE)
+_CSV = _Stage("csv", _write_csv, config.PERSIST_QUEUE_SIZE)
+
+
+def start() -> None:
+    """啟動兩個工作執行緒（排程啟動時呼叫）；程式結束時最多等 10 秒把佇列寫完。"""
+    _DB.start()
+    _CSV.start()
+    atexit.register(drain, 10.0)
+
+
+def submit(rows: List[Observation], updated_at: datetime) -> None:
+    """把本輪有變更的觀測與更新時間交給背景寫入（rows 可為空，仍會記下更新時間）。"""
+    _DB.submit((rows, updated_at))
+
+
+def drain(timeout: float) -> bool:
+    """等 db、csv 兩段都寫完（最多 timeout 秒）。"""
+    deadline = time.monotonic() + timeout
+    return _DB.join(timeout) and _CSV.join(max(0.0, deadline - time.monotonic()))
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    return {"db": _DB.status(), "csv": _CSV.status()}
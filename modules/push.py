@@ -0,0 +1,166 @@
+"""
+以 SocketIO room 推播排行榜資料。
+
+每個訂閱（window, tab, group, format）對應一個 room；每輪更新時每個 (window, tab) 只組一次資料，
+再依群組索引過濾、排名，與該 room 上次推播的內容比對，只送出有變更的列（board_delta）。
+伺服器每輪的工作量與訂閱組合數成正比，與連線數無關；前端也不必再回打 /api/data。
+
+推播來自排程 / 背景執行緒，而 eventlet 未 monkey_patch：在這些 OS 執行緒直接 socketio.emit 會繞過 eventlet hub
+寫入 WebSocket，連線隨之中斷（loadtest 可重現）。start() 之後改由 hub 上的背景工作從 _OUTBOX 取出送出。
+"""
+import threading
+from collections import deque
+from typing import Any, Dict, List, Tuple
+import config
+import modules.board as board
+from utils.stations import load_station_groups, load_station_positions
+
+ALL_GROUP = "全部"
+
+RoomKey = Tuple[str, str, str, str]   # (window, tab, group, format)
+
+# room -> 訂閱中的連線數
+_SUBSCRIBERS: Dict[RoomKey, int] = {}
+# room -> (updated_at 字串, {station_id: row})：該 room 最近一次推播的內容
+_ROOM_STATE: Dict[RoomKey, Tuple[str | None, Dict[str, Dict[str, Any]]]] = {}
+_LOCK = threading.Lock()
+
+OUTBOX_POLL_SEC = 0.02   # 背景工作檢查 _OUTBOX 的間隔（推播最多多等這麼久）
+# (event, data, room)；deque 的 append / popleft 可跨執行緒使用
+_OUTBOX: deque = deque()
+_STARTED = False
+
+
+def room_name(key: RoomKey) -> str:
+    return "board:" + ":".join(key)
+
+
+def _room_rows(key: RoomKey, payload: Dict[str, Any] | None = None) -> Tuple[str | None, Dict[str, Dict[str, Any]]]:
+    """room 目前的內容：依群組索引過濾、伺服器端排名後，以 station_id 為鍵（保持名次順序）。"""
+    window, tab, group, _ = key
+    if payload is None:
+        payload, _, _ = board.get_payload(window, tab)
+    rows, _, _ = board.select_rows(payload["rows"], tab, group)
+    return payload["updated_at"], {r["station_id"]: r for r in rows}
+
+
+def _sort_spec(tab: str) -> str:
+    field, desc = board.parse_sort(tab, None)
+    return ("-" if desc else "") + field
+
+
+def snapshot(key: RoomKey) -> Dict[str, Any]:
+    """回傳 room 目前的完整內容（與之後推播的 delta 一致）。"""
+    with _LOCK:
+        state = _ROOM_STATE.get(key)
+    if state is None:
+        state = _room_rows(key)
+        with _LOCK:
+            if key in _SUBSCRIBERS:
+                state = _ROOM_STATE.setdefault(key, state)
+    window, tab, group, fmt = key
+    updated_at, rows = state
+    data = {
+        "window": window, "tab": tab, "group": group,
+        "updated_at": updated_at,
+        "groups": load_station_groups()[0],
+        "sort": _sort_spec(tab),
+    }
+    return _with_rows(data, fmt, tab, list(rows.values()))
+
+
+def _with_rows(data: Dict[str, Any], fmt: str, tab: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """依 room 的格式放入列資料：逐列（rows）或與 /api/data?format=compact 相同的欄式格式。"""
+    if fmt == "compact":
+        data["format"] = "compact"
+        data.update(board.encode_compact(rows, tab))
+    else:
+        data["rows"] = rows
+    return data
+
+
+def subscribe(key: RoomKey) -> Dict[str, Any]:
+    """登記一個訂閱，回傳該 room 目前的完整內容。"""
+    with _LOCK:
+        _SUBSCRIBERS[key] = _SUBSCRIBERS.get(key, 0) + 1
+    return snapshot(key)
+
+
+def unsubscribe(key: RoomKey) -> None:
+    with _LOCK:
+        n = _SUBSCRIBERS.get(key, 0) - 1
+        if n > 0:
+            _SUBSCRIBERS[key] = n
+        else:
+            _SUBSCRIBERS.pop(key, None)
+            _ROOM_STATE.pop(key, None)
+
+
+def push_updates() -> int:
+    """
+    對所有有人訂閱的 room 推播本輪變更（refresh_cache 更新快取後呼叫）。
+    回傳推播的 room 數。
+    """
+    with _LOCK:
+        keys = list(_SUBSCRIBERS)
+
+    payloads: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    pushed = 0
+    for key in keys:
+        window, tab, _, _ = key
+        payload = payloads.get((window, tab))
+        if payload is None:
+            payload, _, _ = board.get_payload(window, tab)
+            payloads[(window, tab)] = payload
+        updated_at, rows = _room_rows(key, payload)
+
+        with _LOCK:
+            if key not in _SUBSCRIBERS:
+                continue
+            _, prev = _ROOM_STATE.get(key, (None, {}))
+            _ROOM_STATE[key] = (updated_at, rows)
+
+        changed = [r for sid, r in rows.items() if prev.get(sid) != r]
+        removed = [sid for sid in prev if sid not in rows]
+        window, tab, group, fmt = key
+        if fmt == "compact":
+            # 精簡格式以測站索引表示被移除的站
+            positions = load_station_positions()
+            removed = [positions[sid] for sid in removed if sid in positions]
+        data = _with_rows({
+            "window": window, "tab": tab, "group": group,
+            "updated_at": updated_at,
+            "sort": _sort_spec(tab),
+            "removed": removed,
+        }, fmt, tab, changed)
+        emit("board_delta", data, to=room_name(key))
+        pushed += 1
+    return pushed
+
+
+def emit(event: str, data: Dict[str, Any], to: str | None = None) -> None:
+    """從任何執行緒推播；start() 之前（例如 benchmarks 未啟動伺服器）直接送出。"""
+    if _STARTED:
+        _OUTBOX.append((event, data, to))
+    else:
+        config.socketio.emit(event, data, to=to, namespace="/")
+
+
+def _drain_outbox() -> None:
+    while True:
+        config.socketio.sleep(OUTBOX_POLL_SEC)
+        while _OUTBOX:
+            event, data, to = _OUTBOX.popleft()
+            try:
+                config.socketio.emit(event, data, to=to, namespace="/")
+            except Exception as e:
+                config.app.logger.error(f"[push] emit {event} failed: {e}")
+
+
+def start() -> None:
+    """在 eventlet hub 上啟動送出 _OUTBOX 的背景工作（只需一次，socketio.run 之前呼叫即可）。"""
+    global _STARTED
+    if _STARTED:
+        return
+    _STARTED = True
+    config.socketio.start_background_task(_drain_outbox)
@@ -0,0 +1,191 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+import numpy as np
+import config
+import modules.db as db
+import utils.timecache as timecache
+from utils.observation import Observation
+from utils.parser import time_window_bounds
+
+# 測站 × 10 分鐘時槽 × 指標，涵蓋近 48 小時，給 1h/24h/today 排名用
+SLOT_MINUTES = 10
+RETENTION_HOURS = 48
+N_SLOTS = RETENTION_HOURS * 60 // SLOT_MINUTES
+METRICS = ("speed", "gust_speed", "precip", "air_temp", "rh")
+AUX = ("dir", "gust_dir", "gust_time")
+WINDOWS = ("1h", "24h", "today")
+
+_EPOCH = datetime(2000, 1, 1)
+_SLOT_SEC = SLOT_MINUTES * 60
+
+# 分頁 -> (metric, 輸出用的 aux 欄位, 時間欄位取自 aux 的哪一欄；None 表示 obs_time)
+_TABS = {
+    "avg-wind":     ("speed", ("dir",), None),
+    "gust":         ("gust_speed", ("gust_dir",), "gust_time"),
+    "daily-precip": ("precip", (), None),
+    "air-temp":     ("air_temp", (), None),
+    "rh":           ("rh", (), None),
+}
+
+
+def _to_sec(ts: str | None) -> int | None:
+    dt = timecache.parse_local(ts)
+    if dt is None:
+        return None
+    return (dt - _EPOCH) // timedelta(seconds=1)
+
+
+def _from_sec(sec: int) -> str:
+    return timecache.format_local(_EPOCH + timedelta(seconds=int(sec)))
+
+
+def real_value(x):
+    """模擬 SQLite REAL 欄位親和性：數字或可轉為數字的字串存成 float，其餘原樣。"""
+    if x is None or isinstance(x, float):
+        return x
+    if isinstance(x, int):
+        return float(x)
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return x
+
+
+class ObservationRing:
+    """
+    NumPy 環狀緩衝：每站每 10 分鐘時槽（(t-10m, t]）保留最新一筆觀測。
+    啟動時由 SQLite 回填（load_from_db），之後每輪 append；回填完成前為「冷」狀態，
+    query_window 回傳 None，由呼叫端改走 SQL。
+    同一時槽若有多筆（觀測頻率高於 10 分鐘）只保留最新一筆。
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._lock = threading.Lock()
+        self._warm = False
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._zone: List[str | None] = []
+        self._name: List[str | None] = []
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int) -> None:
+        self._slot = np.full((capacity, N_SLOTS), -1, dtype=np.int64)
+        self._time = np.full((capacity, N_SLOTS), -1, dtype=np.int64)
+        self._vals = np.full((len(METRICS), capacity, N_SLOTS), np.nan, dtype=np.float64)
+        self._aux = np.full((len(AUX), capacity, N_SLOTS), None, dtype=object)
+
+    def _grow(self) -> None:
+        old = (self._slot, self._time, self._vals, self._aux)
+        n = old[0].shape[0]
+        self._alloc(n * 2)
+        self._slot[:n], self._time[:n] = old[0], old[1]
+        self._vals[:, :n], self._aux[:, :n] = old[2], old[3]
+
+    def _row(self, sid: str) -> int:
+        i = self._index.get(sid)
+        if i is None:
+            i = len(self._ids)
+            if i >= self._slot.shape[0]:
+                self._grow()
+            self._index[sid] = i
+            self._ids.append(sid)
+            self._zone.append(None)
+            self._name.append(None)
+        return i
+
+    def _put(self, sid, zone, name, obs_time, metrics, aux) -> None:
+        t = _to_sec(obs_time)
+        if not sid or t is None:
+            return
+        slot = -(-t // _SLOT_SEC)
+        pos = slot % N_SLOTS
+        i = self._row(sid)
+        cur = self._slot[i, pos]
+        # 較舊的時槽不覆蓋較新的；同一時槽保留較晚的觀測
+        if cur > slot or (cur == slot and self._time[i, pos] > t):
+            return
+        self._slot[i, pos] = slot
+        self._time[i, pos] = t
+        for m, v in enumerate(metrics):
+            self._vals[m, i, pos] = np.nan if v is None else v
+        for a, v in enumerate(aux):
+            self._aux[a, i, pos] = v
+        self._zone[i] = zone
+        self._name[i] = name
+
+    def append(self, rows: List[Observation]) -> None:
+        """加入本輪（有變更的）觀測。"""
+        with self._lock:
+            for r in rows:
+                self._put(r.station_id, r.zone, r.name, r.time,
+                          [real_value(getattr(r, k)) for k in METRICS],
+                          [real_value(r.dir), real_value(r.gust_dir), r.gust_time])
+
+    def load_from_db(self) -> int:
+        """由 SQLite 回填近 RETENTION_HOURS 小時的觀測，完成後轉為「熱」狀態。回傳筆數。"""
+        cutoff = (datetime.now(config.TPE) - timedelta(hours=RETENTION_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+        n = 0
+        # 只讀涵蓋近 RETENTION_HOURS 小時的分區
+        for batch in db.iter_observations(
+                cutoff, None,
+                "station_id, zone, name, obs_time, "
+                "speed, gust_speed, precip, air_temp, rh, "
+                "dir, gust_dir, gust_time"):
+            with self._lock:
+                for r in batch:
+                    self._put(r[0], r[1], r[2], r[3], r[4:9], r[9:12])
+            n += len(batch)
+        with self._lock:
+            self._warm = True
+        return n
+
+    def is_warm(self) -> bool:
+        return self._warm
+
+    def query_window(self, window: str, tab: str) -> List[Dict] | None:
+        """
+        與 db.query_rows_for_window 相同語意：時間段 (start, end] 內每站取 metric 最大，
+        同分取最新；區間內全為空值的站則回傳最新一筆（metric 為 None）。
+        緩衝仍冷、或 window 非 1h/24h/today 時回傳 None。
+        """
+        if not self._warm or window not in WINDOWS:
+            return None
+        start, end = time_window_bounds(window)
+        s, e = _to_sec(start), _to_sec(end)
+        metric, aux_cols, time_col = _TABS.get(tab, _TABS["avg-wind"])
+        m = METRICS.index(metric)
+
+        with self._lock:
+            n = len(self._ids)
+            t = self._time[:n]
+            v = self._vals[m, :n]
+            in_win = (t > s) & (t <= e)
+            valid = in_win & ~np.isnan(v)
+            vv = np.where(valid, v, -np.inf)
+            best = vv.max(axis=1)
+            has_valid = valid.any(axis=1)
+            # 有值的站：同為最大值者取最新；全為空值的站：取區間內最新
+            pick = np.where(has_valid[:, None], valid & (vv == best[:, None]), in_win)
+            idx = np.where(pick, t, -1).argmax(axis=1)
+            present = np.nonzero(in_win.any(axis=1))[0]
+
+            rows = []
+            for i in present:
+                j = idx[i]
+                val = v[i, j]
+                row = {
+                    "station_id": self._ids[i],
+                    "zone": self._zone[i],
+                    "name": self._name[i],
+                    metric: None if np.isnan(val) else float(val),
+                }
+                for col in aux_cols:
+                    row[col] = self._aux[AUX.index(col), i, j]
+                row["time"] = (self._aux[AUX.index(time_col), i, j] if time_col
+                               else _from_sec(t[i, j]))
+                rows.append(row)
+        return rows
+
+
+RING = ObservationRing()
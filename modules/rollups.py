@@ -0,0 +1,203 @@
+"""
+多解析度彙總（10 分鐘 / 1 小時 / 1 天）的欄位定義與計算。
+
+每張彙總表以 (station_id, bucket_end) 為主鍵，時段為 (bucket_end - 解析度, bucket_end]，
+與時間窗、每日分區相同採「起點排除、終點包含」。每個指標保存
+max / max_time、min / min_time、sum / cnt（平均 = sum / cnt）與 last（時段內最新一筆的值），
+極值同分時取較晚的時間；另保存最大值那一筆的風向/陣風時間，以及最新一筆的風向/陣風時間，
+讓長區間排名與原始資料的結果一致。
+
+本模組只做純計算與 SQL 定義；讀寫由 modules.db 負責。
+"""
+import math
+from operator import itemgetter
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+RESOLUTIONS = ("10m", "1h", "1d")   # 由細到粗；每一層由前一層彙總
+_STEP = {
+    "10m": timedelta(minutes=10),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+LOCAL_FMT = "%Y-%m-%d %H:%M:%S"
+
+METRICS = ("speed", "gust_speed", "precip", "air_temp", "rh")
+# 最大值那一筆要一併保存的欄位（對應分頁輸出的風向/時間）
+MAX_AUX = {
+    "speed": ("dir",),
+    "gust_speed": ("gust_dir", "gust_time"),
+}
+# 最新一筆要保存的欄位（整段皆為空值時，排名輸出最新一筆）
+LAST_AUX = ("dir", "gust_dir", "gust_time")
+
+# 從原始觀測讀取的欄位（順序即 from_raw 的輸入順序）
+RAW_COLUMNS = ("station_id", "zone", "name", "obs_time") + METRICS + LAST_AUX
+
+COLUMNS: List[str] = ["station_id", "bucket_end", "zone", "name", "last_time", "n"]
+for _m in METRICS:
+    COLUMNS += [f"{_m}_max", f"{_m}_max_time", f"{_m}_min", f"{_m}_min_time",
+                f"{_m}_sum", f"{_m}_cnt", f"{_m}_last"]
+    COLUMNS += [f"{_m}_max_{_a}" for _a in MAX_AUX.get(_m, ())]
+COLUMNS += [f"last_{_a}" for _a in LAST_AUX]
+
+
+def table_name(res: str) -> str:
+    return f"rollup_{res}"
+
+
+def ddl(res: str) -> List[str]:
+    """建立某一解析度彙總表與其時間索引的 SQL。"""
+    def col_type(c):
+        if c in ("n",) or c.endswith("_cnt"):
+            return "INTEGER"
+        if c.endswith(("_time", "_end")) or c in ("station_id", "zone", "name"):
+            return "TEXT"
+        return "REAL"
+
+    table = table_name(res)
+    cols = ",\n    ".join(f"{c} {col_type(c)}" for c in COLUMNS)
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {cols},
+            PRIMARY KEY (station_id, bucket_end)
+        ) WITHOUT ROWID
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(bucket_end)",
+    ]
+
+
+# --- 時段邊界 ---
+def _align(dt: datetime, res: str, up: bool) -> datetime:
+    step = _STEP[res]
+    base = datetime.combine(dt.date(), time(0, 0, 0))
+    k = (dt - base) / step
+    k = math.ceil(k) if up else math.floor(k)
+    return base + k * step
+
+
+def ceil_time(dt: datetime, res: str) -> datetime:
+    return _align(dt, res, True)
+
+
+def floor_time(dt: datetime, res: str) -> datetime:
+    return _align(dt, res, False)
+
+
+def bucket_end(ts: str, res: str) -> str:
+    """觀測時間（或較細時段的 bucket_end）所屬時段的 bucket_end。"""
+    return ceil_time(datetime.strptime(ts, LOCAL_FMT), res).strftime(LOCAL_FMT)
+
+
+def bucket_start(end: str, res: str) -> str:
+    return (datetime.strptime(end, LOCAL_FMT) - _STEP[res]).strftime(LOCAL_FMT)
+
+
+def split_range(start: datetime, end: datetime, levels: Sequence[str] = ("1d", "1h", "10m")
+                ) -> List[Tuple[str, datetime, datetime]]:
+    """
+    把 (start, end] 拆成盡量粗的對齊片段：[(來源, lo, hi), ...]，來源為 '1d'/'1h'/'10m' 或 'raw'。
+    中間對齊整天的部分用日彙總，兩端依序退到小時、10 分鐘，最後不足 10 分鐘的頭尾才讀原始資料。
+    """
+    if start >= end:
+        return []
+    if not levels:
+        return [("raw", start, end)]
+    res, rest = levels[0], levels[1:]
+    a, b = ceil_time(start, res), floor_time(end, res)
+    if a >= b:
+        return split_range(start, end, rest)
+    return split_range(start, a, rest) + [(res, a, b)] + split_range(b, end, rest)
+
+
+# --- 彙總計算 ---
+def _num(v) -> float | None:
+    """數值欄位轉 float；空值或非數字視為 None（不參與極值與平均）。"""
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def from_raw(r: Sequence) -> Dict:
+    """一筆原始觀測（欄位順序同 RAW_COLUMNS）-> 只含一筆的彙總。"""
+    row = dict(zip(RAW_COLUMNS, r))
+    t = row["obs_time"]
+    out = {"station_id": row["station_id"], "zone": row["zone"], "name": row["name"],
+           "last_time": t, "n": 1}
+    for m in METRICS:
+        v = _num(row[m])
+        vt = t if v is not None else None
+        out[f"{m}_max"] = out[f"{m}_min"] = v
+        out[f"{m}_max_time"] = out[f"{m}_min_time"] = vt
+        out[f"{m}_sum"] = v
+        out[f"{m}_cnt"] = 0 if v is None else 1
+        out[f"{m}_last"] = v
+        for a in MAX_AUX.get(m, ()):
+            out[f"{m}_max_{a}"] = row[a] if v is not None else None
+    for a in LAST_AUX:
+        out[f"last_{a}"] = row[a]
+    return out
+
+
+# 每個指標在 merge 中用到的欄位名稱（預先組好，避免每次合併重組字串）
+_METRIC_KEYS = [
+    (f"{_m}_max", f"{_m}_max_time", f"{_m}_min", f"{_m}_min_time",
+     f"{_m}_sum", f"{_m}_cnt", f"{_m}_last",
+     tuple(f"{_m}_max_{_a}" for _a in MAX_AUX.get(_m, ())))
+    for _m in METRICS
+]
+_LAST_KEYS = tuple(f"last_{_a}" for _a in LAST_AUX)
+
+
+def merge(parts: List[Dict]) -> Dict:
+    """
+    合併同一測站多段（或多筆）彙總；parts 不可為空。回傳新的 dict。
+    極值同值時取時間較晚的一段；平均以 sum / cnt 計算。
+    """
+    if len(parts) == 1:
+        return dict(parts[0])
+    latest = parts[0]
+    n = 0
+    for p in parts:
+        n += p["n"]
+        if p["last_time"] > latest["last_time"]:
+            latest = p
+    out = {"station_id": latest["station_id"], "zone": latest["zone"], "name": latest["name"],
+           "last_time": latest["last_time"], "n": n}
+    for k_max, k_max_t, k_min, k_min_t, k_sum, k_cnt, k_last, k_aux in _METRIC_KEYS:
+        hi = lo = None
+        total = None
+        cnt = 0
+        for p in parts:
+            if not p[k_cnt]:
+                continue
+            cnt += p[k_cnt]
+            total = p[k_sum] if total is None else total + p[k_sum]
+            v = p[k_max]
+            if hi is None or v > hi[k_max] or (v == hi[k_max] and p[k_max_t] > hi[k_max_t]):
+                hi = p
+            v = p[k_min]
+            if lo is None or v < lo[k_min] or (v == lo[k_min] and p[k_min_t] > lo[k_min_t]):
+                lo = p
+        if hi is None:
+            out[k_max] = out[k_max_t] = out[k_min] = out[k_min_t] = out[k_sum] = None
+            for a in k_aux:
+                out[a] = None
+        else:
+            out[k_max], out[k_max_t] = hi[k_max], hi[k_max_t]
+            out[k_min], out[k_min_t] = lo[k_min], lo[k_min_t]
+            out[k_sum] = total
+            for a in k_aux:
+                out[a] = hi[a]
+        out[k_cnt] = cnt
+        out[k_last] = latest[k_last]
+    for a in _LAST_KEYS:
+        out[a] = latest[a]
+    return out
+
+
+as_row = itemgetter(*COLUMNS)   # 彙總 dict -> 依 COLUMNS 順序的 tuple（寫入用）
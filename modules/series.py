@@ -0,0 +1,102 @@
+"""
+單站時間序列（/api/station/<station_id>/series）。
+
+回應以 generator 串流輸出：先送出站別資訊與欄位名稱，再依 fetchmany 分批讀取游標、逐批輸出資料點，
+不在記憶體中組出完整清單；記憶體用量只與批次大小有關，與時間範圍長度無關。
+resolution=raw 讀每日分區（主鍵 (station_id, obs_time) 前綴搜尋），10m/1h/1d 讀對應的彙總表。
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+import config
+import modules.db as db
+import modules.rollups as rollups
+from utils.observation import Observation
+from utils.stations import get_station_meta
+
+RESOLUTIONS = ("raw",) + rollups.RESOLUTIONS
+# 原始資料可取的欄位（即 observations 的觀測欄位）；彙總只有 rollups.METRICS
+RAW_METRICS = Observation.FIELDS[4:]
+AGGS = ("mean", "max", "min", "last")
+DEFAULT_SPAN = timedelta(hours=24)   # 未指定 start 時的範圍
+BATCH_SIZE = 2000
+
+LOCAL_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_request(start: str | None, end: str | None, metrics: str | None,
+                  resolution: str | None, agg: str | None) -> Dict:
+    """
+    檢查查詢參數（start/end 已由 parser.parse_time_bound 轉成本地時間字串），回傳正規化後的設定。
+    end 省略為現在、start 省略為 end 前 24 小時；metrics 以逗號分隔，省略為五個分頁指標。
+    參數不合法拋出 ValueError。
+    """
+    resolution = resolution or "raw"
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    agg = None if resolution == "raw" else (agg or "mean")
+    if agg is not None and agg not in AGGS:
+        raise ValueError(f"agg must be one of {', '.join(AGGS)}")
+
+    allowed = RAW_METRICS if resolution == "raw" else rollups.METRICS
+    names = [m.strip() for m in (metrics or "").split(",") if m.strip()] or list(rollups.METRICS)
+    bad = [m for m in names if m not in allowed]
+    if bad:
+        raise ValueError(f"unknown metrics for resolution={resolution}: {', '.join(bad)}")
+
+    if end is None:
+        end = datetime.now(config.TPE).strftime(LOCAL_FMT)
+    if start is None:
+        start = (datetime.strptime(end, LOCAL_FMT) - DEFAULT_SPAN).strftime(LOCAL_FMT)
+    if start >= end:
+        raise ValueError("start must be earlier than end")
+    return {"start": start, "end": end, "metrics": list(dict.fromkeys(names)),
+            "resolution": resolution, "agg": agg}
+
+
+def _rollup_column(metric: str, agg: str) -> str:
+    if agg == "mean":
+        return f"CASE WHEN {metric}_cnt > 0 THEN {metric}_sum / {metric}_cnt END"
+    return f"{metric}_{agg}"
+
+
+def _batches(station_id: str, q: Dict) -> Iterator[list]:
+    """依解析度逐批讀出 (時間, 各指標...) 的列。"""
+    if q["resolution"] == "raw":
+        columns = ",".join(["obs_time"] + q["metrics"])
+        return db.iter_observations(q["start"], q["end"], columns, BATCH_SIZE, station_ids=[station_id])
+    columns = ",".join(["bucket_end"] + [_rollup_column(m, q["agg"]) for m in q["metrics"]])
+    return db.iter_rollups(q["resolution"], q["start"], q["end"], columns, [station_id], BATCH_SIZE)
+
+
+def _dumps(x) -> str:
+    return json.dumps(x, ensure_ascii=False, separators=(",", ":"))
+
+
+def stream_series(station_id: str, q: Dict) -> Iterator[bytes]:
+    """
+    產生 JSON 回應的各段 bytes：
+    {"station_id", "zone", "name", "groups", "start", "end", "resolution", "agg",
+     "columns": ["time", 指標...], "points": [[時間, 值...], ...]}
+    第一段（points 之前）在查詢前就送出，之後每批資料一段。
+    """
+    meta = get_station_meta(station_id) or {}
+    head = {
+        "station_id": station_id,
+        "zone": meta.get("zone"),
+        "name": meta.get("name"),
+        "groups": meta.get("groups", []),
+        "start": q["start"],
+        "end": q["end"],
+        "resolution": q["resolution"],
+        "agg": q["agg"],
+        "columns": ["time"] + q["metrics"],
+    }
+    yield (_dumps(head)[:-1] + ',"points":[').encode("utf-8")
+
+    first = True
+    for batch in _batches(station_id, q):
+        chunk = ",".join(_dumps(tuple(r)) for r in batch)
+        yield (chunk if first else "," + chunk).encode("utf-8")
+        first = False
+    yield b"]}"
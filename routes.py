@@ -1,7 +1,15 @@
-from flask import render_template, jsonify, request
+import time
+from flask import Response, jsonify, render_template, request
 import config
-import modules.db as db
-from utils.stations import load_station_groups, get_station_meta
+import modules.board as board
+import modules.export as export
+import modules.persist as persist
+import modules.series as series
+from modules.latest import LATEST
+from modules.ringbuffer import RING
+from utils.parser import parse_time_bound
+from utils.poll_planner import PLANNER
+from utils.stations import get_all_station_ids, get_groups, get_station_meta
 
 
 @config.app.route("/")
@@ -15,47 +23,122 @@ def index():
     )
 
 
+def _int_arg(name: str) -> int | None:
+    """讀取整數查詢參數；缺少或格式錯誤回傳 None。"""
+    try:
+        return int(request.args.get(name, ""))
+    except ValueError:
+        return None
+
+
+def _pick_encoding() -> str | None:
+    """依 Accept-Encoding 選擇壓縮方式（gzip 優先）。"""
+    accept = request.accept_encodings
+    if accept["gzip"]:
+        return "gzip"
+    if accept["deflate"]:
+        return "deflate"
+    return None
+
+
+def _send(entry: board.CachedResponse) -> Response:
+    """送出預先序列化的回應：依 Accept-Encoding 壓縮，帶 ETag / Last-Modified 並處理 304。"""
+    encoding = _pick_encoding()
+    resp = Response(entry.encoded(encoding), mimetype="application/json")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.set_etag(entry.etag, weak=True)
+    if entry.updated_at:
+        resp.last_modified = entry.updated_at
+    return resp.make_conditional(request)
+
+
 @config.app.route("/api/data")
 def api_data():
     window = request.args.get("window")   # 'now','1h','24h','today'
     tab = request.args.get("tab")         # 'avg-wind','gust','daily-precip','air-temp','rh'
+    group = request.args.get("group")     # 群組名稱；未指定為「全部」
+    sort = request.args.get("sort")       # 'speed'、'-speed'...；未指定依分頁指標由大到小
+    limit = _int_arg("limit")             # 取前 N 筆（top-N）；未指定回傳全部
+    offset = _int_arg("offset") or 0
+    fmt = request.args.get("format")      # 'compact'：欄式精簡格式；未指定為逐列格式
+    try:
+        # 自訂範圍 (start, end]：YYYY-MM-DD、YYYY-MM-DD HH:MM[:SS] 或帶時區的 ISO 8601；end 省略為現在
+        start = parse_time_bound(request.args.get("start"))
+        end = parse_time_bound(request.args.get("end"))
+        # 同一組參數與 updated_at 的回應已預先序列化；ETag 相同時回 304
+        entry = board.get_response(window, tab, group, sort, limit, offset, fmt, start, end)
+    except ValueError as e:
+        return jsonify({"error": f"invalid start/end: {e}"}), 400
+    return _send(entry)
+
+
+@config.app.route("/api/stations/meta")
+def api_stations_meta():
+    # 精簡格式用的測站 meta 表；內容只隨 stations.xlsx 改變，ETag 為版本雜湊
+    return _send(board.get_meta_response())
+
+
+@config.app.route("/api/station/<station_id>/series")
+def api_station_series(station_id):
+    if get_station_meta(station_id) is None:
+        return jsonify({"error": f"unknown station: {station_id}"}), 404
+    try:
+        q = series.parse_request(
+            parse_time_bound(request.args.get("start")),
+            parse_time_bound(request.args.get("end")),
+            request.args.get("metrics"),      # 逗號分隔，例如 'speed,gust_speed'
+            request.args.get("resolution"),   # 'raw'（預設）、'10m'、'1h'、'1d'
+            request.args.get("agg"),          # 彙總解析度取值：'mean'（預設）、'max'、'min'、'last'
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # 串流輸出：邊讀游標邊送，不組出完整清單
+    resp = Response(series.stream_series(station_id, q), mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@config.app.route("/api/export")
+def api_export():
+    fmt = request.args.get("format") or "csv"   # 'csv'（預設，同每日 CSV 欄位）或 'jsonl'
+    group = request.args.get("group")           # 群組名稱；未指定或「全部」匯出所有測站
+    try:
+        if fmt not in export.FORMATS:
+            raise ValueError("format must be csv or jsonl")
+        if group and group not in get_groups():
+            raise ValueError(f"unknown group: {group}")
+        start = parse_time_bound(request.args.get("start"))
+        if start is None:
+            raise ValueError("start is required")
+        start, end = board.resolve_range(start, parse_time_bound(request.args.get("end")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 邊讀邊送（需要時邊壓縮），不把整段資料載入記憶體
+    encoding = _pick_encoding()
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    resp = Response(export.stream_export(start, end, group, fmt, encoding), mimetype=mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Content-Disposition"] = f'attachment; filename="{export.filename(start, end, fmt)}"'
+    return resp
+
 
+@config.app.route("/api/status")
+def api_status():
+    """後端狀態：最後更新時間、背景寫庫 / CSV 的積壓與落後秒數、記憶體排名是否就緒、自適應抓取的排程。"""
     with config.DATA_LOCK:
         updated_at = config.DATA_CACHE["updated_at"]
-        cached_rows = config.DATA_CACHE["rows"]
-
-    updated_str = updated_at.strftime("%Y-%m-%d %H:%M:%S") if updated_at else None
-
-    all_groups, _, _ = load_station_groups()
-
-    if window and tab:
-        try:
-            rows = db.query_rows_for_window(window, tab)
-            # 補上 zone / groups
-            for row in rows:
-                sid = row.get("station_id")
-                meta = get_station_meta(sid)
-                if not meta:
-                    continue
-                row["zone"] = meta.get("zone")
-                row["groups"] = meta.get("groups", [])
-            return jsonify({
-                "updated_at": updated_str,
-                "groups": all_groups,
-                "rows": rows
-            })
-        except Exception as e:
-            config.app.logger.exception(f"/api/data query failed: {e}")
-            # 失敗退回快取
-            return jsonify({
-                "updated_at": updated_str,
-                "groups": all_groups,
-                "rows": cached_rows
-            })
-    else:
-        # 原行為：回傳快取（最新一輪）
-        return jsonify({
-            "updated_at": updated_str,
-            "groups": all_groups,
-            "rows": cached_rows
-        })
+    resp = jsonify({
+        "updated_at": updated_at.strftime("%Y-%m-%d %H:%M:%S") if updated_at else None,
+        "persist": persist.status(),
+        "ring_warm": RING.is_warm(),
+        "latest_loaded": LATEST.is_loaded(),
+        "polling": PLANNER.summary(get_all_station_ids(), time.time()) if config.ADAPTIVE_POLLING else None,
+    })
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
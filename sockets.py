@@ -0,0 +1,46 @@
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+import config
+import modules.db as db
+import modules.push as push
+from utils.stations import load_station_groups
+
+# 連線 sid -> 目前訂閱的 room key
+_CLIENT_ROOMS: dict = {}
+
+
+def _leave_current(sid: str) -> None:
+    key = _CLIENT_ROOMS.pop(sid, None)
+    if key is not None:
+        leave_room(push.room_name(key))
+        push.unsubscribe(key)
+
+
+@config.socketio.on("subscribe")
+def on_subscribe(data):
+    """
+    前端切換 window/tab/group 時送出 {window, tab, group, format}（format="compact" 為欄式精簡格式）；
+    伺服器把連線移到對應 room，並立即回傳該 room 的完整內容（board_data）。
+    """
+    data = data or {}
+    window = data.get("window") if data.get("window") in db.WINDOWS else "now"
+    tab = data.get("tab") if data.get("tab") in db.TABS else "avg-wind"
+    # 不存在的群組視為「全部」：任意字串不會各自開出一個每輪都要組資料、推播的 room
+    group = data.get("group") if data.get("group") in load_station_groups()[0] else push.ALL_GROUP
+    fmt = "compact" if data.get("format") == "compact" else "rows"
+    key = (window, tab, group, fmt)
+
+    sid = request.sid
+    if _CLIENT_ROOMS.get(sid) == key:
+        # 同一 room 重送訂閱：不重複計數，直接回傳目前內容
+        emit("board_data", push.snapshot(key))
+        return
+    _leave_current(sid)
+    join_room(push.room_name(key))
+    _CLIENT_ROOMS[sid] = key
+    emit("board_data", push.subscribe(key))
+
+
+@config.socketio.on("disconnect")
+def on_disconnect(*args):
+    _leave_current(request.sid)
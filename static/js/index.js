@@ -1,6 +1,10 @@
 let CURRENT_GROUP = "全部";         // 目前選擇的群組（工作表種類）
 let AVAILABLE_GROUPS = ["全部"];    // 從後端取得的所有群組名稱（含「全部」）
-let LAST_DATA = null;               // 暫存最後一次 /api/data 回傳結果，方便切換群組時重新渲染
+let LAST_DATA = null;               // 暫存目前顯示的列（已由伺服器過濾、排名），套用推播變更用
+let LAST_SORT = null;               // 伺服器回傳的排序方式，例如 "-speed"
+let LAST_OFFSET = 0;                // 分頁起點，名次編號 = offset + i + 1
+let STATION_META = null;            // /api/stations/meta（精簡格式用的測站表），以 version 快取在 localStorage
+const META_STORAGE_KEY = 'cwa-board-station-meta';
 
 
 function parseNum(x) {
@@ -23,11 +27,14 @@ function fieldsFor(tab) {
     }
 }
 
-function sortRowsFor(tab, rows) {
-    const { sp } = fieldsFor(tab);
+// 依伺服器給的排序方式（"-欄位" 由大到小）重新排名；只在套用推播變更後使用，空值排最後
+function sortRowsBySpec(spec, rows) {
+    if (!spec) return rows;
+    const desc = spec.startsWith('-');
+    const field = desc ? spec.slice(1) : spec;
     return rows.slice().sort((a, b) => {
-        const av = parseNum(a[sp]);
-        const bv = parseNum(b[sp]);
+        const av = parseNum(a[field]);
+        const bv = parseNum(b[field]);
         if (av == null && bv == null) {
             return 0;
         } else if (av == null) {
@@ -35,13 +42,13 @@ function sortRowsFor(tab, rows) {
         } else if (bv == null) {
             return -1;
         }
-        return bv-av;
+        return desc ? bv-av : av-bv;
     });
 }
 
-function renderTableWithGroupFilter(tab) {
+function renderTable(tab) {
     const fs = fieldsFor(tab);
-    const rows = sortRowsFor(tab, filterRowsByGroup(LAST_DATA));
+    const rows = LAST_DATA || [];
     const tbody = document.querySelector('#board tbody');
     tbody.innerHTML = '';
     rows.forEach((r, i) => {
@@ -56,7 +63,7 @@ function renderTableWithGroupFilter(tab) {
                 style="transform:rotate(${toDeg}deg);" /></td>`;
         const tr = document.createElement('tr');
         tr.innerHTML = `
-            <td>${i+1}</td>
+            <td>${LAST_OFFSET+i+1}</td>
             <td>${r.zone}</td>
             <td>${r.name}</td>
             <td class="muted">${r.station_id}</td>
@@ -84,11 +91,84 @@ function labelOfWindow(w) {
     }
 }
 
+// 取得指定版本的測站 meta 表：先看記憶體，再看 localStorage，都不符才向伺服器要
+async function loadStationMeta(version) {
+    if (STATION_META && STATION_META.version === version) return STATION_META;
+    try {
+        const saved = JSON.parse(localStorage.getItem(META_STORAGE_KEY) || 'null');
+        if (saved && saved.version === version) {
+            STATION_META = saved;
+            return STATION_META;
+        }
+    } catch (e) {
+        // localStorage 不可用或內容損壞時直接重抓
+    }
+    const res = await fetch('/api/stations/meta', { cache: 'no-cache' });
+    STATION_META = await res.json();
+    try {
+        localStorage.setItem(META_STORAGE_KEY, JSON.stringify(STATION_META));
+    } catch (e) {
+        // 容量不足等情況：只保留在記憶體
+    }
+    return STATION_META;
+}
+
+// 精簡格式（format=compact）還原成逐列物件；逐列格式原樣回傳
+async function decodeRows(data) {
+    if (data.format !== 'compact') return data.rows || [];
+    const meta = await loadStationMeta(data.meta_version);
+    const { idx, value, dir, time } = data.cols;
+    const { value: valueField, dir: dirField } = data.fields;
+    return idx.map((k, i) => {
+        const row = {
+            station_id: meta.ids[k],
+            zone: meta.zone[k],
+            name: meta.name[k],
+            groups: meta.groups[k].map((g) => meta.group_names[g]),
+            time: data.times[time[i]],
+        };
+        row[valueField] = value[i];
+        if (dirField) row[dirField] = dir[i];
+        return row;
+    });
+}
+
 async function fetchAndRender() {
-    const params = new URLSearchParams({ window: currentWindow, tab: currentTab });
-    const res = await fetch(`/api/data?${params.toString()}`, { cache: 'no-store' });
+    // 群組過濾與排名都在伺服器端完成，只拿畫面要顯示的列
+    const params = new URLSearchParams({
+        window: currentWindow, tab: currentTab, group: CURRENT_GROUP, format: 'compact',
+    });
+    // no-cache：每次都向伺服器確認，資料未更新時伺服器回 304、瀏覽器沿用快取
+    const res = await fetch(`/api/data?${params.toString()}`, { cache: 'no-cache' });
     const data = await res.json();
-    LAST_DATA = data.rows;
+    await applyBoardData(data);
+}
+
+// 依目前的 window/tab/group 取資料：已連上 WebSocket 就訂閱對應 room（伺服器回 board_data），否則走 HTTP
+function requestBoard() {
+    if (typeof socket !== 'undefined' && socket.connected) {
+        socket.emit('subscribe', {
+            window: currentWindow, tab: currentTab, group: CURRENT_GROUP, format: 'compact',
+        });
+    } else {
+        fetchAndRender();
+    }
+}
+
+function isCurrentBoard(data) {
+    // HTTP 回應沒有 window/tab；推播資料需與目前畫面一致才套用
+    return (data.window === undefined || (data.window === currentWindow && data.tab === currentTab))
+        && (data.group === undefined || data.group === CURRENT_GROUP);
+}
+
+// 完整資料（HTTP /api/data 或 WebSocket board_data）
+async function applyBoardData(data) {
+    if (!isCurrentBoard(data)) return;
+    const rows = await decodeRows(data);
+    if (!isCurrentBoard(data)) return;   // 等待 meta 期間畫面可能已切換
+    LAST_DATA = rows;
+    LAST_SORT = data.sort || null;
+    LAST_OFFSET = data.offset || 0;
     const el = document.getElementById('updatedAt');
     if (el) el.textContent = data.updated_at || '尚未更新';
 
@@ -100,7 +180,25 @@ async function fetchAndRender() {
         buildGroupFilter(data.groups);
     }
 
-    renderTableWithGroupFilter(currentTab);
+    renderTable(currentTab);
+}
+
+// 變更列（WebSocket board_delta）：只更新有變的站、移除已不在結果內的站
+async function applyBoardDelta(delta) {
+    if (!isCurrentBoard(delta) || !LAST_DATA) return;
+    const changed = await decodeRows(delta);
+    if (!isCurrentBoard(delta) || !LAST_DATA) return;
+    // 精簡格式的 removed 為測站索引
+    const removed = delta.format === 'compact'
+        ? (delta.removed || []).map((k) => STATION_META.ids[k])
+        : (delta.removed || []);
+    const byId = new Map(LAST_DATA.map((r) => [r.station_id, r]));
+    removed.forEach((sid) => byId.delete(sid));
+    changed.forEach((r) => byId.set(r.station_id, r));
+    LAST_DATA = sortRowsBySpec(delta.sort || LAST_SORT, Array.from(byId.values()));
+    const el = document.getElementById('updatedAt');
+    if (el) el.textContent = delta.updated_at || '尚未更新';
+    renderTable(currentTab);
 }
 
 function buildGroupFilter(groups) {
@@ -133,29 +231,10 @@ function buildGroupFilter(groups) {
         b.classList.toggle("active", b.dataset.group === CURRENT_GROUP);
       });
 
-      // 只改變前端篩選，不重打 API
-      if (LAST_DATA) {
-        renderTableWithGroupFilter(currentTab);
-      }
+      // 群組由伺服器端過濾：改訂閱該群組的 room
+      requestBoard();
     });
 
     container.appendChild(btn);
   });
 }
-
-function filterRowsByGroup(rows) {
-  if (!CURRENT_GROUP || CURRENT_GROUP === "全部") {
-    return rows;
-  }
-  return rows.filter((row) => {
-    const gs = row.groups || row.group || []; // 保險起見多幾種欄位名
-    if (Array.isArray(gs)) {
-      return gs.includes(CURRENT_GROUP);
-    }
-    // 如果後端未來改成單一字串也能相容
-    if (typeof gs === "string") {
-      return gs === CURRENT_GROUP;
-    }
-    return false;
-  });
-}
@@ -1,33 +1,97 @@
+import threading
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Any, List
+from urllib.parse import urlencode, urlsplit
+from requests.adapters import HTTPAdapter
 import config
 from utils.stations import get_all_station_ids, get_station_meta
 import utils.parser as parser
 import utils.cleaners as cleaners
+from utils.observation import Observation
 
 TPE = config.TPE
 
-
-def fetch_from_api(base_url: str, station_ids: List[str]) -> Dict[str, Dict[str, Any]]:
-    """
-    回傳 {station_id: {'speed': float|None, 'dir': any, 'gust': any}, ...}
-    任何解析失敗不會 raise，直接略過該筆或設為 None。
-    """
-    if not station_ids:
-        return {}
-    params = {
+# 每個 CWA 主機共用一個 keep-alive session；分段請求共用同一個有上限的 worker pool
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+_EXECUTOR: ThreadPoolExecutor | None = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# 各站近幾輪是否需要 API2 補值（bitmask，最低位為最近一輪），用來預測本輪要同時向 API2 要哪些站
+FILL_HISTORY_CYCLES = 6
+_FILL_HISTORY: Dict[str, int] = {}
+
+
+def _get_session(base_url: str) -> requests.Session:
+    """依 API 主機取得（或建立）可重用連線的 session。"""
+    host = urlsplit(base_url).netloc
+    with _SESSIONS_LOCK:
+        sess = _SESSIONS.get(host)
+        if sess is None:
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, config.FETCH_MAX_WORKERS))
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            _SESSIONS[host] = sess
+        return sess
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, config.FETCH_MAX_WORKERS),
+                thread_name_prefix="cwa-fetch"
+            )
+        return _EXECUTOR
+
+
+def _base_params() -> Dict[str, str]:
+    return {
         "Authorization": config.CWA_TOKEN,
         "format": "JSON",
-        "StationId": ",".join(station_ids),
+        "StationId": "",
         "WeatherElement": config.FIELDS
     }
+
+
+def _chunk_station_ids(base_url: str, station_ids: List[str]) -> List[List[str]]:
+    """
+    依 FETCH_MAX_URL_LEN 把測站代碼切段，讓每段請求的 URL 不超過上限。
+    以 URL 編碼後的長度計算（逗號會編成 %2C）；至少每段一站。
+    """
+    overhead = len(base_url) + 1 + len(urlencode(_base_params()))
+    budget = max(0, config.FETCH_MAX_URL_LEN - overhead)
+
+    chunks: List[List[str]] = []
+    cur: List[str] = []
+    cur_len = 0
+    for sid in station_ids:
+        add = len(urlencode({"": sid})) - 1 + (3 if cur else 0)
+        if cur and cur_len + add > budget:
+            chunks.append(cur)
+            cur, cur_len = [], 0
+            add -= 3
+        cur.append(sid)
+        cur_len += add
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def _fetch_chunk(base_url: str, station_ids: List[str]) -> List[Dict[str, Any]]:
+    """抓一段測站，回傳原始 records；失敗回傳空 list，不 raise。"""
+    params = _base_params()
+    params["StationId"] = ",".join(station_ids)
     try:
-        r = requests.get(base_url, params=params, timeout=config.FETCH_TIMEOUT)
+        r = _get_session(base_url).get(base_url, params=params, timeout=config.FETCH_TIMEOUT)
         r.raise_for_status()
         payload = r.json()
     except Exception as e:
         config.app.logger.warning(f"[fetch_from_api] request error: {e}")
-        return {}
+        return []
 
     # records.Station or records.location
     records = None
@@ -40,71 +104,106 @@ def fetch_from_api(base_url: str, station_ids: List[str]) -> Dict[str, Dict[str,
 
     if not isinstance(records, list):
         config.app.logger.warning("[fetch_from_api] unexpected JSON shape; 'records.Station' not found.")
-        return {}
+        return []
+    return records
 
-    out: Dict[str, Dict[str, Any]] = {}
-    for rec in records:
-        sid, data = parser.parse_record(rec)
-        if sid:
-            out[sid] = data
+
+def _submit_fetch(base_url: str, station_ids: List[str]) -> List[Future]:
+    """把各段請求送進 worker pool，立即回傳 futures（不等待）。"""
+    if not station_ids:
+        return []
+    executor = _get_executor()
+    return [executor.submit(_fetch_chunk, base_url, chunk)
+            for chunk in _chunk_station_ids(base_url, station_ids)]
+
+
+def _collect(futures: List[Future]) -> Dict[str, Observation]:
+    """等待各段請求完成並解析合併成 {station_id: Observation}（zone/name 尚未填）。"""
+    out: Dict[str, Observation] = {}
+    fields = parser.PARSED_FIELDS
+    for f in futures:
+        ids, cols = parser.parse_records(f.result())
+        # PARSED_FIELDS 的順序與 Observation 在 station_id/zone/name 之後的欄位一致
+        for sid, *values in zip(ids, *(cols[k] for k in fields)):
+            if sid:
+                out[sid] = Observation(sid, None, None, *values)
     return out
 
 
-def build_rows(merged: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """產出各站氣象參數（欄位統一：station_id/name/time/speed/dir/...）"""
-    rows: List[Dict[str, Any]] = []
-    for sid, entry in merged.items():
-        station_meta = get_station_meta(sid)
-        name = station_meta["name"]
-        zone = station_meta["zone"]
-
-        rows.append({
-            "station_id": sid,
-            "zone": zone,
-            "name": name,
-            "time": entry.get("obs_time"),
-            "speed": entry.get("speed"),
-            "dir": entry.get("dir"),
-            "gust_speed": entry.get("gust_speed"),
-            "gust_dir": entry.get("gust_dir"),
-            "gust_time": entry.get("gust_time"),
-            "precip": entry.get("precip"),
-            "air_temp": entry.get("air_temp"),
-            "tmax": entry.get("tmax"),
-            "tmax_time": entry.get("tmax_time"),
-            "tmin": entry.get("tmin"),
-            "tmin_time": entry.get("tmin_time"),
-            "rh": entry.get("rh"),
-            "pres": entry.get("pres")
-        })
+def fetch_from_api(base_url: str, station_ids: List[str]) -> Dict[str, Observation]:
+    """
+    回傳 {station_id: Observation, ...}
+    測站清單依 URL 長度切段，各段在 worker pool 平行抓取後合併。
+    任何解析失敗不會 raise，直接略過該筆或設為 None；單段失敗只少該段的站。
+    """
+    return _collect(_submit_fetch(base_url, station_ids))
+
+
+def _predict_fill(station_ids: List[str]) -> List[str]:
+    """近 FILL_HISTORY_CYCLES 輪內曾需要 API2 補值的站。"""
+    return [sid for sid in station_ids if _FILL_HISTORY.get(sid)]
+
+
+def _record_fill_history(station_ids: List[str], need_fill: set[str]) -> None:
+    mask = (1 << FILL_HISTORY_CYCLES) - 1
+    for sid in station_ids:
+        hist = ((_FILL_HISTORY.get(sid, 0) << 1) | (sid in need_fill)) & mask
+        if hist:
+            _FILL_HISTORY[sid] = hist
+        else:
+            _FILL_HISTORY.pop(sid, None)
+
+
+def build_rows(merged: Dict[str, Observation | None]) -> List[Observation]:
+    """產出各站氣象參數（補上 Excel 測站清單的 zone/name；沒抓到的站給空的 Observation）"""
+    rows: List[Observation] = []
+    for sid, obs in merged.items():
+        # 抓取期間名單可能已熱更新：不在新名單中的站沒有 meta，zone/name 留空，不讓整輪失敗
+        station_meta = get_station_meta(sid) or {}
+        if obs is None:
+            obs = Observation(sid)
+        obs.zone = station_meta.get("zone")
+        obs.name = station_meta.get("name")
+        rows.append(obs)
 
     return rows
 
 
-def fetch_data() -> List[Dict[str, Any]]:
+def fetch_data(station_ids: List[str] | None = None) -> List[Observation]:
     """
-    先抓 API1 全量 -> 找出缺失/風速為 None 的站 -> 用 API2 補 -> 合併
-    回傳排序後的 list[ {station_id, name, speed, dir, gust} ]
+    API1 全量與 API2（預測會缺值的站）同時抓 -> 找出缺失/風速為 None 的站
+    -> 預測漏掉的站再向 API2 補抓 -> 合併
+    station_ids 指定時只抓這些站（ADAPTIVE_POLLING 只抓到期的站），預設為名單上所有測站。
+    回傳各站 list[Observation]
     """
-    all_ids = get_all_station_ids()
+    all_ids = get_all_station_ids() if station_ids is None else station_ids
 
-    # 1) API1 全抓
-    data1 = fetch_from_api(config.API1, all_ids)
+    # 1) API1 全抓；同時以 API2 抓近幾輪常缺值的站
+    predicted = _predict_fill(all_ids)
+    futures1 = _submit_fetch(config.API1, all_ids)
+    futures2 = _submit_fetch(config.API2, predicted)
+    data1 = _collect(futures1)
 
     # 2) 判定哪些站需要補：沒有出現在 data1，或 speed 為 None
-    need_fill = [sid for sid in all_ids if (sid not in data1) or (data1[sid].get("speed") is None)]
-    
-    # 3) API2 補缺
-    data2 = fetch_from_api(config.API2, need_fill) if need_fill else {}
-    
+    need_fill = [sid for sid in all_ids if (sid not in data1) or (data1[sid].speed is None)]
+
+    # 3) API2 補缺：預測沒涵蓋到的站才補送一次小請求
+    predicted_set = set(predicted)
+    missed = [sid for sid in need_fill if sid not in predicted_set]
+    futures_missed = _submit_fetch(config.API2, missed)
+    data2 = _collect(futures2)
+    data2.update(_collect(futures_missed))
+    _record_fill_history(all_ids, set(need_fill))
+
     # 4) 合併：以 data1 為主，缺的才用 data2
-    merged: Dict[str, Dict[str, Any]] = {}
+    merged: Dict[str, Observation | None] = {}
     for sid in all_ids:
-        base = data1.get(sid) or {}
-        if (not base) or (base.get("speed") is None):
-            fill = data2.get(sid) or {}
-            # 以補到的覆蓋缺值
-            base = {**base, **{k:v for k,v in fill.items() if v not in (None, {}, "")}}
+        base = data1.get(sid)
+        if (base is None) or (base.speed is None):
+            fill = data2.get(sid)
+            if fill is not None:
+                # 以補到的覆蓋缺值
+                base = (base if base is not None else Observation(sid)).fill_from(fill)
         merged[sid] = base
     rows = build_rows(merged)
 
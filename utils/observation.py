@@ -0,0 +1,68 @@
+from typing import Any, Dict, Tuple
+
+
+class Observation:
+    """
+    單站單筆觀測（fetcher -> cleaners -> DB / 快取 全程使用），以 __slots__ 省去每列 dict。
+    欄位順序與 observations 資料表一致（time 即 obs_time）；到 route 邊界才以 to_dict() 轉成 JSON 用的 dict。
+    """
+    FIELDS = (
+        "station_id", "zone", "name", "time",
+        "speed", "dir", "gust_speed", "gust_dir", "gust_time",
+        "precip", "air_temp", "rh", "pres",
+        "tmax", "tmax_time", "tmin", "tmin_time",
+    )
+    # 對外 JSON 的鍵順序（沿用既有 /api/data rows）
+    JSON_FIELDS = (
+        "station_id", "zone", "name", "time",
+        "speed", "dir", "gust_speed", "gust_dir", "gust_time",
+        "precip", "air_temp", "tmax", "tmax_time", "tmin", "tmin_time",
+        "rh", "pres",
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, station_id, zone=None, name=None, time=None,
+                 speed=None, dir=None, gust_speed=None, gust_dir=None, gust_time=None,
+                 precip=None, air_temp=None, rh=None, pres=None,
+                 tmax=None, tmax_time=None, tmin=None, tmin_time=None):
+        self.station_id = station_id
+        self.zone = zone
+        self.name = name
+        self.time = time
+        self.speed = speed
+        self.dir = dir
+        self.gust_speed = gust_speed
+        self.gust_dir = gust_dir
+        self.gust_time = gust_time
+        self.precip = precip
+        self.air_temp = air_temp
+        self.rh = rh
+        self.pres = pres
+        self.tmax = tmax
+        self.tmax_time = tmax_time
+        self.tmin = tmin
+        self.tmin_time = tmin_time
+
+    def as_tuple(self) -> Tuple:
+        """依 FIELDS（資料表欄位）順序回傳 tuple，給 executemany 用。"""
+        return tuple(getattr(self, k) for k in self.FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉成 /api/data rows 的 dict。"""
+        return {k: getattr(self, k) for k in self.JSON_FIELDS}
+
+    def fill_from(self, other: "Observation") -> "Observation":
+        """以 other 中有值（非 None / {} / ''）的欄位覆蓋自己；station_id 不動。回傳自己。"""
+        for k in self.FIELDS[1:]:
+            v = getattr(other, k)
+            if v not in (None, {}, ""):
+                setattr(self, k, v)
+        return self
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Observation) and self.as_tuple() == other.as_tuple()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Observation({self.station_id!r}, time={self.time!r}, speed={self.speed!r})"
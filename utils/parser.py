@@ -1,8 +1,8 @@
 import json
 from datetime import datetime, timedelta, time
 from typing import Tuple, Dict, Any
-from zoneinfo import ZoneInfo
 import config
+import utils.timecache as timecache
 
 TPE = config.TPE
 
@@ -47,20 +47,9 @@ def _safe_str(x):
 
 
 def _iso_to_tpe_str(x: str | None) -> str | None:
-    """接收 ISO 8601（含 Z 或 +00:00/+08:00），回傳 %Y-%m-%d %H:%M:%S 格式。"""
-    if not x:
-        return None
-    try:
-        s = x.replace("Z", "+00:00")
-        dt = datetime.fromisoformat(s)
-        if dt.tzinfo is None:
-            # 若來源沒 tz，保守視為 UTC 再轉台北（依需求可調）
-            dt = dt.replace(tzinfo=ZoneInfo("UTC"))
-        return dt.astimezone(TPE).strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        # 如果解析資料，就原樣回傳
-        return x
-    
+    """接收 ISO 8601（含 Z 或 +00:00/+08:00），回傳 %Y-%m-%d %H:%M:%S 格式（經共用 LRU 快取）。"""
+    return timecache.iso_to_local_str(x)
+
 
 def _extract_station_id(rec: Dict[str, Any]) -> str | None:
     for k in ("StationId","stationId","StationID","STID","stno"):
@@ -186,6 +175,198 @@ def parse_record(rec: Dict[str, Any]) -> Tuple[str | None, Dict[str, Any]]:
     }
 
 
+# --- 批次解析：每個回應只判斷一次鍵名大小寫/結構，再以固定取值計畫抽出各欄 ---
+PARSED_FIELDS = (
+    "obs_time", "speed", "dir", "gust_speed", "gust_dir", "gust_time",
+    "precip", "air_temp", "rh", "pres", "tmax", "tmax_time", "tmin", "tmin_time",
+)
+_PLAN_SAMPLE = 50   # 判斷鍵名時最多看前幾筆
+
+
+def _pick_key(dicts, candidates):
+    """在樣本 dict 中找第一個出現的候選鍵；都沒有則回傳第一個候選。"""
+    for d in dicts:
+        for k in candidates:
+            if k in d:
+                return k
+    return candidates[0]
+
+
+def _sub_dicts(dicts, key):
+    return [v for v in (d.get(key) for d in dicts) if isinstance(v, dict)]
+
+
+def _resolve_plan(records: list) -> Dict[str, Any]:
+    """
+    依前 _PLAN_SAMPLE 筆判斷此回應使用的鍵名（StationId/stationId、WeatherElement/weatherElement...），
+    以及各欄位位於 WeatherElement 或 record 本身（等同 {**rec, **we} 的查找順序）。
+    """
+    recs = [r for r in records[:_PLAN_SAMPLE] if isinstance(r, dict)]
+    sid_key = _pick_key(recs, ("StationId", "stationId", "StationID", "STID", "stno"))
+    we_key = _pick_key(recs, ("WeatherElement", "weatherElement"))
+    wes = _sub_dicts(recs, we_key)
+
+    def field(*candidates):
+        # (是否在 WeatherElement 內, 鍵名)
+        for d in wes:
+            for k in candidates:
+                if k in d:
+                    return True, k
+        for d in recs:
+            for k in candidates:
+                if k in d:
+                    return False, k
+        return True, candidates[0]
+
+    obs_key = _pick_key(recs, ("ObsTime", "obsTime", "time"))
+    obs_dt_key = _pick_key(_sub_dicts(recs, obs_key), ("DateTime", "obsTime"))
+
+    gust = field("GustInfo", "GUST", "Gust")
+    gusts = _sub_dicts(wes if gust[0] else recs, gust[1])
+    gust_occ_key = _pick_key(gusts, ("Occurred_at", "occurred_at"))
+    gust_occs = _sub_dicts(gusts, gust_occ_key)
+
+    now = field("Now", "now")
+    de = field("DailyExtreme", "dailyExtreme")
+    des = _sub_dicts(wes if de[0] else recs, de[1])
+    dh_key = _pick_key(des, ("DailyHigh", "dailyHigh"))
+    dl_key = _pick_key(des, ("DailyLow", "dailyLow"))
+    tinfos = (_sub_dicts(_sub_dicts(des, dh_key), "TemperatureInfo")
+              + _sub_dicts(_sub_dicts(des, dh_key), "temperatureInfo")
+              + _sub_dicts(_sub_dicts(des, dl_key), "TemperatureInfo")
+              + _sub_dicts(_sub_dicts(des, dl_key), "temperatureInfo"))
+    tinfo_key = _pick_key(_sub_dicts(des, dh_key) + _sub_dicts(des, dl_key),
+                          ("TemperatureInfo", "temperatureInfo"))
+    tinfo_occ_key = _pick_key(tinfos, ("Occurred_at", "occurred_at"))
+    tinfo_occs = _sub_dicts(tinfos, tinfo_occ_key)
+
+    return {
+        "sid": sid_key,
+        "we": we_key,
+        "obs": obs_key,
+        "obs_dt": obs_dt_key,
+        "speed": field("WindSpeed", "WDSD", "WIND_SPEED"),
+        "wdir": field("WindDirection", "WDIR"),
+        "gust": gust,
+        "gust_speed": _pick_key(gusts, ("PeakGustSpeed", "peakGustSpeed")),
+        "gust_occ": gust_occ_key,
+        "gust_dir": _pick_key(gust_occs, ("WindDirection", "windDirection")),
+        "gust_dt": _pick_key(gust_occs, ("DateTime", "dateTime")),
+        "now": now,
+        "precip": _pick_key(_sub_dicts(wes if now[0] else recs, now[1]), ("Precipitation", "precipitation")),
+        "air_temp": field("AirTemperature", "airTemperature"),
+        "rh": field("RelativeHumidity", "relativeHumidity"),
+        "pres": field("AirPressure", "airPressure"),
+        "de": de,
+        "dh": dh_key,
+        "dl": dl_key,
+        "tinfo": tinfo_key,
+        "tinfo_temp": _pick_key(tinfos, ("AirTemperature", "airTemperature")),
+        "tinfo_occ": tinfo_occ_key,
+        "tinfo_dt": _pick_key(tinfo_occs, ("DateTime", "dateTime")),
+    }
+
+
+def _num(x):
+    # 數值型別直接轉，其餘才走 _safe_float 的字串判斷
+    t = type(x)
+    if t is float:
+        return x
+    if t is int:
+        return float(x)
+    return _safe_float(x)
+
+
+def parse_records(records: list) -> Tuple[list, Dict[str, list]]:
+    """
+    批次解析同一回應內的 records。
+    回傳 (station_ids, columns)：station_ids 與 columns[欄位] 皆為與 records 等長的 list，
+    欄位同 PARSED_FIELDS、數值與 parse_record 一致。
+    不符合本回應鍵名計畫的 record（缺站號或 WeatherElement 非 dict）改用 parse_record 逐筆解析。
+    """
+    plan = _resolve_plan(records)
+    sid_key, we_key = plan["sid"], plan["we"]
+    obs_key, obs_dt_key = plan["obs"], plan["obs_dt"]
+    speed_in_we, speed_key = plan["speed"]
+    wdir_in_we, wdir_key = plan["wdir"]
+    gust_in_we, gust_key = plan["gust"]
+    gust_speed_key, gust_occ_key = plan["gust_speed"], plan["gust_occ"]
+    gust_dir_key, gust_dt_key = plan["gust_dir"], plan["gust_dt"]
+    now_in_we, now_key = plan["now"]
+    precip_key = plan["precip"]
+    at_in_we, at_key = plan["air_temp"]
+    rh_in_we, rh_key = plan["rh"]
+    pres_in_we, pres_key = plan["pres"]
+    de_in_we, de_key = plan["de"]
+    dh_key, dl_key, tinfo_key = plan["dh"], plan["dl"], plan["tinfo"]
+    tinfo_temp_key, tinfo_occ_key, tinfo_dt_key = plan["tinfo_temp"], plan["tinfo_occ"], plan["tinfo_dt"]
+
+    ids = []
+    cols = {k: [] for k in PARSED_FIELDS}
+    c_obs, c_speed, c_dir = cols["obs_time"], cols["speed"], cols["dir"]
+    c_gs, c_gd, c_gt = cols["gust_speed"], cols["gust_dir"], cols["gust_time"]
+    c_precip, c_at, c_rh, c_pres = cols["precip"], cols["air_temp"], cols["rh"], cols["pres"]
+    c_tmax, c_tmax_t, c_tmin, c_tmin_t = cols["tmax"], cols["tmax_time"], cols["tmin"], cols["tmin_time"]
+    empty = {}
+
+    for rec in records:
+        sid = rec.get(sid_key) if isinstance(rec, dict) else None
+        we = rec.get(we_key) if sid else None
+        if not sid or not isinstance(we, dict):
+            # 與計畫不符：退回逐筆解析
+            sid, data = parse_record(rec) if isinstance(rec, dict) else (None, {})
+            ids.append(sid)
+            for k in PARSED_FIELDS:
+                cols[k].append(data.get(k))
+            continue
+        ids.append(str(sid))
+
+        obs = rec.get(obs_key)
+        c_obs.append(_iso_to_tpe_str(_safe_str(obs.get(obs_dt_key) or None)) if isinstance(obs, dict) else None)
+
+        c_speed.append(_num((we if speed_in_we else rec).get(speed_key) or None))
+        c_dir.append(_safe_str((we if wdir_in_we else rec).get(wdir_key) or None))
+
+        g = (we if gust_in_we else rec).get(gust_key)
+        if isinstance(g, dict):
+            c_gs.append(_num(g.get(gust_speed_key) or None))
+            occ = g.get(gust_occ_key)
+            if isinstance(occ, dict):
+                c_gd.append(_safe_str(occ.get(gust_dir_key) or None))
+                c_gt.append(_iso_to_tpe_str(_safe_str(occ.get(gust_dt_key) or None)))
+            else:
+                c_gd.append(None)
+                c_gt.append(None)
+        else:
+            gust = _parse_gust(g or None)
+            c_gs.append(gust["speed"])
+            c_gd.append(gust["dir"])
+            c_gt.append(gust["time"])
+
+        now_obj = (we if now_in_we else rec).get(now_key)
+        c_precip.append(_num(now_obj.get(precip_key)) if isinstance(now_obj, dict) else None)
+        c_at.append(_num((we if at_in_we else rec).get(at_key)))
+        c_rh.append(_num((we if rh_in_we else rec).get(rh_key)))
+        c_pres.append(_num((we if pres_in_we else rec).get(pres_key)))
+
+        de = (we if de_in_we else rec).get(de_key)
+        if not isinstance(de, dict):
+            de = empty
+        for extreme_key, c_val, c_time in ((dh_key, c_tmax, c_tmax_t), (dl_key, c_tmin, c_tmin_t)):
+            ext = de.get(extreme_key)
+            tinfo = ext.get(tinfo_key) if isinstance(ext, dict) else None
+            if isinstance(tinfo, dict):
+                c_val.append(_num(tinfo.get(tinfo_temp_key)))
+                occ = tinfo.get(tinfo_occ_key)
+                c_time.append(_iso_to_tpe_str(_safe_str(occ.get(tinfo_dt_key) or None))
+                              if isinstance(occ, dict) else None)
+            else:
+                c_val.append(None)
+                c_time.append(None)
+
+    return ids, cols
+
+
 def time_window_bounds(window: str) -> Tuple[str | None, str | None]:
     """
     回傳 (start, end) 的字串時間（%Y-%m-%d %H:%M:%S, UTC+8），
@@ -215,3 +396,19 @@ def time_window_bounds(window: str) -> Tuple[str | None, str | None]:
         
     # 預設當作 now
     return (None, None)
+
+
+def parse_time_bound(x: str | None) -> str | None:
+    """
+    解析 API 的 start / end 參數，回傳 %Y-%m-%d %H:%M:%S（UTC+8）；未提供回傳 None。
+    接受 YYYY-MM-DD（當天 00:00）、YYYY-MM-DD HH:MM[:SS]（視為台灣時間）、
+    以及帶時區的 ISO 8601（換算為台灣時間）。格式錯誤拋出 ValueError。
+    """
+    if x is None or not str(x).strip():
+        return None
+    s = str(x).strip().replace("Z", "+00:00")
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(TPE)
+    return dt.replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
+
@@ -0,0 +1,114 @@
+"""
+依 CWA 實際發布節奏決定每輪要抓哪些站（ADAPTIVE_POLLING）。
+
+大部分測站每 10 分鐘一筆觀測，發布時間大致是「觀測時間 + 固定延遲」；固定每分鐘全量抓取，
+多數輪次只是重抓同樣的資料。這裡記下每站：
+  - 觀測間隔（相鄰兩筆新觀測時間差的最小值，預設 600 秒）
+  - 發布延遲（第一次看到新觀測的時間 - 觀測時間，取近幾次的最小值）
+預估下一筆的發布時間 = 最新觀測時間 + 觀測間隔 + 發布延遲，提早 ADAPTIVE_FAST_SEC / 2 秒開始檢查；
+沒等到就每 ADAPTIVE_FAST_SEC 秒再查，連續 FAST_RETRIES 次仍沒有就加倍退避，最長 ADAPTIVE_MAX_BACKOFF_SEC 秒
+（離線、停報的站）。排程每 ADAPTIVE_TICK_SEC 秒問一次 due()，只抓到期的站；同一批發布的站自然落在同一輪。
+"""
+import statistics
+import threading
+from collections import deque
+from typing import Dict, List
+import config
+import utils.timecache as timecache
+from utils.observation import Observation
+
+DEFAULT_CADENCE_SEC = 600
+HISTORY = 6          # 每站保留幾次間隔 / 延遲樣本
+FAST_RETRIES = 4     # 預估時間後以固定間隔重查的次數，之後才加倍退避
+
+
+def _epoch(ts: str | None) -> float | None:
+    dt = timecache.parse_local(ts)
+    return dt.replace(tzinfo=config.TPE).timestamp() if dt is not None else None
+
+
+class PollPlanner:
+    """每站的最新觀測時間、間隔 / 延遲樣本與下次檢查時間；時間皆為 epoch 秒。"""
+
+    def __init__(self, fast_sec: float, max_backoff_sec: float):
+        self.fast_sec = fast_sec
+        self.max_backoff_sec = max_backoff_sec
+        self._lock = threading.Lock()
+        self._last: Dict[str, float] = {}          # 最新觀測時間
+        self._cadences: Dict[str, deque] = {}      # 相鄰新觀測的時間差
+        self._lags: Dict[str, deque] = {}          # 觀測時間 -> 第一次看到的秒數
+        self._misses: Dict[str, int] = {}          # 預估時間後連續沒等到新觀測的次數
+        self._next: Dict[str, float] = {}          # 下次檢查時間；沒有記錄表示立即檢查
+
+    def due(self, station_ids: List[str], now: float) -> List[str]:
+        """station_ids 中已到檢查時間的站（沒有記錄的站一律到期）。"""
+        with self._lock:
+            nxt = self._next
+            return [sid for sid in station_ids if nxt.get(sid, 0.0) <= now]
+
+    def _pooled_lag(self) -> float:
+        """各站延遲的中位數：還沒學到延遲的站先用這個（CWA 多半同批發布）。"""
+        known = [min(v) for v in self._lags.values() if v]
+        return statistics.median(known) if known else 0.0
+
+    def _backoff(self, misses: int) -> float:
+        return min(self.max_backoff_sec, self.fast_sec * 2 ** max(0, misses - FAST_RETRIES))
+
+    def observe(self, station_ids: List[str], rows: List[Observation], now: float) -> None:
+        """
+        記錄一輪抓取結果（now 為抓取完成時間）：有新觀測的站更新樣本並排定下一筆的預估檢查時間；
+        本輪有抓但沒有新觀測（或請求失敗）的站依連續落空次數退避。
+        """
+        times = {r.station_id: r.time for r in rows if r.time}
+        pooled = None
+        with self._lock:
+            for sid in station_ids:
+                t = _epoch(times.get(sid))
+                last = self._last.get(sid)
+                if t is None or (last is not None and t <= last):
+                    misses = self._misses[sid] = self._misses.get(sid, 0) + 1
+                    self._next[sid] = now + self._backoff(misses)
+                    continue
+
+                if last is not None:
+                    self._cadences.setdefault(sid, deque(maxlen=HISTORY)).append(t - last)
+                    # 啟動後第一次看到的觀測可能早已發布；退避中才看到的，實際發布時間也可能早很多：
+                    # 都不列入延遲樣本，否則高估的延遲會讓之後每一筆都晚抓
+                    if self._misses.get(sid, 0) <= FAST_RETRIES:
+                        self._lags.setdefault(sid, deque(maxlen=HISTORY)).append(now - t)
+                self._last[sid] = t
+                self._misses[sid] = 0
+                cadences = self._cadences.get(sid)
+                cadence = min(cadences) if cadences else DEFAULT_CADENCE_SEC
+                lags = self._lags.get(sid)
+                if lags:
+                    lag = min(lags)
+                else:
+                    lag = pooled = self._pooled_lag() if pooled is None else pooled
+                # 提早半個重查間隔：延遲變短時也學得到
+                expected = t + cadence + lag - self.fast_sec / 2
+                self._next[sid] = expected if expected > now else now + self.fast_sec
+
+    def forget(self, keep: List[str]) -> None:
+        """只保留 keep 中的站（測站名單更新後呼叫）。"""
+        keep = set(keep)
+        with self._lock:
+            for table in (self._last, self._cadences, self._lags, self._misses, self._next):
+                for sid in [sid for sid in table if sid not in keep]:
+                    del table[sid]
+
+    def summary(self, station_ids: List[str], now: float) -> Dict:
+        """給 /api/status：追蹤站數、目前到期站數、最近一次預定檢查還有幾秒、退避中的站數。"""
+        with self._lock:
+            pending = [self._next.get(sid, 0.0) for sid in station_ids]
+            backing_off = sum(1 for sid in station_ids if self._misses.get(sid, 0) > FAST_RETRIES)
+        upcoming = [t for t in pending if t > now]
+        return {
+            "tracked": len(self._last),
+            "due": len(pending) - len(upcoming),
+            "next_check_in_sec": round(min(upcoming) - now, 1) if upcoming else None,
+            "backing_off": backing_off,
+        }
+
+
+PLANNER = PollPlanner(config.ADAPTIVE_FAST_SEC, config.ADAPTIVE_MAX_BACKOFF_SEC)
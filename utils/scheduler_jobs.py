@@ -1,81 +1,195 @@
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
+from typing import List
 from apscheduler.schedulers.background import BackgroundScheduler
 import config
 import utils.fetcher as fetcher
 import modules.db as db
+import modules.board as board
+import modules.csv_writer as csv_writer
+import modules.persist as persist
+import modules.push as push
+import utils.stations as stations
+from modules.latest import LATEST
+from modules.ringbuffer import RING
+from utils.poll_planner import PLANNER
 
 SCHEDULER = None
 
 
-def refresh_cache():
+def refresh_cache(station_ids: List[str] | None = None):
+    """抓取並發布一輪資料；station_ids 指定時只抓這些站（ADAPTIVE_POLLING），其餘站沿用上一輪。"""
     if not config.CWA_TOKEN:
         config.app.logger.error("CWA_TOKEN 未設定，請在 .env 或環境變數設定。")
         return
     try:
         # 1) 抓取、合併
-        rows = fetcher.fetch_data()
+        t0 = time.perf_counter()
+        rows = fetcher.fetch_data(station_ids)
+        if config.ADAPTIVE_POLLING:
+            # 請求失敗也要記下，沒抓到的站依落空次數退避
+            PLANNER.observe(station_ids if station_ids is not None else stations.get_all_station_ids(),
+                            rows, time.time())
         if not rows:
             config.app.logger.warning("[refresh_cache] 無資料可更新")
             return
+        t_fetch = time.perf_counter()
 
-        # 2) 寫入資料庫
-        db.save_observations(rows)
+        # 2) 只處理有變更的站（新的觀測時間或數值有變）；先更新記憶體（環狀緩衝、每站最新一筆）
+        changed = db.filter_changed(rows)
+        RING.append(changed)
+        LATEST.update(changed)
 
-        # 3) 從資料庫產出今日 CSV（全檔覆寫）
-        #    觀測時間恰為 00:00:00 的資料，歸入「前一天」的 CSV
-        obs_time = datetime.strptime(rows[0]["time"], "%Y-%m-%d %H:%M:%S")
-        if obs_time.hour == 0 and obs_time.minute == 0:
-            base_day = (obs_time - timedelta(days=1)).date()
-        else:
-            base_day = obs_time.date()
-        out_csv = db.write_csv_for_day(base_day)
-
-        # 4) 更新快取
+        # 3) 更新快取
+        updated_at = datetime.now(config.TPE)
         with config.DATA_LOCK:
-            config.DATA_CACHE["rows"] = rows   # 給 /api/data 後備用
-            config.DATA_CACHE["updated_at"] = datetime.now(config.TPE)
+            if station_ids is not None:
+                # 只抓了部分站：有觀測的站換成新的，其餘沿用上一輪
+                fresh = {r.station_id: r for r in rows if r.time}
+                cached = [fresh.pop(r.station_id, r) for r in config.DATA_CACHE["rows"]]
+                rows = cached + list(fresh.values())
+            config.DATA_CACHE["rows"] = rows   # list[Observation]，給 /api/data 後備用
+            config.DATA_CACHE["updated_at"] = updated_at
+        board.invalidate()   # 已序列化的 /api/data 回應作廢
+
+        # 4) 推播 WebSocket：各訂閱 room 只送出有變更的列（board_delta）；
+        #    另廣播 data_update 告知更新時間。沒有任何站變更時不推播
+        pushed = 0
+        if changed:
+            pushed = push.push_updates()
+            push.emit("data_update", {
+                "updated_at": updated_at.strftime("%Y-%m-%d %H:%M:%S")
+            })
+        t_publish = time.perf_counter()
 
-        # 5) 推播 WebSocket：只告知資料更新時間；前端再自行 /api/data?window=...&tab=... 拉細部
-        config.socketio.emit("data_update", {
-            "updated_at": config.DATA_CACHE["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
-        }, namespace="/")
+        # 5) 寫庫、附加每日 CSV 交給背景執行緒（persist），不拖慢下一輪與推播
+        #    觀測時間恰為 00:00:00 的資料，歸入「前一天」的 CSV
+        persist.submit(changed, updated_at)
 
-        config.app.logger.info(f"[refresh_cache] rows={len(rows)} csv={out_csv.name}")
+        lag = persist.status()["db"]
+        config.app.logger.info(
+            f"[refresh_cache] polled={len(station_ids) if station_ids is not None else 'all'} "
+            f"rows={len(rows)} changed={len(changed)} rooms={pushed} "
+            f"fetch={(t_fetch - t0) * 1000:.0f}ms publish={(t_publish - t_fetch) * 1000:.0f}ms "
+            f"persist_pending={lag['pending']}"
+        )
     except Exception as e:
         config.app.logger.exception(f"[refresh_cache] failed: {e}")
 
 
+def poll_due():
+    """ADAPTIVE_POLLING：只抓已到預估發布時間的站；沒有到期的站就不發請求。"""
+    ids = stations.get_all_station_ids()
+    due = PLANNER.due(ids, time.time())
+    if due:
+        refresh_cache(None if len(due) == len(ids) else due)
+
+
+def warm_start() -> int:
+    """
+    啟動時（開始接受連線前）以資料庫中每站最新一筆與上次的更新時間填入後端快取，
+    重啟後不必等第一輪抓取完成就有資料；同時預填變更指紋，第一輪抓取只寫真正有變的站。
+    第一輪抓取已先完成時不覆蓋。回傳載入的站數。
+    """
+    rows = db.load_latest_snapshot()
+    db.seed_fingerprints(rows)
+    LATEST.load(rows)
+    saved = db.get_state(persist.UPDATED_AT_KEY)
+    updated_at = datetime.fromisoformat(saved) if saved else None
+    if updated_at is None and rows:
+        # 舊資料庫沒有記錄更新時間：以最新的觀測時間代替
+        updated_at = datetime.strptime(max(r.time for r in rows), "%Y-%m-%d %H:%M:%S").replace(tzinfo=config.TPE)
+    with config.DATA_LOCK:
+        if config.DATA_CACHE["updated_at"] is not None:
+            return 0
+        config.DATA_CACHE["rows"] = rows
+        config.DATA_CACHE["updated_at"] = updated_at
+    board.invalidate()
+    config.app.logger.info(f"[warm_start] loaded {len(rows)} stations, updated_at={saved or '-'}")
+    return len(rows)
+
+
+def prune_observations():
+    """清理過舊的分區，記憶體中的每站最新一筆同步清掉（與 latest_observations 一致）。"""
+    cutoff = db.prune_old_observations()
+    LATEST.forget_before(cutoff)
+
+
+def reload_stations():
+    """測站名單檔有變更時重新編譯並整份替換名單，再清掉含舊 zone/群組的回應快取（不需重啟）。"""
+    try:
+        if stations.reload_if_changed():
+            PLANNER.forget(stations.get_all_station_ids())
+            board.invalidate()
+            config.app.logger.info(
+                f"[reload_stations] reloaded {config.STATION_LIST_FILENAME}: "
+                f"{len(stations.get_all_station_ids())} stations"
+            )
+    except Exception as e:
+        # 例如檔案正在存檔、內容暫時不完整：沿用舊名單，下次再試
+        config.app.logger.exception(f"[reload_stations] failed: {e}")
+
+
 def start_scheduler():
     """
     啟動排程，執行以下工作：
-    1) API 抓資料：立刻跑一次，之後每隔 FETCH_INTERVAL_MIN 分鐘跑一次。
-    2) 清理資料庫：每天 01:00 清理，只保留過去 48 小時資料。
+    1) API 抓資料：立刻跑一次，之後每隔 FETCH_INTERVAL_MIN 分鐘跑一次（寫庫與 CSV 由 persist 背景執行緒接手）；
+       ADAPTIVE_POLLING 時改為每 ADAPTIVE_TICK_SEC 秒檢查，只抓到期的站。
+    2) 清理資料庫：每天 01:00 刪除超過 RETENTION_DAYS 天的每日分區。
+    3) CSV 整理：每隔 CSV_COMPACT_INTERVAL_MIN 分鐘，整檔重寫有已輸出列被改過的日期。
+    4) 測站名單：每隔 STATIONS_RELOAD_INTERVAL_SEC 秒檢查名單檔是否變更（0 表示不檢查）。
     """
     global SCHEDULER
     if SCHEDULER:
         return SCHEDULER
 
+    # 寫庫 / CSV 的背景執行緒
+    persist.start()
+    push.start()   # 排程執行緒的推播交給 eventlet hub 送出
+
     sched = BackgroundScheduler(
         timezone="Asia/Taipei",
         job_defaults={"coalesce": True, "max_instances": 1}
     )
 
-    # API 抓資料
-    sched.add_job(
-        refresh_cache,
-        "interval",
-        minutes=config.FETCH_INTERVAL_MIN,
-        next_run_time=datetime.now(config.TPE)  # 啟動就先跑一次
-    )
+    # API 抓資料：固定間隔全量抓取，或依各站發布節奏只抓到期的站
+    if config.ADAPTIVE_POLLING:
+        sched.add_job(
+            poll_due,
+            "interval",
+            seconds=config.ADAPTIVE_TICK_SEC,
+            next_run_time=datetime.now(config.TPE)  # 啟動就先跑一次（此時所有站都到期）
+        )
+    else:
+        sched.add_job(
+            refresh_cache,
+            "interval",
+            minutes=config.FETCH_INTERVAL_MIN,
+            next_run_time=datetime.now(config.TPE)  # 啟動就先跑一次
+        )
 
     # 清理資料庫
     sched.add_job(
-        db.prune_old_observations,
+        prune_observations,
         "cron",
-        hour=1, minute=0,
-        kwargs={"hours": 48}
+        hour=1, minute=0
+    )
+
+    # CSV 整理
+    sched.add_job(
+        csv_writer.compact_dirty_days,
+        "interval",
+        minutes=config.CSV_COMPACT_INTERVAL_MIN
     )
 
+    # 測站名單熱更新
+    if config.STATIONS_RELOAD_INTERVAL_SEC > 0:
+        sched.add_job(
+            reload_stations,
+            "interval",
+            seconds=config.STATIONS_RELOAD_INTERVAL_SEC
+        )
+
     sched.start()
     SCHEDULER = sched
     return SCHEDULER
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
-from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, FrozenSet, List, Tuple
 from config import STATION_LIST_FILENAME
 
-import pandas as pd
-
 STATIONS_LIST_PATH = Path(__file__).resolve().parent.parent / STATION_LIST_FILENAME
+# 編譯後的測站名單（與 xlsx 同目錄）；以 xlsx 的 mtime/大小/雜湊為鍵，啟動時直接讀，不必載入 pandas
+REGISTRY_PATH = STATIONS_LIST_PATH.with_name(STATIONS_LIST_PATH.stem + ".registry.json")
+REGISTRY_FORMAT = 1
 
 
 def _normalize_sheet_name(name: str) -> str:
@@ -15,13 +19,7 @@ def _normalize_sheet_name(name: str) -> str:
     return name.strip()
 
 
-def _normalize_station_id(raw: object) -> str:
-    if pd.isna(raw):
-        return ""
-    return str(raw).strip()
-
-
-def _get_column(df: pd.DataFrame, logical_name: str) -> str:
+def _get_column(df, logical_name: str) -> str:
     """
     logical_name: 'stno' | 'zone' | 'name'
     """
@@ -33,59 +31,243 @@ def _get_column(df: pd.DataFrame, logical_name: str) -> str:
     raise KeyError(f"工作表缺少必要欄位：{logical_name}")
 
 
-@lru_cache(maxsize=1)
-def load_station_groups() -> Tuple[List[str], Dict[str, List[str]], Dict[str, Dict]]:
+def _file_hash(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_of(path: Path) -> Dict:
+    st = path.stat()
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def compile_workbook(path: Path = STATIONS_LIST_PATH) -> Dict:
     """
-    回傳：
-    - all_group_names: ["全部", "茶葉產區", "咖啡產區", ...]
-    - groups: { group_name: [stno1, stno2, ...] }
-    - stations: {
-        stno: {"stno": ..., "zone": ..., "name": ..., "groups": [g1, g2, ...]}
-      }
+    讀取 Excel（每個工作表一個群組），編譯成精簡的名單：
+    {
+      "format": 1,
+      "source": {"mtime_ns", "size", "hash"},
+      "group_names": [工作表名稱, ...],
+      "stations": [[stno, zone, name], ...],     # 依第一次出現的順序；zone/name 以最後出現者為準
+      "members": [[測站索引, ...], ...]           # 各群組在工作表中的順序
+    }
+    只有這裡需要 pandas / openpyxl，延遲到真的要編譯時才匯入。
     """
-    xls = pd.ExcelFile(STATIONS_LIST_PATH)
+    import pandas as pd
+
+    source = {**_source_of(path), "hash": _file_hash(path)}
+    xls = pd.ExcelFile(path)
 
-    stations: Dict[str, Dict] = {}
-    groups: Dict[str, List[str]] = {}
+    def text(x) -> str:
+        return "" if pd.isna(x) else str(x).strip()
+
+    positions: Dict[str, int] = {}
+    stations: List[List[str]] = []
+    group_names: List[str] = []
+    members: List[List[int]] = []
 
     for sheet_name in xls.sheet_names:
-        group_name = _normalize_sheet_name(sheet_name)
         df = xls.parse(sheet_name)
-
         col_stno = _get_column(df, "stno")
         col_zone = _get_column(df, "zone")
         col_name = _get_column(df, "name")
 
-        group_station_ids: List[str] = []
-
-        for _, row in df.iterrows():
-            stno = _normalize_station_id(row[col_stno])
+        idx: List[int] = []
+        for stno, zone, name in zip(df[col_stno], df[col_zone], df[col_name]):
+            stno = text(stno)
             if not stno:
                 continue
+            pos = positions.get(stno)
+            if pos is None:
+                pos = positions[stno] = len(stations)
+                stations.append([stno, "", ""])
+            # 更新 zone / name 以 Excel 為主（同一站出現多次時以最後一次為準）
+            stations[pos][1] = text(zone)
+            stations[pos][2] = text(name)
+            idx.append(pos)
 
-            zone = str(row[col_zone]).strip() if not pd.isna(row[col_zone]) else ""
-            name = str(row[col_name]).strip() if not pd.isna(row[col_name]) else ""
+        group_names.append(_normalize_sheet_name(sheet_name))
+        members.append(idx)
 
-            if stno not in stations:
-                stations[stno] = {
-                    "stno": stno,
-                    "zone": zone,
-                    "name": name,
-                    "groups": [],
-                }
-            # 更新 zone / name 以 Excel 為主
-            stations[stno]["zone"] = zone
-            stations[stno]["name"] = name
+    return {"format": REGISTRY_FORMAT, "source": source, "group_names": group_names,
+            "stations": stations, "members": members}
 
-            if group_name not in stations[stno]["groups"]:
-                stations[stno]["groups"].append(group_name)
 
-            group_station_ids.append(stno)
+class StationRegistry:
+    """
+    由編譯後名單建出的唯讀查詢表（群組名稱、每站 meta、群組索引、精簡格式 meta 表、stno -> 索引）。
+    更新時整個換成新物件，讀取端拿到的永遠是一致的一份。
+    """
+    __slots__ = ("source", "all_group_names", "groups", "stations", "group_index", "table", "positions")
+
+    def __init__(self, compiled: Dict):
+        self.source = compiled["source"]
+        ids_in_order = [s[0] for s in compiled["stations"]]
+
+        groups: Dict[str, List[str]] = {}
+        stations: Dict[str, Dict] = {
+            stno: {"stno": stno, "zone": zone, "name": name, "groups": []}
+            for stno, zone, name in compiled["stations"]
+        }
+        for g, idx in zip(compiled["group_names"], compiled["members"]):
+            ids = [ids_in_order[i] for i in idx]
+            for stno in ids:
+                if g not in stations[stno]["groups"]:
+                    stations[stno]["groups"].append(g)
+            groups[g] = ids
+
+        self.all_group_names = ["全部"] + list(groups.keys())
+        self.groups = groups
+        self.stations = stations
+        # 預先建好的 {群組名稱: frozenset(stno, ...)}：伺服器端群組過濾每列只需一次集合查找
+        self.group_index = {g: frozenset(ids) for g, ids in groups.items()}
+
+        # 精簡格式用的測站 meta 表（欄式，每站一個索引）
+        group_names = list(groups.keys())
+        group_pos = {g: i for i, g in enumerate(group_names)}
+        ids = sorted(stations)
+        table = {
+            "group_names": group_names,
+            "ids": ids,
+            "zone": [stations[s]["zone"] for s in ids],
+            "name": [stations[s]["name"] for s in ids],
+            "groups": [[group_pos[g] for g in stations[s]["groups"]] for s in ids],
+        }
+        raw = json.dumps(table, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self.table = {"version": hashlib.blake2b(raw, digest_size=8).hexdigest(), **table}
+        self.positions = {sid: i for i, sid in enumerate(ids)}
+
+
+_REGISTRY: StationRegistry | None = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _read_sidecar() -> Dict | None:
+    try:
+        data = json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get("format") == REGISTRY_FORMAT else None
+
+
+def _write_sidecar(compiled: Dict) -> None:
+    """先寫暫存檔再 os.replace，讀取端不會看到寫一半的檔案。寫入失敗（例如唯讀目錄）只影響下次啟動速度。"""
+    tmp = REGISTRY_PATH.with_name(REGISTRY_PATH.name + ".tmp")
+    try:
+        tmp.write_text(json.dumps(compiled, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, REGISTRY_PATH)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def _load_compiled() -> Dict:
+    """
+    取得與目前 xlsx 相符的編譯名單：
+    mtime 與大小相同直接用 sidecar；不同時比對內容雜湊（只是被 touch 過就更新鍵值沿用）；
+    內容真的變了才用 pandas 重新編譯並寫回 sidecar。
+    """
+    source = _source_of(STATIONS_LIST_PATH)
+    compiled = _read_sidecar()
+    if compiled is not None:
+        cached = compiled["source"]
+        if cached["mtime_ns"] == source["mtime_ns"] and cached["size"] == source["size"]:
+            return compiled
+        digest = _file_hash(STATIONS_LIST_PATH)
+        if cached.get("hash") == digest:
+            compiled["source"] = {**source, "hash": digest}
+            _write_sidecar(compiled)
+            return compiled
+    compiled = compile_workbook(STATIONS_LIST_PATH)
+    _write_sidecar(compiled)
+    return compiled
+
+
+def get_registry() -> StationRegistry:
+    """目前的測站名單（第一次呼叫時載入）。"""
+    registry = _REGISTRY
+    if registry is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _swap(StationRegistry(_load_compiled()))
+            registry = _REGISTRY
+    return registry
+
+
+def _swap(registry: StationRegistry) -> None:
+    global _REGISTRY
+    _REGISTRY = registry
+
+
+def reload_if_changed() -> bool:
+    """
+    xlsx 的 mtime 或大小與目前名單不同時重新編譯，並整份替換（排程定期呼叫，不需重啟）。
+    回傳是否換了新名單；內容雜湊相同（只是被 touch）不算變更。
+    """
+    current = get_registry()
+    try:
+        source = _source_of(STATIONS_LIST_PATH)
+    except OSError:
+        return False
+    if (source["mtime_ns"], source["size"]) == (current.source["mtime_ns"], current.source["size"]):
+        return False
+    with _REGISTRY_LOCK:
+        compiled = _load_compiled()
+        changed = compiled["source"].get("hash") != current.source.get("hash")
+        _swap(StationRegistry(compiled))
+    return changed
 
-        groups[group_name] = group_station_ids
 
-    all_group_names = ["全部"] + list(groups.keys())
-    return all_group_names, groups, stations
+def load_station_groups() -> Tuple[List[str], Dict[str, List[str]], Dict[str, Dict]]:
+    """
+    回傳：
+    - all_group_names: ["全部", "茶葉產區", "咖啡產區", ...]
+    - groups: { group_name: [stno1, stno2, ...] }
+    - stations: {
+        stno: {"stno": ..., "zone": ..., "name": ..., "groups": [g1, g2, ...]}
+      }
+    """
+    registry = get_registry()
+    return registry.all_group_names, registry.groups, registry.stations
+
+
+def load_group_index() -> Dict[str, FrozenSet[str]]:
+    """
+    預先建好的 {群組名稱: frozenset(stno, ...)}，給 /api/data 與推播做伺服器端群組過濾；
+    每列只需一次集合查找，不必逐列檢查 groups 清單。
+    """
+    return get_registry().group_index
+
+
+def load_station_table() -> Dict:
+    """
+    精簡格式用的測站 meta 表（欄式，每站一個索引）：
+    {
+      "version": 內容雜湊,
+      "group_names": ["茶葉產區", ...],
+      "ids": [stno, ...], "zone": [...], "name": [...],
+      "groups": [[群組索引, ...], ...]
+    }
+    前端以 version 快取，之後的精簡回應只帶測站索引，不再逐列重複 zone/name/groups。
+    """
+    return get_registry().table
+
+
+def load_station_positions() -> Dict[str, int]:
+    """{stno: 在 load_station_table()["ids"] 中的索引}。"""
+    return get_registry().positions
+
+
+def stations_in_group(group: str | None) -> FrozenSet[str] | None:
+    """
+    回傳群組內的測站代碼集合；「全部」或未指定回傳 None（不過濾），
+    不存在的群組回傳空集合。
+    """
+    if not group or group == "全部":
+        return None
+    return load_group_index().get(group, frozenset())
 
 
 def get_all_station_ids() -> List[str]:
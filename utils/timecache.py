@@ -0,0 +1,111 @@
+"""
+時間字串轉換的共用 LRU 快取（utils/parser 與 utils/cleaners 共用）。
+
+同一輪抓取中，所有測站共用相同的 ObsTime，陣風/極值時間也大量重複；
+ISO 8601 -> 台北時間字串的轉換只需做一次，轉換時順便記下對應的 datetime，
+cleaners 之後即可直接取用，不必再 strptime 一次。
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Tuple
+import config
+
+TPE = config.TPE
+LOCAL_FMT = "%Y-%m-%d %H:%M:%S"
+CACHE_SIZE = 4096
+
+
+class _LRU:
+    """有上限的 LRU，附命中/未命中計數（thread-safe）。"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute: Callable[[Any], Any]):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute(key)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+# ISO 字串 -> (台北時間字串, naive datetime | None)
+_ISO_CACHE = _LRU(CACHE_SIZE)
+# 台北時間字串 -> naive datetime | None
+_LOCAL_CACHE = _LRU(CACHE_SIZE)
+
+
+def _convert_iso(x: str) -> Tuple[str, datetime | None]:
+    try:
+        dt = datetime.fromisoformat(x.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            # 若來源沒 tz，保守視為 UTC 再轉台北（依需求可調）
+            dt = dt.replace(tzinfo=timezone.utc)
+        local = dt.astimezone(TPE).replace(tzinfo=None)
+    except Exception:
+        # 如果解析失敗，就原樣回傳
+        return x, None
+    s = local.strftime(LOCAL_FMT)
+    # 記下輸出字串對應的 datetime，cleaners 取用時即命中
+    _LOCAL_CACHE.put(s, local)
+    return s, local
+
+
+def _parse_local(ts: str) -> datetime | None:
+    try:
+        return datetime.strptime(ts, LOCAL_FMT)
+    except Exception:
+        return None
+
+
+def iso_to_local_str(x: str | None) -> str | None:
+    """ISO 8601（含 Z 或 +00:00/+08:00）-> '%Y-%m-%d %H:%M:%S'（台北時間）；無法解析則原樣回傳。"""
+    if not x:
+        return None
+    return _ISO_CACHE.get_or_compute(x, _convert_iso)[0]
+
+
+def parse_local(ts: str | None) -> datetime | None:
+    """'%Y-%m-%d %H:%M:%S' -> naive datetime；None / '' / 格式錯誤回傳 None。"""
+    if not ts:
+        return None
+    return _LOCAL_CACHE.get_or_compute(ts, _parse_local)
+
+
+def format_local(dt: datetime | None) -> str | None:
+    """naive datetime -> '%Y-%m-%d %H:%M:%S'，並記入快取供之後 parse_local 命中。"""
+    if dt is None:
+        return None
+    s = dt.strftime(LOCAL_FMT)
+    _LOCAL_CACHE.put(s, dt)
+    return s
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """回傳各快取的命中/未命中數與大小。"""
+    return {"iso": _ISO_CACHE.info(), "local": _LOCAL_CACHE.info()}